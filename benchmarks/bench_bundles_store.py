@@ -0,0 +1,101 @@
+"""
+Throughput of the bundles SQLite store under parallel clients.
+
+Compares the old access pattern (a fresh connection per request in rollback-journal mode)
+with the pooled WAL store used by the bundles blueprint. Each client thread mixes favorite
+toggles (writes) with favorite lookups (reads), like the /bundles/favorite endpoints do.
+
+    python benchmarks/bench_bundles_store.py --threads 8 --ops 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from app.blueprints.bundles import store  # noqa: E402
+
+
+def legacy_connection(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_op(path, i):
+    conn = legacy_connection(path)
+    bundle_id = f"bundle-{i % 50}"
+    if i % 4 == 0:
+        conn.execute("INSERT OR IGNORE INTO favorites (bundle_id) VALUES (?)", (bundle_id,))
+        conn.commit()
+    elif i % 4 == 1:
+        conn.execute("DELETE FROM favorites WHERE bundle_id = ?", (bundle_id,))
+        conn.commit()
+    else:
+        conn.execute("SELECT id FROM favorites WHERE bundle_id = ?", (bundle_id,)).fetchone()
+    conn.close()
+
+
+def pooled_op(path, i):
+    bundle_id = f"bundle-{i % 50}"
+    with store.db_connection(path) as conn:
+        if i % 4 == 0:
+            conn.execute("INSERT OR IGNORE INTO favorites (bundle_id) VALUES (?)", (bundle_id,))
+        elif i % 4 == 1:
+            conn.execute("DELETE FROM favorites WHERE bundle_id = ?", (bundle_id,))
+        else:
+            conn.execute("SELECT id FROM favorites WHERE bundle_id = ?", (bundle_id,)).fetchone()
+
+
+def run(op, path, threads, ops):
+    errors = 0
+
+    def task(i):
+        nonlocal errors
+        try:
+            op(path, i)
+        except sqlite3.OperationalError:
+            errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(task, range(ops)))
+    elapsed = time.perf_counter() - started
+    return ops / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        conn = legacy_connection(legacy_path)
+        conn.execute(
+            "CREATE TABLE favorites (id INTEGER PRIMARY KEY AUTOINCREMENT, bundle_id TEXT NOT NULL, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE(bundle_id))"
+        )
+        conn.commit()
+        conn.close()
+
+        pooled_path = os.path.join(tmp, "pooled.db")
+        store.init_db(pooled_path)
+
+        legacy_rate, legacy_errors = run(legacy_op, legacy_path, args.threads, args.ops)
+        pooled_rate, pooled_errors = run(pooled_op, pooled_path, args.threads, args.ops)
+        store.close_connections()
+
+    print(f"threads={args.threads} ops={args.ops}")
+    print(f"per-request connection, rollback journal: {legacy_rate:10.0f} ops/s ({legacy_errors} lock errors)")
+    print(f"pooled connections, WAL:                  {pooled_rate:10.0f} ops/s ({pooled_errors} lock errors)")
+    print(f"speedup: {pooled_rate / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
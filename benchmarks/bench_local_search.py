@@ -0,0 +1,52 @@
+"""
+Multi-start local search throughput.
+
+Builds the search space of a synthetic Bundles_N sheet and runs local_search_bundle from
+--starts of its bundles, reporting starts per second and the time a request's --top-n
+starts take.
+
+    python benchmarks/bench_local_search.py --rows 100000 --skus 20000 --starts 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from bench_optimize_bundles import synthetic_sheet  # noqa: E402
+
+from app.blueprints.bundles.candidate_store import bundle_key, discounted_prices  # noqa: E402
+from app.blueprints.bundles.local_search import SearchSpace, multi_start_search  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--skus", type=int, default=20000)
+    parser.add_argument("--starts", type=int, default=2000)
+    parser.add_argument("--top-n", type=int, default=50, help="Starts of one /bundles/generate sheet")
+    parser.add_argument("--max-iters", type=int, default=30)
+    args = parser.parse_args()
+
+    df = synthetic_sheet(args.rows, args.size, args.skus)
+    prices = {}
+    for skus, price in zip(df["SKUs"], discounted_prices(df["Original Total Price"], 34).tolist()):
+        for sku in skus.split(", "):
+            prices[sku] = max(prices.get(sku, price), price)
+    start = time.perf_counter()
+    space = SearchSpace(prices, dict(zip(map(bundle_key, df["SKUs"]), df["Count"].tolist())))
+    print(f"{len(df)} bundles over {len(space)} SKUs, search space built in {time.perf_counter() - start:.2f}s")
+
+    starts = [skus.split(", ") for skus in df["SKUs"].iloc[: args.starts]]
+    start = time.perf_counter()
+    multi_start_search(space, starts, target_margin=0.66, max_iters=args.max_iters)
+    elapsed = time.perf_counter() - start
+    print(f"{len(starts)} starts in {elapsed:8.2f}s  {len(starts) / elapsed:10.0f} starts/s")
+    print(f"{args.top_n} starts (one sheet of a request) take ~{elapsed / len(starts) * args.top_n * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+MinHash/LSH versus exact Jaccard search over bundle candidates.
+
+Builds (or reads) a candidate table, then for "bundles like this one" queries (an existing
+bundle with one SKU swapped, optionally padded with --pad random SKUs) compares the exact
+top-N from the inverted SKU index with the LSH top-N for each band count, reporting recall
+of the exact top-N and mean query time. Padding shows how recall drops as the target grows
+and every bundle's Jaccard to it shrinks.
+
+    python benchmarks/bench_minhash.py --bundles 100000 --bands 16 32 64
+    python benchmarks/bench_minhash.py --excel excel/product_bundle_suggestions.xlsx --sheet Bundles_4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from app.blueprints.bundles.candidate_store import split_skus  # noqa: E402
+from app.blueprints.bundles.minhash import LshIndex, signatures  # noqa: E402
+from app.blueprints.bundles.sku_index import SkuIndex  # noqa: E402
+
+
+def synthetic_bundles(bundles, skus=20000, seed=0):
+    """Bundles of 2-5 SKUs drawn around product families, so similar bundles exist"""
+    rng = np.random.default_rng(seed)
+    families = rng.integers(0, skus, bundles)
+    sizes = rng.integers(2, 6, bundles)
+    return [
+        sorted({f"SKU{(f + int(o)) % skus:06d}" for o in rng.integers(0, 40, size)})
+        for f, size in zip(families, sizes)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bundles", type=int, default=100000)
+    parser.add_argument("--excel")
+    parser.add_argument("--sheet", default="Bundles_4")
+    parser.add_argument("--pad", type=int, default=0, help="Random SKUs added to every query")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--bands", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--min-jaccard", type=float, default=0.3, help="Exact hits below this do not count towards recall")
+    args = parser.parse_args()
+
+    if args.excel:
+        df = pd.read_excel(args.excel, sheet_name=args.sheet)
+        sku_lists = [sorted(set(split_skus(s))) for s in df["SKUs"]]
+        counts = df["Count"].to_numpy()
+    else:
+        sku_lists = synthetic_bundles(args.bundles)
+        counts = np.random.default_rng(1).integers(5, 500, len(sku_lists))
+    totals = np.ones(len(sku_lists))
+    valid = np.ones(len(sku_lists), dtype=bool)
+
+    start = time.perf_counter()
+    sigs = signatures(sku_lists)
+    print(f"{len(sku_lists)} bundles, signatures in {time.perf_counter() - start:.2f}s")
+    exact_index = SkuIndex(np.arange(len(sku_lists)), sku_lists, counts, totals, valid)
+
+    rng = np.random.default_rng(2)
+    catalog = sorted({sku for skus in sku_lists for sku in skus})
+    queries = []
+    for row in rng.integers(0, len(sku_lists), args.queries):
+        target = list(sku_lists[row])
+        target[rng.integers(0, len(target))] = catalog[rng.integers(0, len(catalog))]
+        queries.append(set(target) | set(rng.choice(catalog, args.pad, replace=False)))
+
+    start = time.perf_counter()
+    exact = [exact_index.nearest(q, args.top_n) for q in queries]
+    exact_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"exact         {exact_ms:8.2f} ms/query")
+
+    for bands in args.bands:
+        start = time.perf_counter()
+        lsh = LshIndex(sigs, counts, totals, valid, bands=bands)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [lsh.nearest(q, args.top_n) for q in queries]
+        lsh_ms = (time.perf_counter() - start) / len(queries) * 1000
+        hits = total = 0
+        for q, truth, approx in zip(queries, exact, found):
+            relevant = {p for p in truth if len(set(sku_lists[p]) & q) / len(set(sku_lists[p]) | q) >= args.min_jaccard}
+            total += len(relevant)
+            hits += len(relevant & set(approx))
+        recall = hits / total if total else 1.0
+        print(f"lsh bands={bands:<3} {lsh_ms:8.2f} ms/query  recall@{args.top_n} {recall:6.1%}  build {build:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
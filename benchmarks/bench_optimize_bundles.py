@@ -0,0 +1,99 @@
+"""
+optimize_bundles runtime on a large synthetic Bundles_N sheet.
+
+Writes --rows bundles into a candidate store, then times the first optimize_bundles call
+(which builds the per-sheet lookups: SKU -> name, SKU -> price, bundle -> count and the SKU
+index) and warm calls that reuse them. For reference it also times one pass of the old
+per-row name_map rebuild (an iterrows over the whole sheet), which the optimizer used to
+repeat for every one of the top_n bundles it searched.
+
+    python benchmarks/bench_optimize_bundles.py --rows 100000 --top-n 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from app.blueprints.bundles.candidate_store import write_candidates  # noqa: E402
+from app.blueprints.bundles.optimise_bundles import optimize_bundles  # noqa: E402
+from app.blueprints.bundles.sheet_cache import clear_cache  # noqa: E402
+from app.blueprints.bundles.store import close_connections, db_connection  # noqa: E402
+
+
+def synthetic_sheet(rows, size, skus, seed=0):
+    """A Bundles_<size> sheet of distinct bundles over a catalog of skus products"""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(2, 80, skus).round(2)
+    codes = np.sort(rng.integers(0, skus, (rows * 2, size)), axis=1)
+    codes = codes[(np.diff(codes, axis=1) > 0).all(axis=1)]
+    codes = np.unique(codes, axis=0)
+    codes = codes[rng.permutation(len(codes))[:rows]]
+    totals = prices[codes].sum(axis=1).round(2)
+    df = pd.DataFrame({
+        "SKUs": [", ".join(f"SKU{c:06d}" for c in row) for row in codes],
+        "Products": [", ".join(f"Product {c}" for c in row) for row in codes],
+        "Count": np.sort(rng.zipf(1.6, len(codes)).clip(5, 5000))[::-1],
+        "Bundle Size": size,
+        "Original Total Price": totals,
+    })
+    return df
+
+
+def legacy_name_map(df, skus):
+    """One rebuild of the name map the way the optimizer used to do it, per searched row"""
+    name_map = {}
+    for _, row in df.iterrows():
+        sku_list = [s.strip() for s in str(row["SKUs"]).split(",")]
+        prod_list = [p.strip() for p in str(row["Products"]).split(",")]
+        for i, sku in enumerate(sku_list):
+            if sku in skus and i < len(prod_list):
+                name_map[sku] = prod_list[i]
+    return name_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=3)
+    parser.add_argument("--skus", type=int, default=2000, help="Catalog size, the local search space")
+    parser.add_argument("--top-n", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_sheet(args.rows, args.size, args.skus)
+    sheet = f"Bundles_{args.size}"
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "bundles.xlsx")
+        store_path = os.path.join(tmp, "bundles.db")
+        start = time.perf_counter()
+        with db_connection(store_path) as conn:
+            write_candidates(conn, {sheet: df})
+        print(f"{len(df)} bundles over {args.skus} SKUs, stored in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        legacy_name_map(df, set(df["SKUs"].iloc[0].split(", ")))
+        legacy = time.perf_counter() - start
+        print(f"old name_map rebuild  {legacy:8.2f}s per searched row, ~{legacy * args.top_n:.0f}s at top_n={args.top_n}")
+
+        target = df["SKUs"].iloc[len(df) // 2].split(", ")[0]
+        for label, product in (("best sellers", None), (f"target {target}", target)):
+            clear_cache()
+            start = time.perf_counter()
+            optimize_bundles(product, "34", args.top_n, excel_path=excel_path)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                optimize_bundles(product, "34", args.top_n, excel_path=excel_path)
+            warm = (time.perf_counter() - start) / args.repeat
+            print(f"{label:20s}  cold {cold:8.2f}s  warm {warm:8.2f}s")
+        close_connections(store_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory and groupby cost of the orders frame with and without the shared schema.
+
+Builds a synthetic order history shaped like Data.xlsx (string SKUs, order numbers, user ids,
+titles, categories and brands) and reports process RSS growth, frame size and groupby
+timings for the plain object-column frame versus apply_orders_schema.
+
+    python benchmarks/bench_orders_schema.py --rows 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from app.orders_schema import apply_orders_schema  # noqa: E402
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def synthetic_orders(rows, skus=20000, users=50000, seed=0):
+    rng = np.random.default_rng(seed)
+    sku_ids = rng.integers(0, skus, rows)
+    order_ids = np.sort(rng.integers(0, rows // 3, rows))
+    # read_excel hands back Python str objects, so keep text columns as object dtype
+    df = pd.DataFrame(
+        {
+            "OrderNumber": [f"ORD{o:08d}" for o in order_ids],
+            "SKU": [f"9-{s:010d}" for s in sku_ids],
+            "Item title": [f"Product title number {s} with a long descriptive name" for s in sku_ids],
+            "Category": [f"Category / Subcategory {s % 60}" for s in sku_ids],
+            "Brand": [f"BRAND {s % 400}" for s in sku_ids],
+            "UserID": [f"USER{u:07d}" for u in rng.integers(0, users, rows)],
+            "Quantity": rng.integers(1, 4, rows),
+            "OriginalUnitPrice": np.round(rng.uniform(2, 200, rows), 2),
+            "FinalUnitPrice": np.round(rng.uniform(2, 200, rows), 2),
+            "TotalOrderAmount": np.round(rng.uniform(10, 500, rows), 2),
+        }
+    )
+    text_columns = ["OrderNumber", "SKU", "Item title", "Category", "Brand", "UserID"]
+    return df.astype({col: object for col in text_columns})
+
+
+def measure(label, build):
+    gc.collect()
+    before = rss_mb()
+    df = build()
+    gc.collect()
+    grown = rss_mb() - before
+    frame_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+    started = time.perf_counter()
+    df.groupby("SKU", observed=True)["Quantity"].sum()
+    df.groupby("OrderNumber", observed=True)["SKU"].nunique()
+    groupby_s = time.perf_counter() - started
+
+    print(f"{label:<22} frame {frame_mb:9.1f} MB   RSS +{grown:9.1f} MB   groupbys {groupby_s:6.2f} s")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"rows={args.rows}")
+    df = measure("object columns", lambda: synthetic_orders(args.rows))
+    measure("shared schema", lambda: apply_orders_schema(df))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Scaling of sharded itemset counting with the number of worker processes.
+
+Generates synthetic baskets with a skewed SKU popularity and a long tail of large orders,
+counts itemsets of size 2-5 (3-5 pruned at --min-count) with parallel_counting.count_itemsets
+for each worker count and reports wall time, orders per second and speedup over one worker.
+
+    python benchmarks/bench_parallel_counting.py --orders 200000 --workers 1 2 4 8 16 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from parallel_counting import count_itemsets  # noqa: E402
+
+
+def synthetic_baskets(orders, skus=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, skus + 1)
+    popularity /= popularity.sum()
+    sizes = np.minimum(rng.geometric(0.35, orders), 12)
+    return [np.unique(rng.choice(skus, size, p=popularity)).astype(np.int32) for size in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--min-count", type=int, default=5)
+    args = parser.parse_args()
+
+    baskets = synthetic_baskets(args.orders, args.skus)
+    skus = np.array([f"SKU{i:06d}" for i in range(args.skus)], dtype=object)
+    print(f"{len(baskets)} orders, {os.cpu_count()} CPUs available")
+
+    baseline = None
+    reference = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        counts = count_itemsets(baskets, skus, range(2, 6), workers=workers, min_count=args.min_count)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        totals = {n: len(counts.counts[n]) for n in counts.sizes}
+        if reference is None:
+            reference = totals
+        assert totals == reference, "worker counts disagree"
+        print(
+            f"workers={workers:<3} {elapsed:8.2f}s  {len(baskets) / elapsed:12,.0f} orders/s  "
+            f"speedup {baseline / elapsed:5.2f}x  itemsets {totals}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Recall and memory of approximate (Count-Min + Space-Saving) bundle counting versus exact
+counting.
+
+Counts itemsets of size 2-5 over synthetic baskets exactly (parallel_counting, one worker)
+and with sketches.ApproximateItemsetCounter under each memory cap, then reports peak traced
+memory, time, recall and precision of the bundles with count >= --min-count, and the mean
+relative overestimate of their counts.
+
+    python benchmarks/bench_sketches.py --orders 200000 --memory-mb 4 16 64
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server")))
+
+from bench_parallel_counting import synthetic_baskets  # noqa: E402
+from parallel_counting import count_itemsets  # noqa: E402
+from sketches import ApproximateItemsetCounter  # noqa: E402
+
+SIZES = range(2, 6)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--skus", type=int, default=5000)
+    parser.add_argument("--min-count", type=int, default=5)
+    parser.add_argument("--memory-mb", type=float, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    baskets = synthetic_baskets(args.orders, args.skus)
+    skus = np.array([f"SKU{i:06d}" for i in range(args.skus)], dtype=object)
+
+    exact, elapsed, peak = measure(lambda: count_itemsets(baskets, skus, SIZES, workers=1, min_count=args.min_count))
+    truth = {}
+    for n in SIZES:
+        keep = exact.counts[n] >= args.min_count
+        truth.update(zip(map(tuple, exact.items[n][keep].tolist()), exact.counts[n][keep].tolist()))
+    print(f"exact        {elapsed:7.2f}s  peak {peak:8.1f} MB  frequent bundles {len(truth)}")
+
+    for memory_mb in args.memory_mb:
+        counter, elapsed, peak = measure(lambda: ApproximateItemsetCounter(SIZES, memory_mb).update(baskets))
+        found = {}
+        for n in SIZES:
+            found.update((codes, count) for codes, count, _ in counter.frequent(n, args.min_count))
+        hits = [codes for codes in found if codes in truth]
+        recall = len(hits) / len(truth) if truth else 1.0
+        precision = len(hits) / len(found) if found else 1.0
+        overestimate = np.mean([(found[c] - truth[c]) / truth[c] for c in hits]) if hits else 0.0
+        complete = all(counter.complete(n, args.min_count) for n in SIZES)
+        print(
+            f"cap {memory_mb:6.2f} MB  {elapsed:7.2f}s  peak {peak:8.1f} MB  recall {recall:6.1%}  "
+            f"precision {precision:6.1%}  mean overestimate {overestimate:6.1%}  complete={complete}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ print(inventory_raw)
 # === 2. Δημιουργία DataFrames ===
 df_orders = pd.DataFrame(orders_raw)
 df_inventory = pd.DataFrame(inventory_raw)
-from db import get_db_connection
+from db import get_engine
 from redis_config import (
     get_redis_connection,
     cache_inventory_data,
@@ -36,25 +36,24 @@ logger = logging.getLogger(__name__)
 
 # === 1. Load Data from SQL ===
 def load_data():
-    conn = get_db_connection()
-
-    # Load orders data
-    orders_query = """
-    SELECT * FROM Orders
-    """
-    df_orders = pd.read_sql_query(orders_query, conn)
-
-    # Load inventory data
-    inventory_query = """
-    SELECT * FROM Inventory
-    """
-    df_inventory = pd.read_sql_query(inventory_query, conn)
+    # Both queries share one pooled connection
+    with get_engine().connect() as conn:
+        # Load orders data
+        orders_query = """
+        SELECT * FROM Orders
+        """
+        df_orders = pd.read_sql_query(orders_query, conn)
+
+        # Load inventory data
+        inventory_query = """
+        SELECT * FROM Inventory
+        """
+        df_inventory = pd.read_sql_query(inventory_query, conn)
 
     # Cache inventory data in Redis
     inventory_data = df_inventory.to_dict("records")
     cache_inventory_data(inventory_data)
 
-    conn.close()
     return df_orders, df_inventory
 
 
@@ -200,10 +199,9 @@ for _, row in bundle_df.iterrows():
 
 # === 8. Save results to SQLite ===
 def save_results(results):
-    conn = get_db_connection()
     results_df = pd.DataFrame(results)
-    results_df.to_sql("BundleSuggestions", conn, if_exists="replace", index=False)
-    conn.close()
+    # to_sql needs an SQLAlchemy connectable; the engine checks out from the shared pool
+    results_df.to_sql("BundleSuggestions", get_engine(), if_exists="replace", index=False)
     logger.info("Bundle suggestions saved to database!")
 
 
@@ -1,16 +1,21 @@
+import os
+import sys
 import pandas as pd
 
+# Shared orders schema lives in the server package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server"))
+from app.orders_schema import read_orders  # noqa: E402
+
 # Load Orders and Pair Count files
-orders = pd.read_excel('excel/Orders.xlsx')
+orders = read_orders('excel/Orders.xlsx')
 pairs = pd.read_excel('excel/product_pair_counts.xlsx')
 
 # Ensure SKUs are strings
 pairs['SKU_1'] = pairs['SKU_1'].astype(str)
 pairs['SKU_2'] = pairs['SKU_2'].astype(str)
-orders['SKU'] = orders['SKU'].astype(str)
 
 # Map SKU to latest price and product name from Orders.xlsx
-sku_to_price = orders.sort_values('CreatedDate').groupby('SKU')['FinalUnitPrice'].last().to_dict()
+sku_to_price = orders.sort_values('CreatedDate').groupby('SKU', observed=True)['FinalUnitPrice'].last().astype('float64').round(2).to_dict()
 sku_to_title = orders.drop_duplicates('SKU').set_index('SKU')['Item title'].to_dict()
 
 # Prepare strong pairs
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans, DBSCAN
@@ -10,11 +12,17 @@ import seaborn as sns
 from collections import Counter
 import warnings
 
+# Shared orders schema lives in the server package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server"))
+from app.orders_schema import apply_orders_schema, fill_category, sku_dictionary  # noqa: E402
+from cooccurrence import incidence_matrix, item_order_counts, pair_counts, pair_metrics, top_k  # noqa: E402
+from parallel_counting import baskets_from_codes, count_itemsets  # noqa: E402
+
 warnings.filterwarnings("ignore")
 
 
 class EcommerceBundlingSystem:
-    def __init__(self):
+    def __init__(self, workers=1):
         self.orders_df = None
         self.inventory_df = None
         self.processed_data = None
@@ -22,12 +30,16 @@ class EcommerceBundlingSystem:
         self.bundles = []
         self.scaler = StandardScaler()
         self.label_encoders = {}
+        # Processes used for basket counting; 1 keeps everything in this process
+        self.workers = workers
 
     def load_data(self, excel_path):
         """Load orders and inventory data from Excel file"""
         try:
             # Load both sheets
-            self.orders_df = pd.read_excel(excel_path, sheet_name="orders")
+            self.orders_df = apply_orders_schema(
+                pd.read_excel(excel_path, sheet_name="orders"), copy=False
+            )
             self.inventory_df = pd.read_excel(excel_path, sheet_name="inventory")
 
             print(
@@ -62,7 +74,7 @@ class EcommerceBundlingSystem:
         categorical_cols = ["Category", "Brand", "ItemTitle"]
         for col in categorical_cols:
             if col in df.columns:
-                df[col] = df[col].fillna("Unknown")
+                df[col] = fill_category(df[col], "Unknown")
 
         # Feature engineering
         df["PriceDiscount"] = (df.get("OriginalUnitPrice", 0) - df.get("FinalUnitPrice", 0)) / (
@@ -89,7 +101,7 @@ class EcommerceBundlingSystem:
 
         # Create user behavior features
         user_stats = (
-            df.groupby("UserID")
+            df.groupby("UserID", observed=True)
             .agg(
                 {
                     "Quantity": ["sum", "mean"],
@@ -114,7 +126,7 @@ class EcommerceBundlingSystem:
 
         # Create product popularity features
         product_stats = (
-            df.groupby("SKU")
+            df.groupby("SKU", observed=True)
             .agg({"Quantity": "sum", "OrderNumber": "nunique", "UserID": "nunique"})
             .round(2)
         )
@@ -257,66 +269,68 @@ class EcommerceBundlingSystem:
     def find_complementary_bundles(self):
         """Find complementary products using market basket analysis"""
         bundles = []
+        df = self.processed_data
 
-        # Group by order to find frequently bought together items
-        order_items = self.processed_data.groupby("OrderNumber")["SKU"].apply(list).reset_index()
-        order_items = order_items[order_items["SKU"].apply(len) >= 2]  # Orders with 2+ items
-
-        # Find frequent item pairs
-        item_pairs = {}
-        for items in order_items["SKU"]:
-            for i in range(len(items)):
-                for j in range(i + 1, len(items)):
-                    pair = tuple(sorted([items[i], items[j]]))
-                    item_pairs[pair] = item_pairs.get(pair, 0) + 1
+        # Integer-code orders and SKUs, then count every pair from one sparse X^T X product
+        order_codes, _ = pd.factorize(df["OrderNumber"])
+        sku_codes, skus = sku_dictionary(df)
+        total_orders = int(order_codes.max()) + 1 if len(order_codes) else 0
 
         # Filter significant pairs
-        min_support = max(2, len(order_items) * 0.01)  # At least 1% support
-        frequent_pairs = {pair: count for pair, count in item_pairs.items() if count >= min_support}
-
-        for (sku1, sku2), frequency in frequent_pairs.items():
-            # Get product details
-            item1 = self.processed_data[self.processed_data["SKU"] == sku1].iloc[0]
-            item2 = self.processed_data[self.processed_data["SKU"] == sku2].iloc[0]
-
-            # Calculate confidence (lift)
-            sku1_orders = len(
-                self.processed_data[self.processed_data["SKU"] == sku1]["OrderNumber"].unique()
-            )
-            sku2_orders = len(
-                self.processed_data[self.processed_data["SKU"] == sku2]["OrderNumber"].unique()
+        lines_per_order = np.bincount(order_codes[order_codes >= 0], minlength=total_orders)
+        multi_item_orders = int((lines_per_order >= 2).sum())  # Orders with 2+ items
+        min_support = max(2, multi_item_orders * 0.01)  # At least 1% support
+
+        if self.workers > 1:
+            # Same counts, computed per shard of orders on a process pool and merged
+            counts = count_itemsets(baskets_from_codes(order_codes, sku_codes), skus, (1, 2), self.workers)
+            item_orders = np.zeros(len(skus), dtype=np.int64)
+            item_orders[counts.items[1][:, 0]] = counts.counts[1]
+            keep = counts.counts[2] >= min_support
+            sku1, sku2 = counts.items[2][keep, 0], counts.items[2][keep, 1]
+            frequency = counts.counts[2][keep]
+        else:
+            X = incidence_matrix(order_codes, sku_codes, n_orders=total_orders, n_skus=len(skus))
+            item_orders = item_order_counts(X)
+            sku1, sku2, frequency = pair_counts(X, min_count=min_support)
+
+        # Calculate confidence and lift for all frequent pairs at once
+        _, confidence, lift = pair_metrics(sku1, sku2, frequency, item_orders, total_orders)
+        keep = (confidence > 0.1) & (lift > 1.2)  # Minimum thresholds
+        sku1, sku2, frequency = sku1[keep], sku2[keep], frequency[keep]
+        confidence, lift = confidence[keep], lift[keep]
+
+        # Product details come from the first line of each SKU
+        first_rows = df.drop_duplicates("SKU").set_index("SKU")
+
+        for k in top_k(lift, 20):  # Top 20 complementary bundles by lift
+            item1 = first_rows.loc[skus[sku1[k]]]
+            item2 = first_rows.loc[skus[sku2[k]]]
+            bundles.append(
+                {
+                    "type": "Complementary",
+                    "items": [
+                        {
+                            "sku": skus[sku1[k]],
+                            "title": item1.get("ItemTitle", ""),
+                            "category": item1.get("Category", ""),
+                            "price": item1.get("FinalUnitPrice", 0),
+                        },
+                        {
+                            "sku": skus[sku2[k]],
+                            "title": item2.get("ItemTitle", ""),
+                            "category": item2.get("Category", ""),
+                            "price": item2.get("FinalUnitPrice", 0),
+                        },
+                    ],
+                    "frequency": int(frequency[k]),
+                    "confidence": min(0.95, float(confidence[k])),
+                    "lift": float(lift[k]),
+                    "description": f"{item1.get('Category', 'Item')} + {item2.get('Category', 'Item')} bundle",
+                }
             )
-            total_orders = len(self.processed_data["OrderNumber"].unique())
-
-            confidence = frequency / min(sku1_orders, sku2_orders)
-            lift = (frequency * total_orders) / (sku1_orders * sku2_orders)
-
-            if confidence > 0.1 and lift > 1.2:  # Minimum thresholds
-                bundles.append(
-                    {
-                        "type": "Complementary",
-                        "items": [
-                            {
-                                "sku": sku1,
-                                "title": item1.get("ItemTitle", ""),
-                                "category": item1.get("Category", ""),
-                                "price": item1.get("FinalUnitPrice", 0),
-                            },
-                            {
-                                "sku": sku2,
-                                "title": item2.get("ItemTitle", ""),
-                                "category": item2.get("Category", ""),
-                                "price": item2.get("FinalUnitPrice", 0),
-                            },
-                        ],
-                        "frequency": frequency,
-                        "confidence": min(0.95, confidence),
-                        "lift": lift,
-                        "description": f"{item1.get('Category', 'Item')} + {item2.get('Category', 'Item')} bundle",
-                    }
-                )
 
-        return bundles[:20]  # Top 20 complementary bundles
+        return bundles
 
     def find_volume_bundles(self):
         """Find volume bundle opportunities"""
@@ -324,7 +338,7 @@ class EcommerceBundlingSystem:
 
         # Analyze products with high repeat purchase rates
         sku_stats = (
-            self.processed_data.groupby("SKU")
+            self.processed_data.groupby("SKU", observed=True)
             .agg(
                 {
                     "Quantity": ["sum", "mean", "count"],
@@ -457,7 +471,7 @@ class EcommerceBundlingSystem:
 
         # Calculate product metrics
         product_metrics = (
-            self.processed_data.groupby("SKU")
+            self.processed_data.groupby("SKU", observed=True)
             .agg(
                 {
                     "ProfitMargin": "mean",
@@ -146,6 +146,28 @@ export default function BundlesPage() {
   };
   
 
+  // Poll a generation job, backing off from 500 ms to 5 s, for at most 5 minutes
+  const waitForJob = async (jobId: string, timeoutMs = 5 * 60 * 1000): Promise<FlaskResponse> => {
+    const deadline = Date.now() + timeoutMs
+    let delay = 500
+    while (Date.now() < deadline) {
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/bundles/jobs/${jobId}`)
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`)
+      }
+      const job = await response.json()
+      if (job.status === 'succeeded') {
+        return job.result
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to generate bundles')
+      }
+      await new Promise((resolve) => setTimeout(resolve, Math.min(delay, Math.max(deadline - Date.now(), 0))))
+      delay = Math.min(delay * 1.5, 5000)
+    }
+    throw new Error('Bundle generation is taking too long. Please try again later.')
+  }
+
   // Generate bundles with default parameters (for main button)
   const generateDefaultBundles = async () => {
     try {
@@ -160,7 +182,9 @@ export default function BundlesPage() {
         throw new Error(`HTTP error! status: ${response.status}`)
       }
 
-      const data: FlaskResponse = await response.json()
+      // Generation runs as a background job; poll it until it finishes
+      const { job_id } = await response.json()
+      const data: FlaskResponse = await waitForJob(job_id)
       const validBundles = data.bundles.filter(
         (bundle: FlaskBundle) =>
           bundle.items.reduce((acc: number, item: any) => acc + item.qty, 0) >= 2
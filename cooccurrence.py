@@ -0,0 +1,67 @@
+import numpy as np
+from scipy import sparse
+
+
+def incidence_matrix(order_codes, sku_codes, n_orders=None, n_skus=None):
+    """
+    Build the binary order x SKU incidence matrix (CSR) from per-line integer codes.
+
+    Lines with a missing code (-1) are dropped and a SKU appearing on several lines of the
+    same order counts once, so X[o, s] == 1 means "order o contains SKU s". Sizes not given
+    are taken from the largest code, and are 0 when there are no lines (e.g. an empty batch).
+    """
+    order_codes = np.asarray(order_codes, dtype=np.int64)
+    sku_codes = np.asarray(sku_codes, dtype=np.int64)
+    valid = (order_codes >= 0) & (sku_codes >= 0)
+    rows, cols = order_codes[valid], sku_codes[valid]
+    if n_orders is None:
+        n_orders = int(rows.max()) + 1 if len(rows) else 0
+    if n_skus is None:
+        n_skus = int(cols.max()) + 1 if len(cols) else 0
+
+    X = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_orders, n_skus)
+    )
+    X.sum_duplicates()
+    X.data[:] = 1
+    return X
+
+
+def pair_counts(X, min_count=1):
+    """
+    Count every SKU pair in one sparse product: (X^T X)[i, j] is the number of orders that
+    contain both i and j. Returns (i, j, counts) arrays for the upper triangle (i < j) with
+    counts >= min_count.
+    """
+    C = (X.T @ X).tocoo()
+    keep = (C.row < C.col) & (C.data >= min_count)
+    return C.row[keep], C.col[keep], C.data[keep]
+
+
+def item_order_counts(X):
+    """Number of orders containing each SKU (column sums of the incidence matrix)"""
+    return np.asarray(X.sum(axis=0)).ravel()
+
+
+def pair_metrics(i, j, counts, item_orders, n_orders):
+    """
+    Vectorized association metrics for pair arrays.
+
+    support = count / n_orders, confidence = count / min(orders(i), orders(j)) and
+    lift = count * n_orders / (orders(i) * orders(j)).
+    """
+    counts = counts.astype(np.float64)
+    orders_i = item_orders[i].astype(np.float64)
+    orders_j = item_orders[j].astype(np.float64)
+    support = counts / n_orders
+    confidence = counts / np.minimum(orders_i, orders_j)
+    lift = counts * n_orders / (orders_i * orders_j)
+    return support, confidence, lift
+
+
+def top_k(scores, k):
+    """Indices of the k largest scores, best first, via a partial sort"""
+    if len(scores) <= k:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
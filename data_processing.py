@@ -1,59 +1,183 @@
 import pandas as pd
-import itertools
-from collections import Counter
+import argparse
 import os
+import sys
 
-# --- Load and prepare order data ---
-orders_df = pd.read_excel('excel/Orders.xlsx')
-orders_df['SKU'] = orders_df['SKU'].astype(str)
-
-# Map SKU to latest price and name (from most recent order)
-sku_to_price = orders_df.sort_values('CreatedDate').groupby('SKU')['FinalUnitPrice'].last().to_dict()
-sku_to_title = orders_df.drop_duplicates('SKU').set_index('SKU')['Item title'].to_dict()
-
-# --- Build bundle counters for different sizes ---
-order_products = orders_df.groupby('OrderNumber')['SKU'].apply(set)
-bundle_counters = {n: Counter() for n in range(2, 6)}  # For 2-5 item bundles
-
-for products in order_products:
-    products = sorted(products)
-    for n in range(2, 6):
-        for combo in itertools.combinations(products, n):
-            bundle_counters[n][combo] += 1
-
-# --- Construct DataFrames per bundle size ---
-sheets = {}
-max_rows_per_sheet = 10000  # Safety limit (optional, adjust as needed)
-discount_range = range(25, 35)  # 25% up to 34%
-
-for n in range(2, 6):
-    results = []
-    for bundle, count in bundle_counters[n].items():
-        if count >= 5:  # Only bundles bought together at least 5 times!
-            names = [sku_to_title.get(sku, "") for sku in bundle]
-            prices = [sku_to_price.get(sku, 0) for sku in bundle]
-            orig_sum = sum(prices)
-            if orig_sum > 0 and all(price > 0 for price in prices):
-                bundle_data = {
-                    'SKUs': ', '.join(bundle),
-                    'Products': ', '.join(names),
-                    'Count': count,
-                    'Bundle Size': n,
-                    'Original Total Price': orig_sum
-                }
-                # Add suggested prices for each margin/discount
-                for discount in discount_range:
-                    bundle_data[f'Suggested Price ({discount}% off)'] = round(orig_sum * (1 - discount / 100), 2)
-                results.append(bundle_data)
-    df = pd.DataFrame(results).sort_values('Count', ascending=False).reset_index(drop=True)
-    df = df.head(max_rows_per_sheet)
-    sheets[f'Bundles_{n}'] = df
-
-# --- Write each bundle size to a different sheet ---
-outfile = 'excel/product_bundle_suggestions.xlsx'
-with pd.ExcelWriter(outfile, engine='openpyxl') as writer:
-    for sheetname, df in sheets.items():
-        df.to_excel(writer, sheet_name=sheetname, index=False)
-
-print(f"Excel file saved: {os.path.abspath(outfile)} with sheets: {', '.join(sheets.keys())}")
+# Shared orders schema lives in the server package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server"))
+from app.orders_schema import read_orders, sku_dictionary  # noqa: E402
+from app.blueprints.bundles.candidate_store import PRICES_SHEET, candidates_path, write_candidates  # noqa: E402
+from app.blueprints.bundles.store import db_connection  # noqa: E402
+from fp_growth import fp_growth  # noqa: E402
+from itemset_store import ItemsetStore  # noqa: E402
+from parallel_counting import baskets_from_codes, count_itemsets, merge_shards  # noqa: E402
+from sketches import ApproximateItemsetCounter  # noqa: E402
 
+BUNDLE_SIZES = range(2, 6)  # For 2-5 item bundles
+MIN_BUNDLE_COUNT = 5  # Only bundles bought together at least 5 times!
+MAX_ROWS_PER_SHEET = 10000  # Safety limit (optional, adjust as needed)
+
+
+def load_orders(path='excel/Orders.xlsx'):
+    """Load orders and map SKU to latest price and name (from most recent order)"""
+    orders_df = read_orders(path)
+    # Prices are float32 in the frame; round back to cents for the output sheets
+    sku_to_price = orders_df.sort_values('CreatedDate').groupby('SKU', observed=True)['FinalUnitPrice'].last().astype('float64').round(2).to_dict()
+    sku_to_title = orders_df.drop_duplicates('SKU').set_index('SKU')['Item title'].to_dict()
+    return orders_df, sku_to_price, sku_to_title
+
+
+def count_bundles(order_products, min_count=MIN_BUNDLE_COUNT, sizes=BUNDLE_SIZES):
+    """
+    Count every SKU combination of the given sizes bought together at least min_count times.
+
+    Uses FP-Growth, so the min_count threshold and the maximum size prune the search while
+    mining instead of enumerating every combination of every basket first.
+    Returns {size: {sorted SKU tuple: count}}.
+    """
+    bundle_counters = {n: {} for n in sizes}
+    for combo, count in fp_growth(order_products, min_count, max_len=max(sizes), min_len=min(sizes)):
+        if len(combo) in bundle_counters:
+            bundle_counters[len(combo)][combo] = count
+    return bundle_counters
+
+
+def count_bundles_parallel(orders_df, workers, min_count=MIN_BUNDLE_COUNT, sizes=BUNDLE_SIZES, shard_dir=None):
+    """
+    Count bundles on a process pool (see parallel_counting): singles and pairs per shard of
+    orders, larger bundles with FP-Growth partitioned by SKU, pruned at min_count.
+    With shard_dir the shard counts are kept so they can be merged with other runs.
+    """
+    order_codes, _ = pd.factorize(orders_df['OrderNumber'])
+    sku_codes, skus = sku_dictionary(orders_df)
+    baskets = baskets_from_codes(order_codes, sku_codes)
+    # Pruning rare SKUs up front is only exact when these counts are not merged with others
+    min_item_count = 1 if shard_dir else min_count
+    counts = count_itemsets(baskets, skus, sizes, workers, shard_dir, min_item_count, min_count)
+    return counts.to_counters(min_count, sizes)
+
+
+def count_bundles_approximate(orders_df, memory_mb, min_count=MIN_BUNDLE_COUNT, sizes=BUNDLE_SIZES):
+    """
+    Count bundles within a fixed memory budget using Count-Min and Space-Saving sketches
+    (see sketches.py). Returns (bundle_counters, lower_bounds, counter): counts may
+    overestimate, lower_bounds[n][bundle] is a guaranteed minimum, and counter reports
+    the error bounds.
+    """
+    order_codes, _ = pd.factorize(orders_df['OrderNumber'])
+    sku_codes, skus = sku_dictionary(orders_df)
+    counter = ApproximateItemsetCounter(sizes, memory_mb).update(baskets_from_codes(order_codes, sku_codes))
+    bundle_counters, lower_bounds = {}, {}
+    for n in sizes:
+        bundle_counters[n], lower_bounds[n] = {}, {}
+        for codes, count, lower in counter.frequent(n, min_count):
+            bundle = tuple(sorted(skus[list(codes)]))
+            bundle_counters[n][bundle] = count
+            lower_bounds[n][bundle] = lower
+    return bundle_counters, lower_bounds, counter
+
+
+def build_bundle_sheets(bundle_counters, sku_to_price, sku_to_title, min_count=MIN_BUNDLE_COUNT, lower_bounds=None):
+    """
+    Construct the Bundles_N DataFrames, one per bundle size, plus the unit price of every SKU
+    they contain (PRICES_SHEET). Prices for a discount are derived from Original Total Price
+    when the optimizer runs. With lower_bounds (approximate counting) each row also gets the
+    guaranteed minimum of its Count.
+    """
+    sheets = {}
+    for n, counter in bundle_counters.items():
+        results = []
+        for bundle, count in counter.items():
+            if count >= min_count:
+                names = [sku_to_title.get(sku, "") for sku in bundle]
+                prices = [sku_to_price.get(sku, 0) for sku in bundle]
+                orig_sum = sum(prices)
+                if orig_sum > 0 and all(price > 0 for price in prices):
+                    bundle_data = {
+                        'SKUs': ', '.join(bundle),
+                        'Products': ', '.join(names),
+                        'Count': count,
+                        'Bundle Size': n,
+                        'Original Total Price': orig_sum
+                    }
+                    if lower_bounds is not None:
+                        bundle_data['Count Lower Bound'] = lower_bounds[n][bundle]
+                    results.append(bundle_data)
+        df = pd.DataFrame(results)
+        if not df.empty:
+            # Ties ordered by SKUs so the sheets do not depend on mining order
+            df = df.sort_values(['Count', 'SKUs'], ascending=[False, True]).reset_index(drop=True)
+        df = df.head(MAX_ROWS_PER_SHEET)
+        sheets[f'Bundles_{n}'] = df
+    skus = sorted({sku for df in sheets.values() if not df.empty for skus in df['SKUs'] for sku in skus.split(', ')})
+    sheets[PRICES_SHEET] = pd.DataFrame({'SKU': skus, 'Unit Price': [sku_to_price[sku] for sku in skus]})
+    return sheets
+
+
+def write_bundle_sheets(sheets, outfile='excel/product_bundle_suggestions.xlsx'):
+    """Write each bundle size to a different sheet, and index the same rows in the candidate store"""
+    with pd.ExcelWriter(outfile, engine='openpyxl') as writer:
+        for sheetname, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheetname, index=False)
+    print(f"Excel file saved: {os.path.abspath(outfile)} with sheets: {', '.join(sheets.keys())}")
+
+    # optimize_bundles reads the candidate store; recording the workbook's mtime marks it current
+    store_path = candidates_path(outfile)
+    with db_connection(store_path) as conn:
+        write_candidates(conn, sheets, source_mtime_ns=os.stat(outfile).st_mtime_ns)
+    print(f"Candidate store saved: {os.path.abspath(store_path)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine frequently co-purchased SKU bundles from Orders.xlsx")
+    parser.add_argument('--orders', default='excel/Orders.xlsx')
+    parser.add_argument('--outfile', default='excel/product_bundle_suggestions.xlsx')
+    parser.add_argument('--min-count', type=int, default=MIN_BUNDLE_COUNT)
+    parser.add_argument('--workers', type=int, default=1, help="Count on a process pool with this many workers")
+    parser.add_argument('--shard-dir', help="Also write the per-shard counts (.npz) here for merging later")
+    parser.add_argument('--shards', nargs='+', help="Build the sheets from already counted shard files")
+    parser.add_argument('--incremental', action='store_true', help="Fold orders past the store's watermark into the itemset store")
+    parser.add_argument('--from-store', action='store_true', help="Rebuild the sheets from the itemset store without reading orders")
+    parser.add_argument('--store', help="Itemset store file (default: ITEMSET_STORE_PATH)")
+    parser.add_argument('--approximate', action='store_true', help="Count with bounded-memory sketches instead of exactly")
+    parser.add_argument('--memory-mb', type=float, default=256, help="Memory cap for --approximate")
+    args = parser.parse_args()
+
+    if args.incremental or args.from_store:
+        store = ItemsetStore.load(args.store)
+        if args.incremental:
+            orders_df = read_orders(args.orders)
+            new_orders = store.fold_in(orders_df, args.workers)
+            store.save(args.store)
+            print(f"Folded {new_orders} new orders into the itemset store (watermark {store.watermark})")
+        sheets = build_bundle_sheets(store.bundle_counters(args.min_count, BUNDLE_SIZES), store.prices, store.titles, args.min_count)
+        write_bundle_sheets(sheets, args.outfile)
+        return
+
+    # --- Load and prepare order data ---
+    orders_df, sku_to_price, sku_to_title = load_orders(args.orders)
+
+    # --- Build bundle counters for different sizes ---
+    lower_bounds = None
+    if args.approximate:
+        bundle_counters, lower_bounds, counter = count_bundles_approximate(orders_df, args.memory_mb, args.min_count)
+        for n in BUNDLE_SIZES:
+            missing = "none missed" if counter.complete(n, args.min_count) else f"bundles bought up to {counter.missed_bound(n)} times may be missing"
+            print(f"Bundles_{n}: Count overestimates by at most {counter.count_min[n].error_bound:.1f} (98% confidence), {missing}")
+    elif args.shards:
+        bundle_counters = merge_shards(args.shards).to_counters(args.min_count, BUNDLE_SIZES)
+    elif args.workers > 1 or args.shard_dir:
+        bundle_counters = count_bundles_parallel(orders_df, args.workers, args.min_count, shard_dir=args.shard_dir)
+    else:
+        order_products = orders_df.groupby('OrderNumber', observed=True)['SKU'].apply(set)
+        bundle_counters = count_bundles(order_products, args.min_count)
+
+    # --- Construct DataFrames per bundle size ---
+    sheets = build_bundle_sheets(bundle_counters, sku_to_price, sku_to_title, args.min_count, lower_bounds)
+
+    # --- Write each bundle size to a different sheet ---
+    write_bundle_sheets(sheets, args.outfile)
+
+
+if __name__ == "__main__":
+    main()
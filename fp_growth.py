@@ -0,0 +1,112 @@
+from collections import Counter
+
+
+class _Node:
+    __slots__ = ("item", "count", "parent", "children", "link")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+        self.link = None
+
+
+def _build_tree(weighted_transactions, min_support, rank=None):
+    """
+    Build an FP-tree from (items, count) pairs, keeping only items with support >= min_support.
+
+    Returns the header table {item: [support, first_node]} ordered from least to most frequent,
+    which is the order the miner walks it in. Items inside each transaction are inserted from
+    most to least frequent so that common prefixes share nodes. rank ({item: position}, most
+    frequent first) fixes that order instead of ranking by the support seen here.
+    """
+    support = Counter()
+    for items, count in weighted_transactions:
+        for item in items:
+            support[item] += count
+    frequent = {item: s for item, s in support.items() if s >= min_support}
+    if not frequent:
+        return {}
+
+    if rank is None:
+        # Rank by descending support
+        rank = {item: r for r, item in enumerate(sorted(frequent, key=lambda i: -frequent[i]))}
+    else:
+        rank = {item: rank[item] for item in frequent}
+    header = {item: [frequent[item], None] for item in sorted(rank, key=rank.get, reverse=True)}
+
+    root = _Node(None, None)
+    for items, count in weighted_transactions:
+        node = root
+        for item in sorted((i for i in items if i in rank), key=rank.get):
+            child = node.children.get(item)
+            if child is None:
+                child = _Node(item, node)
+                node.children[item] = child
+                child.link = header[item][1]
+                header[item][1] = child
+            child.count += count
+            node = child
+    return header
+
+
+def _mine(header, suffix, min_support, max_len):
+    for item, (support, node) in header.items():
+        itemset = suffix + (item,)
+        yield itemset, support
+        if len(itemset) >= max_len:
+            continue
+
+        # Conditional pattern base: the prefix path of every node holding this item
+        conditional = []
+        while node is not None:
+            path = []
+            parent = node.parent
+            while parent is not None and parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                conditional.append((path, node.count))
+            node = node.link
+
+        conditional_header = _build_tree(conditional, min_support)
+        if conditional_header:
+            yield from _mine(conditional_header, itemset, min_support, max_len)
+
+
+def fp_growth(transactions, min_support, max_len=None, min_len=1):
+    """
+    Mine frequent itemsets with FP-Growth.
+
+    transactions is an iterable of item collections (e.g. the SKU set of each order).
+    Identical baskets are merged before the tree is built, and min_support is applied while
+    mining, so infrequent itemsets are never materialized. Memory is bounded by the
+    compressed FP-tree rather than by the number of candidate combinations.
+
+    Yields (itemset, count) with itemset as a sorted tuple, for every itemset whose count is
+    at least min_support and whose length is between min_len and max_len.
+    """
+    baskets = Counter(frozenset(items) for items in transactions)
+    max_len = max_len or max((len(b) for b in baskets), default=0)
+    header = _build_tree(list(baskets.items()), min_support)
+    for itemset, count in _mine(header, (), min_support, max_len):
+        if len(itemset) >= min_len:
+            yield tuple(sorted(itemset)), count
+
+
+def fp_growth_partition(weighted_transactions, min_support, rank, items, max_len, min_len=1):
+    """
+    Mine the frequent itemsets whose least frequent member (by rank, most frequent first) is
+    one of items: one partition of parallel FP-Growth.
+
+    weighted_transactions are (items, count) pairs holding, for every order that contains
+    one of items, the order's items up to its last member of items in rank order. Every
+    itemset belongs to exactly one partition, so the partitions' results add up to the
+    result of fp_growth over all orders.
+    """
+    header = _build_tree(list(weighted_transactions), min_support, rank)
+    owned = {item: entry for item, entry in header.items() if item in items}
+    for itemset, count in _mine(owned, (), min_support, max_len):
+        if len(itemset) >= min_len:
+            yield tuple(sorted(itemset)), count
@@ -0,0 +1,122 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from parallel_counting import ItemsetCounts, baskets_from_codes, count_itemsets, merge_counts
+
+# Running co-purchase counts for every itemset size the bundle sheets use, plus singles
+STORE_PATH = os.environ.get("ITEMSET_STORE_PATH", os.path.join("excel", ".itemsets", "store.npz"))
+STORE_SIZES = range(1, 6)
+
+logger = logging.getLogger(__name__)
+
+
+class ItemsetStore:
+    """
+    Exact itemset counts over every order processed so far, with the watermark of the
+    newest order folded in and the latest known price and title of each SKU.
+
+    Nothing is pruned when a batch is folded in: a bundle bought once a day has to keep its
+    daily counts to ever reach a threshold, so thresholds are only applied to the merged
+    totals, on read. The store grows with the distinct itemsets bought, not with the orders.
+
+    The watermark is the (CreatedDate, OrderNumber) key of the last processed order, the
+    same ordering db.py uses for incremental loads: any order with a larger key is new.
+    Everything lives in one .npz file, replaced atomically, so the counts and the
+    watermark can never disagree after a crash.
+    """
+
+    def __init__(self, counts=None, watermark=None, prices=None, titles=None):
+        self.counts = counts or ItemsetCounts([])
+        self.watermark = watermark
+        self.prices = prices or {}
+        self.titles = titles or {}
+
+    @classmethod
+    def load(cls, path=None):
+        """Load the store, or return an empty one when nothing has been processed yet"""
+        path = path or STORE_PATH
+        if not os.path.exists(path):
+            return cls()
+        counts = ItemsetCounts.load(path)
+        with np.load(path, allow_pickle=False) as data:
+            watermark = None
+            if str(data["watermark_order"]):
+                watermark = (pd.Timestamp(str(data["watermark_date"])), str(data["watermark_order"]))
+            catalog = data["catalog_skus"].tolist()
+            prices = {sku: p for sku, p in zip(catalog, data["catalog_prices"].tolist()) if p == p}
+            titles = dict(zip(catalog, data["catalog_titles"].tolist()))
+        return cls(counts, watermark, prices, titles)
+
+    def save(self, path=None):
+        path = path or STORE_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        catalog = sorted(set(self.prices) | set(self.titles))
+        date, order = self.watermark or ("", "")
+        extra = {
+            "watermark_date": np.str_(pd.Timestamp(date).isoformat() if date != "" else ""),
+            "watermark_order": np.str_(order),
+            "catalog_skus": np.array(catalog, dtype=str),
+            "catalog_prices": np.array([self.prices.get(sku, np.nan) for sku in catalog], dtype=np.float64),
+            "catalog_titles": np.array([self.titles.get(sku, "") for sku in catalog], dtype=str),
+        }
+        return self.counts.save(path, extra)
+
+    def new_orders(self, orders_df):
+        """Lines of orders_df belonging to orders past the watermark"""
+        order_dates = orders_df.groupby("OrderNumber", observed=True)["CreatedDate"].max()
+        if self.watermark is None:
+            new = order_dates.index
+        else:
+            date, order = self.watermark
+            numbers = order_dates.index.astype(str)
+            after = (order_dates > date) | ((order_dates == date) & (numbers > order))
+            new = order_dates.index[after.to_numpy()]
+        return orders_df[orders_df["OrderNumber"].isin(new)]
+
+    def fold_in(self, orders_df, workers=1):
+        """
+        Count the itemsets of orders past the watermark and add them to the store.
+
+        Returns the number of new orders. Only the delta is counted; it is merged into the
+        running counts exactly, so folding in orders one batch at a time gives the same
+        counts as counting the full history at once. Lines without a SKU or CreatedDate and
+        orders at or before the watermark are skipped and logged.
+        """
+        missing = orders_df["SKU"].isna() | orders_df["CreatedDate"].isna()
+        if missing.any():
+            logger.warning(f"Skipped {int(missing.sum())} order lines without a SKU or CreatedDate")
+            orders_df = orders_df[~missing]
+        delta = self.new_orders(orders_df)
+        if len(delta) < len(orders_df):
+            old_orders = orders_df["OrderNumber"].nunique() - delta["OrderNumber"].nunique()
+            logger.warning(
+                f"Skipped {old_orders} orders ({len(orders_df) - len(delta)} lines) at or before the watermark {self.watermark}"
+            )
+        if delta.empty:
+            return 0
+
+        order_codes, _ = pd.factorize(delta["OrderNumber"])
+        skus = np.asarray(pd.Index(delta["SKU"].astype(str).unique()).sort_values(), dtype=object)
+        sku_codes = pd.Index(skus).get_indexer(delta["SKU"].astype(str)).astype(np.int32)
+        baskets = baskets_from_codes(order_codes, sku_codes)
+        delta_counts = count_itemsets(baskets, skus, STORE_SIZES, workers)
+        self.counts = merge_counts([self.counts, delta_counts]) if self.counts.sizes else delta_counts
+
+        # Latest price wins; a SKU keeps the title it was first seen with
+        latest = delta.sort_values("CreatedDate").groupby("SKU", observed=True).last()
+        self.prices.update(latest["FinalUnitPrice"].dropna().astype("float64").round(2).to_dict())
+        if "Item title" in delta.columns:
+            first_titles = delta.drop_duplicates("SKU").set_index("SKU")["Item title"].fillna("").astype(str)
+            for sku, title in first_titles.items():
+                self.titles.setdefault(sku, title)
+
+        last = delta.assign(OrderKey=delta["OrderNumber"].astype(str)).sort_values(["CreatedDate", "OrderKey"]).iloc[-1]
+        self.watermark = (pd.Timestamp(last["CreatedDate"]), last["OrderKey"])
+        return len(baskets)
+
+    def bundle_counters(self, min_count, sizes):
+        """{size: {sorted SKU tuple: count}} for itemsets bought together at least min_count times"""
+        return self.counts.to_counters(min_count, sizes)
@@ -0,0 +1,323 @@
+import argparse
+import heapq
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+from cooccurrence import incidence_matrix, item_order_counts, pair_counts
+from fp_growth import fp_growth_partition
+
+# Shards handed to the pool per worker; more shards than workers lets a worker that drew
+# small baskets pick up another shard instead of idling
+SHARDS_PER_WORKER = 4
+
+
+class ItemsetCounts:
+    """
+    Exact itemset counts in a compact, mergeable form.
+
+    skus is the vocabulary (SKU strings); for every itemset size n, items[n] is an int32
+    array of shape (k, n) holding sorted vocabulary indices and counts[n] the int64 number of
+    orders containing each itemset. n_orders is the number of orders that were counted.
+
+    Singles and pairs are stored unpruned. Itemsets of 3 or more SKUs are only stored when
+    bought together at least min_count times (1: all of them), which keeps their number
+    bounded by the data rather than by the combinations of every basket. Thresholds at or
+    above min_count are applied on read.
+    """
+
+    def __init__(self, skus, n_orders=0, items=None, counts=None, min_count=1):
+        self.skus = np.asarray(skus, dtype=object)
+        self.n_orders = int(n_orders)
+        self.items = items or {}
+        self.counts = counts or {}
+        self.min_count = int(min_count)
+
+    @property
+    def sizes(self):
+        return sorted(self.items)
+
+    def save(self, path, extra=None):
+        """Write the counts (plus any extra named arrays) to a compressed .npz shard"""
+        arrays = dict(extra or {})
+        arrays.update(
+            skus=self.skus.astype(str), n_orders=np.int64(self.n_orders), min_count=np.int64(self.min_count)
+        )
+        for n in self.sizes:
+            arrays[f"items_{n}"] = self.items[n]
+            arrays[f"counts_{n}"] = self.counts[n]
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            items, counts = {}, {}
+            for key in data.files:
+                if key.startswith("items_"):
+                    n = int(key.split("_", 1)[1])
+                    items[n] = data[key]
+                    counts[n] = data[f"counts_{n}"]
+            min_count = int(data["min_count"]) if "min_count" in data.files else 1
+            return cls(data["skus"].astype(object), int(data["n_orders"]), items, counts, min_count)
+
+    def itemsets(self, n, min_count=1):
+        """
+        Yield (SKU tuple, count) for itemsets of size n with count >= min_count. SKUs are
+        sorted as strings, matching the itemsets fp_growth yields.
+        """
+        if n not in self.items:
+            return
+        keep = self.counts[n] >= min_count
+        for row, count in zip(self.items[n][keep], self.counts[n][keep]):
+            yield tuple(sorted(self.skus[row])), int(count)
+
+    def to_counters(self, min_count=1, sizes=None):
+        """Return {size: {sorted SKU tuple: count}}, the shape data_processing builds sheets from"""
+        sizes = self.sizes if sizes is None else sizes
+        return {n: dict(self.itemsets(n, min_count)) for n in sizes}
+
+
+def merge_counts(parts):
+    """
+    Merge ItemsetCounts into one. Parts may use different vocabularies (e.g. shards counted
+    on other machines): SKUs are remapped onto the sorted union before equal itemsets are
+    summed.
+
+    The parts of one count_itemsets run merge exactly. Parts counted over different orders
+    merge exactly for singles and pairs; an itemset of 3 or more SKUs is missing from a part
+    where it stayed below that part's min_count, so its merged count is a lower bound.
+    """
+    parts = list(parts)
+    if not parts:
+        return ItemsetCounts([])
+    skus = parts[0].skus
+    shared_vocabulary = all(
+        len(p.skus) == len(skus) and (p.skus == skus).all() for p in parts[1:]
+    )
+    if not shared_vocabulary:
+        skus = np.asarray(sorted(set().union(*(p.skus.tolist() for p in parts))), dtype=object)
+        index = pd.Index(skus)
+
+    items, counts = {}, {}
+    for n in sorted(set().union(*(p.items for p in parts))):
+        rows, weights = [], []
+        for part in parts:
+            if n not in part.items or not len(part.items[n]):
+                continue
+            part_rows = part.items[n]
+            if not shared_vocabulary:
+                remap = index.get_indexer(part.skus).astype(np.int32)
+                part_rows = np.sort(remap[part_rows], axis=1)
+            rows.append(part_rows)
+            weights.append(part.counts[n])
+        if not rows:
+            items[n] = np.empty((0, n), dtype=np.int32)
+            counts[n] = np.empty(0, dtype=np.int64)
+            continue
+        merged, inverse = np.unique(np.concatenate(rows), axis=0, return_inverse=True)
+        summed = np.zeros(len(merged), dtype=np.int64)
+        np.add.at(summed, inverse.ravel(), np.concatenate(weights))
+        items[n], counts[n] = merged.astype(np.int32), summed
+
+    min_count = max(p.min_count for p in parts)
+    return ItemsetCounts(skus, sum(p.n_orders for p in parts), items, counts, min_count)
+
+
+def merge_shards(paths):
+    """Load and merge .npz shard files"""
+    return merge_counts(ItemsetCounts.load(path) for path in paths)
+
+
+def baskets_from_codes(order_codes, sku_codes):
+    """
+    Group per-line integer codes into baskets: one sorted array of distinct SKU codes per
+    order. Lines with a missing order or SKU (-1) are dropped.
+    """
+    order_codes = np.asarray(order_codes)
+    sku_codes = np.asarray(sku_codes)
+    valid = (order_codes >= 0) & (sku_codes >= 0)
+    lines = np.unique(np.stack([order_codes[valid], sku_codes[valid]], axis=1), axis=0)
+    starts = np.flatnonzero(np.r_[True, lines[1:, 0] != lines[:-1, 0]])
+    return np.split(lines[:, 1].astype(np.int32), starts[1:]) if len(lines) else []
+
+
+def _basket_cost(size, sizes):
+    return sum(comb(size, n) for n in sizes) or 1
+
+
+def shard_baskets(baskets, n_shards, sizes):
+    """
+    Partition baskets into n_shards with similar work. A basket of k SKUs costs C(k, n)
+    per counted size, so a handful of large orders dominates; baskets are dealt out
+    largest first to the least loaded shard.
+    """
+    shards = [[] for _ in range(n_shards)]
+    load = [(0, i) for i in range(n_shards)]
+    for basket in sorted(baskets, key=len, reverse=True):
+        cost, i = heapq.heappop(load)
+        shards[i].append(basket)
+        heapq.heappush(load, (cost + _basket_cost(len(basket), sizes), i))
+    return shards
+
+
+def count_shard(baskets, skus, sizes, shard_path=None):
+    """Count every single SKU and pair (sizes 1 and 2) in one shard of baskets, from the sparse incidence matrix"""
+    items, counts = {}, {}
+    if baskets:
+        order_codes = np.repeat(np.arange(len(baskets)), [len(b) for b in baskets])
+        X = incidence_matrix(order_codes, np.concatenate(baskets), len(baskets), len(skus))
+        if 1 in sizes:
+            item_orders = item_order_counts(X)
+            present = np.flatnonzero(item_orders)
+            items[1] = present.astype(np.int32).reshape(-1, 1)
+            counts[1] = item_orders[present].astype(np.int64)
+        if 2 in sizes:
+            i, j, pair_count = pair_counts(X)
+            items[2] = np.stack([i, j], axis=1).astype(np.int32)
+            counts[2] = pair_count.astype(np.int64)
+    for n in sizes:
+        items.setdefault(n, np.empty((0, n), dtype=np.int32))
+        counts.setdefault(n, np.empty(0, dtype=np.int64))
+
+    result = ItemsetCounts(skus, len(baskets), items, counts)
+    if shard_path:
+        result.save(shard_path)
+    return result
+
+
+def partition_transactions(baskets, rank, n_parts, min_len):
+    """
+    Split baskets into the transactions of n_parts parallel FP-Growth partitions. SKUs are
+    assigned to partitions round-robin by rank (rank[code] is the SKU's position by
+    descending support, -1 for SKUs too rare to be in any frequent itemset). An order goes
+    to every partition owning one of its SKUs, cut after its last SKU owned there; cuts
+    shorter than min_len cannot hold a wanted itemset and are left out. Identical cuts are
+    merged into one weighted transaction.
+    """
+    parts = [Counter() for _ in range(n_parts)]
+    for basket in baskets:
+        ranks = np.sort(rank[basket])
+        ranks = ranks[ranks >= 0].tolist()
+        seen = set()
+        for end in range(len(ranks), min_len - 1, -1):
+            part = ranks[end - 1] % n_parts
+            if part not in seen:
+                seen.add(part)
+                parts[part][tuple(ranks[:end])] += 1
+    return parts
+
+
+def mine_partition(transactions, skus, sizes, min_count, by_rank, n_parts, part, shard_path=None):
+    """
+    Itemsets of the given sizes (3 or more SKUs) bought together at least min_count times
+    whose least frequent SKU belongs to partition part. transactions come from
+    partition_transactions and hold ranks; by_rank maps ranks back to SKU codes.
+    """
+    owned = set(range(part, len(by_rank), n_parts))
+    found = {n: [] for n in sizes}
+    counts = {n: [] for n in sizes}
+    for itemset, count in fp_growth_partition(
+        transactions.items(), min_count, {r: r for r in range(len(by_rank))}, owned, max(sizes), min(sizes)
+    ):
+        if len(itemset) in found:
+            found[len(itemset)].append(np.sort(by_rank[list(itemset)]))
+            counts[len(itemset)].append(count)
+    items = {n: np.array(found[n], dtype=np.int32).reshape(-1, n) for n in sizes}
+    counts = {n: np.array(counts[n], dtype=np.int64) for n in sizes}
+
+    result = ItemsetCounts(skus, 0, items, counts, min_count)
+    if shard_path:
+        result.save(shard_path)
+    return result
+
+
+def count_itemsets(baskets, skus, sizes=range(1, 6), workers=None, shard_dir=None, min_item_count=1, min_count=1):
+    """
+    Count itemsets of the given sizes across a process pool.
+
+    baskets are arrays of sorted SKU codes indexing into skus (see baskets_from_codes).
+    Singles and pairs are counted exactly from shards of baskets of similar cost. Larger
+    itemsets are mined with parallel FP-Growth: SKUs are split into partitions, each
+    partition mines the itemsets whose least frequent SKU it owns, at min_count, so
+    itemsets bought together fewer times are pruned while mining instead of enumerated.
+    Every task runs in its own process and the results are merged. With shard_dir every
+    task's counts are also written there as shard-NNNN.npz, to be merged later.
+
+    min_item_count drops SKUs bought in fewer orders before counting. No itemset containing
+    such a SKU can reach that count, so results are unchanged at or above the threshold;
+    leave it at 1 when the shards will be merged with other machines' shards, since a SKU
+    can be rare here and frequent overall.
+    """
+    sizes = sorted(sizes)
+    small = [n for n in sizes if n <= 2]
+    large = [n for n in sizes if n >= 3]
+    workers = workers or os.cpu_count() or 1
+    baskets = [b for b in baskets if len(b)]
+    n_orders = len(baskets)
+
+    if min_item_count > 1 and baskets:
+        support = np.bincount(np.concatenate(baskets), minlength=len(skus))
+        frequent = support >= min_item_count
+        baskets = [b[frequent[b]] for b in baskets]
+        baskets = [b for b in baskets if len(b)]
+
+    tasks = []
+    if small:
+        n_shards = max(1, min(len(baskets), workers * SHARDS_PER_WORKER))
+        for shard in shard_baskets(baskets, n_shards, small):
+            tasks.append((count_shard, (shard, skus, small)))
+    if large and baskets:
+        support = np.bincount(np.concatenate(baskets), minlength=len(skus))
+        frequent = np.flatnonzero(support >= max(min_count, 1))
+        # Most frequent first, ties by code
+        by_rank = frequent[np.lexsort((frequent, -support[frequent]))].astype(np.int32)
+        rank = np.full(len(skus), -1, dtype=np.int64)
+        rank[by_rank] = np.arange(len(by_rank))
+        n_parts = max(1, min(len(by_rank), workers * SHARDS_PER_WORKER))
+        for part, transactions in enumerate(partition_transactions(baskets, rank, n_parts, min(large))):
+            if transactions:
+                tasks.append((mine_partition, (transactions, skus, large, min_count, by_rank, n_parts, part)))
+
+    paths = [None] * len(tasks)
+    if shard_dir:
+        os.makedirs(shard_dir, exist_ok=True)
+        paths = [os.path.join(shard_dir, f"shard-{i:04d}.npz") for i in range(len(tasks))]
+
+    if workers == 1:
+        parts = [task(*args, path) for (task, args), path in zip(tasks, paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(task, *args, path) for (task, args), path in zip(tasks, paths)]
+            parts = [future.result() for future in futures]
+
+    merged = merge_counts(parts) if parts else ItemsetCounts(skus)
+    for n in sizes:
+        merged.items.setdefault(n, np.empty((0, n), dtype=np.int32))
+        merged.counts.setdefault(n, np.empty(0, dtype=np.int64))
+    # Orders emptied by min_item_count still count towards the order total
+    merged.n_orders = n_orders
+    merged.min_count = min_count if large else 1
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge itemset count shards (.npz) into one file")
+    parser.add_argument("output")
+    parser.add_argument("shards", nargs="+")
+    args = parser.parse_args()
+
+    merged = merge_shards(args.shards)
+    merged.save(args.output)
+    sizes = ", ".join(f"{n}: {len(merged.counts[n])}" for n in merged.sizes)
+    print(f"Merged {len(args.shards)} shards over {merged.n_orders} orders into {args.output} ({sizes})")
+
+
+if __name__ == "__main__":
+    main()
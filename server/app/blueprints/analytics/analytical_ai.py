@@ -5,6 +5,8 @@ import json
 import re
 import uuid
 
+from app.llm_cache import cached_completion
+
 def ai_call(
     total_sales: float,
     product_to_clear: str = None,
@@ -12,7 +14,8 @@ def ai_call(
     duration_input = "Estimate based on seasonality and stock", 
     objective_input: str = "Increase average basket value by a target % (e.g., 10%)", 
     bundle_type_input: str = "All", 
-    bundle_size_input: str = "Default (2-5 products)"
+    bundle_size_input: str = "Default (2-5 products)",
+    use_cache: bool = True
 ):
     """
     Calls Azure AI to predict revenue
@@ -26,6 +29,8 @@ def ai_call(
             Defaults to "All"
         bundle_size_input (str, optional): 
             Defaults to "Default (2-5 products)".
+        use_cache (bool, optional): Reuse the cached answer to an identical prompt.
+            Defaults to True.
     """
     load_dotenv()
 
@@ -52,25 +57,31 @@ def ai_call(
         api_version="2024-05-01-preview",
     )
 
-    completion = client.chat.completions.create(
-        model=deployment,
-        messages=[{"role": "user", "content": prompt}],
-        extra_body={
-            "data_sources": [
-                {
-                    "type": "azure_search",
-                    "parameters": {
-                        "endpoint": search_endpoint,
-                        "index_name": search_index,
-                        "authentication": {"type": "api_key", "key": search_key},
-                    },
-                }
-            ]
-        },
-        temperature=0.0, 
-        max_tokens=3000, 
-        )
-    response_content = completion.choices[0].message.content
+    def complete():
+        completion = client.chat.completions.create(
+            model=deployment,
+            messages=[{"role": "user", "content": prompt}],
+            extra_body={
+                "data_sources": [
+                    {
+                        "type": "azure_search",
+                        "parameters": {
+                            "endpoint": search_endpoint,
+                            "index_name": search_index,
+                            "authentication": {"type": "api_key", "key": search_key},
+                        },
+                    }
+                ]
+            },
+            temperature=0.0, 
+            max_tokens=3000, 
+            )
+        return completion.choices[0].message.content
+
+    # Same sales total, same prompt: reuse the answer instead of another round trip
+    params = {"endpoint": endpoint, "search_endpoint": search_endpoint, "search_index": search_index,
+              "temperature": 0.0, "max_tokens": 3000}
+    response_content = cached_completion(deployment, prompt, params, complete, bypass=not use_cache)
     
     print(f"AI Response: {response_content}")
     
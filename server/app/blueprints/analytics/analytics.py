@@ -1,6 +1,6 @@
 import os
 import json
-import pandas as pd
+from app.data_store import load_frame
 
 EXCEL_PATH = "excel/Data.xlsx"
 
@@ -11,8 +11,8 @@ def get_totalsales():
     It reads the chosen bundles from a JSON file and requests a prediction
     """
 
-    # Read the Excel file
-    df = pd.read_excel(EXCEL_PATH)
+    # Read the cached snapshot of the Excel file
+    df = load_frame(EXCEL_PATH)
 
     grouped = df.groupby('OrderNumber', as_index=False)['TotalOrderAmount'].first()
     # Sum the values in the 'TotalOrderAmount' column
@@ -2,13 +2,14 @@ import os
 import json
 import pandas as pd
 from datetime import datetime
+from app.data_store import load_frame
 
 EXCEL_PATH = "excel/Data.xlsx"
 
 def get_price_trend():
     try:
-        # Load the Excel file
-        df = pd.read_excel(EXCEL_PATH)
+        # Load the cached snapshot of the Excel file
+        df = load_frame(EXCEL_PATH)
         
         # Debug: Print column names
         print("Available columns:", df.columns.tolist())
@@ -48,8 +49,8 @@ def get_price_trend():
 
         print(f"Using columns: Date='{date_column}', Amount='{amount_column}', Order='{order_column}'")
         
-        # Ensure the order date column is parsed correctly
-        df[date_column] = pd.to_datetime(df[date_column])
+        # Ensure the order date column is parsed correctly (without mutating the shared frame)
+        df = df.assign(**{date_column: pd.to_datetime(df[date_column])})
         
         # Group by OrderNumber to prevent duplicates
         grouped = df.groupby(order_column, as_index=False).agg({
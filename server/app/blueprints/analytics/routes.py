@@ -21,8 +21,8 @@ def get_analytics_data():
         total_sales = get_totalsales()
         logger.info(f"Total sales: {total_sales}")
 
-        # Get AI prediction
-        prediction_result = ai_call(total_sales)
+        # Get AI prediction; ?use_cache=0 asks the model again instead of reusing its answer
+        prediction_result = ai_call(total_sales, use_cache=request.args.get("use_cache", "1") != "0")
         logger.info(f"AI prediction result: {prediction_result}")
 
         # Get trend analysis
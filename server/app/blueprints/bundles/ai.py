@@ -10,10 +10,16 @@ import logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+from app.llm_cache import cached_completion
+
 from .optimise_bundles import optimize_bundles
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# "azure" asks the gpt-4.1 deployment; "stub" answers locally by echoing the optimised
+# bundles in the expected format, for development and tests without Azure credentials
+AI_BACKEND = os.environ.get("BUNDLES_AI_BACKEND", "azure")
+
 def ai_call(
     product_to_clear: str = None,
     target_profit_margin_input: str = "Default (35%)",
@@ -24,12 +30,17 @@ def ai_call(
     top_n: int = 10,
     bundle_cust_segment_input = None,
     related_skus: list = None,
-    excel_path: str = "product_bundle_suggestions.xlsx"
+    excel_path: str = "product_bundle_suggestions.xlsx",
+    optimizer: str = "greedy",
+    budget_ms: float = None,
+    use_cache: bool = True
 ):
     """
     Calls Azure AI to refine and enrich already optimised bundles.
 
-    (All args same as before; now, passes bundles to LLM for final enrichment.)
+    (All args same as before; now, passes bundles to LLM for final enrichment.
+    optimizer and budget_ms pick the optimize_bundles search mode. use_cache=False
+    recomputes the bundles and asks the model again instead of reusing cached answers.)
     """
     load_dotenv()
     # STEP 1: Run Python-side optimiser
@@ -39,7 +50,10 @@ def ai_call(
         target_profit_margin_input=target_profit_margin_input,
         top_n=top_n,
         related_skus=related_skus,
-        excel_path=excel_path
+        excel_path=excel_path,
+        optimizer=optimizer,
+        budget_ms=budget_ms,
+        use_cache=use_cache
     )
     logger.info(f"optimize_bundles returned: {json.dumps(bundles_result, indent=2)}")
 
@@ -185,10 +199,15 @@ def ai_call(
         If no appropriate replacement exists in the dataset, DO NOT make a change.
         """
 
-# [Azure OpenAI API call as before]
+    return COMPLETIONS[AI_BACKEND](prompt, use_cache=use_cache)
 
 
-    # --- Azure OpenAI API Call ---
+def azure_completion(prompt, use_cache=True):
+    """
+    Completion of prompt by the Azure OpenAI deployment, grounded on the search index.
+    The prompt is deterministic (temperature 0), so answers are reused from the LLM
+    completion cache unless use_cache is False.
+    """
     endpoint = os.environ.get("ENDPOINT")
     deployment = "gpt-4.1"
     search_endpoint = os.environ.get("SEARCH_ENDPOINT")
@@ -201,7 +220,7 @@ def ai_call(
         api_version="2024-05-01-preview",
     )
 
-    try:
+    def complete():
         completion = client.chat.completions.create(
             model=deployment,
             messages=[{"role": "user", "content": prompt}],
@@ -220,7 +239,13 @@ def ai_call(
             temperature=0.0,
             max_tokens=3000,
         )
-        response_content = completion.choices[0].message.content
+        return completion.choices[0].message.content
+
+    # Everything that shapes the answer, except credentials
+    params = {"endpoint": endpoint, "search_endpoint": search_endpoint, "search_index": search_index,
+              "temperature": 0.0, "max_tokens": 3000}
+    try:
+        response_content = cached_completion(deployment, prompt, params, complete, bypass=not use_cache)
 
         print(response_content)
         print("-------------------------")
@@ -230,6 +255,32 @@ def ai_call(
         return f"API Error: {e}"
 
 
+def stub_completion(prompt, use_cache=True):
+    """
+    Local stand-in for azure_completion: one section per optimised bundle listed in the
+    prompt, in the format ai_bundles_to_json parses, priced at the suggested bundle price.
+    Answers are computed locally, so use_cache has nothing to skip.
+    """
+    margin = re.search(r"\*\*Target Profit Margin\*\*:\s*(\d+)", prompt)
+    sections = []
+    pattern = r"^\s*- Products: (.+?) \| Bundle Size: \d+ \| Original Price: €[\d.]+ \| Suggested Bundle Price: €([\d.]+)"
+    for number, (products, price) in enumerate(re.findall(pattern, prompt, re.MULTILINE), start=1):
+        product_lines = "\n".join(f"- {product.strip()}" for product in products.split(", "))
+        sections.append(
+            f"**Bundle Name**: Bundle {number}\n"
+            f"**Products**:\n{product_lines}\n"
+            f"**Estimated Margin**: {margin.group(1) if margin else 30}%\n"
+            f"**Price**: €{price}\n"
+            "**Duration**: 2 weeks\n"
+            "**Season**: All year\n"
+            "**Rationale**: Optimised bundle, not reviewed by the AI model.\n"
+        )
+    return "\n---\n".join(sections)
+
+
+COMPLETIONS = {"azure": azure_completion, "stub": stub_completion}
+
+
 
 def extract_products(section):
     # Find the line with "**Products**:"
@@ -327,7 +378,10 @@ def get_results_from_ai(
     top_n: int = 20,
     bundle_cust_segment_input: str = None,
     related_skus: list = None,
-    excel_path: str = "excel/product_bundle_suggestions.xlsx"
+    excel_path: str = "excel/product_bundle_suggestions.xlsx",
+    optimizer: str = "greedy",
+    budget_ms: float = None,
+    use_cache: bool = True
 ) -> dict:
     logger.info(f"Starting get_results_from_ai with product_to_clear={product_to_clear}, margin={target_profit_margin_input}")
     
@@ -344,7 +398,10 @@ def get_results_from_ai(
         top_n=top_n,
         bundle_cust_segment_input=bundle_cust_segment_input,
         related_skus=related_skus,
-        excel_path=excel_path
+        excel_path=excel_path,
+        optimizer=optimizer,
+        budget_ms=budget_ms,
+        use_cache=use_cache
     )
     logger.info(f"AI call returned:\n{output}")
     
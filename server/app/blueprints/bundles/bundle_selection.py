@@ -0,0 +1,167 @@
+import logging
+import os
+import time
+from collections import deque
+from itertools import islice
+
+from app.data_store import load_frame
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_PATH = os.path.join("excel", "inventory_enriched.xlsx")
+# The inventory has list prices but no costs. Unit cost is taken as (1 - BASE_MARGIN) of the
+# list price, i.e. list prices carry the 35% margin the generate prompt assumes.
+BASE_MARGIN = 0.35
+# Search nodes, and milliseconds, before the branch-and-bound gives up and returns its best
+# selection so far
+NODE_LIMIT = int(os.environ.get("BUNDLES_EXACT_NODE_LIMIT", "2000000"))
+TIME_LIMIT_MS = int(os.environ.get("BUNDLES_EXACT_TIME_LIMIT_MS", "10000"))
+# Scores closer than this count as equal when pruning
+EPSILON = 1e-9
+
+
+def load_inventory(path=INVENTORY_PATH):
+    """{SKU: units in stock} and {SKU: unit cost} from the inventory workbook"""
+    df = load_frame(path)
+    df = df.assign(SKU=df["SKU"].astype(str)).groupby("SKU").agg(
+        Quantity=("Quantity", "sum"), OriginalUnitPrice=("OriginalUnitPrice", "first")
+    )
+    stock = dict(zip(df.index.tolist(), df["Quantity"].astype(int).tolist()))
+    costs = dict(zip(df.index.tolist(), (df["OriginalUnitPrice"] * (1 - BASE_MARGIN)).tolist()))
+    return stock, costs
+
+
+def greedy_select(scores, sku_lists, capacity, k):
+    """Positions taken best score first while every SKU still has capacity left"""
+    capacity = list(capacity)
+    picked = []
+    for i in range(len(scores)):
+        if len(picked) >= k:
+            break
+        if all(capacity[sku] > 0 for sku in sku_lists[i]):
+            for sku in sku_lists[i]:
+                capacity[sku] -= 1
+            picked.append(i)
+    return picked
+
+
+def select_bundles(scores, sku_lists, capacity, k, node_limit=NODE_LIMIT, time_limit_ms=TIME_LIMIT_MS):
+    """
+    Exact branch-and-bound choice of at most k bundles with the highest total score, such
+    that no SKU is in more bundles than its capacity.
+
+    scores must be positive and sorted best first; sku_lists[i] holds the SKU ids (indexes
+    into capacity) of bundle i. Each node takes bundles in score order, bounding every
+    branch by the current score plus the next (k - taken) bundles that still fit on their
+    own. The bound only shrinks as the node moves down the list, so the first branch that
+    cannot beat the best selection ends the node.
+
+    The greedy selection is the starting incumbent. Returns the chosen positions (in score
+    order), their total score and search stats; stats["optimal"] is False when node_limit or
+    time_limit_ms stopped the search first.
+    """
+    started = time.perf_counter()
+    deadline = started + time_limit_ms / 1000
+    n = len(scores)
+    capacity = list(capacity)
+    greedy = greedy_select(scores, sku_lists, capacity, k)
+    best = {"total": sum(scores[i] for i in greedy), "picked": greedy}
+    stats = {
+        "candidates": n,
+        "greedy_score": best["total"],
+        "nodes": 0,
+        "pruned_by_bound": 0,
+        "skipped_for_capacity": 0,
+        "optimal": True,
+    }
+    chosen = []
+
+    def fits(i):
+        if all(capacity[sku] > 0 for sku in sku_lists[i]):
+            return True
+        stats["skipped_for_capacity"] += 1
+        return False
+
+    def search(start, need, total):
+        stats["nodes"] += 1
+        if stats["nodes"] > node_limit or time.perf_counter() > deadline:
+            stats["optimal"] = False
+            return
+        if total > best["total"] + EPSILON:
+            best["total"], best["picked"] = total, list(chosen)
+        if need == 0:
+            return
+        # Capacity only changes below this node and is restored on return, so the
+        # feasible candidates can be drawn lazily
+        feasible = (i for i in range(start, n) if fits(i))
+        window = deque(islice(feasible, need))
+        while window and stats["optimal"]:
+            if total + sum(scores[i] for i in window) <= best["total"] + EPSILON:
+                stats["pruned_by_bound"] += 1
+                return
+            i = window.popleft()
+            for sku in sku_lists[i]:
+                capacity[sku] -= 1
+            chosen.append(i)
+            search(i + 1, need - 1, total + scores[i])
+            chosen.pop()
+            for sku in sku_lists[i]:
+                capacity[sku] += 1
+            window.extend(islice(feasible, 1))
+
+    search(0, k, 0.0)
+    stats["score"] = best["total"]
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return best["picked"], best["total"], stats
+
+
+def exact_bundles(candidates, k, stock, costs, min_margin=None, max_price=None, max_sku_uses=1,
+                  node_limit=NODE_LIMIT, time_limit_ms=TIME_LIMIT_MS):
+    """
+    Best k bundles out of candidates (a DataFrame with SKUs as lists, price and score
+    columns) for a clearance campaign, provably so unless stats["optimal"] is False:
+
+    - every SKU must be in stock, and is used by at most min(stock, max_sku_uses) bundles
+      (one unit per bundle),
+    - a bundle's margin, (price - unit costs) / price in percent, is at least min_margin,
+    - a bundle's price is at most max_price.
+
+    Returns the chosen rows of candidates, best first, and the search stats, including how
+    many candidates each constraint filtered out.
+    """
+    stats = {"filtered_by_stock": 0, "filtered_by_margin": 0, "filtered_by_price": 0}
+    keep = []
+    for pos, (skus, price, score) in enumerate(zip(candidates["SKUs"], candidates["price"], candidates["score"])):
+        if score <= 0:
+            continue
+        if any(stock.get(sku, 0) <= 0 for sku in skus):
+            stats["filtered_by_stock"] += 1
+            continue
+        if max_price is not None and price > max_price:
+            stats["filtered_by_price"] += 1
+            continue
+        if min_margin is not None:
+            cost = sum(costs.get(sku, 0) for sku in skus)
+            if price <= 0 or (price - cost) / price * 100 < min_margin:
+                stats["filtered_by_margin"] += 1
+                continue
+        keep.append(pos)
+
+    keep.sort(key=lambda pos: (-candidates["score"].iat[pos], pos))
+    sku_ids = {}
+    sku_lists = [
+        tuple(sku_ids.setdefault(sku, len(sku_ids)) for sku in set(candidates["SKUs"].iat[pos])) for pos in keep
+    ]
+    capacity = [0] * len(sku_ids)
+    for sku, sku_id in sku_ids.items():
+        capacity[sku_id] = min(stock[sku], max_sku_uses)
+
+    picked, total, search_stats = select_bundles(
+        [float(candidates["score"].iat[pos]) for pos in keep], sku_lists, capacity, k, node_limit, time_limit_ms
+    )
+    stats.update(search_stats)
+    logger.info(
+        f"Exact selection: {len(picked)} of {len(keep)} feasible bundles, score {total:.2f} "
+        f"(greedy {stats['greedy_score']:.2f}), {stats['nodes']} nodes in {stats['elapsed_ms']} ms"
+    )
+    return candidates.iloc[[keep[i] for i in picked]], stats
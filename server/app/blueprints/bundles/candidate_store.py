@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from .minhash import NUM_PERM, SEED, signatures
+from .store import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Columns every Bundles_N sheet has; any other column (e.g. "Count Lower Bound") is stored as
+# a REAL column of the same name
+TEXT_COLUMNS = ["SKUs", "Products"]
+INTEGER_COLUMNS = ["Count", "Bundle Size"]
+TOTAL_COLUMN = "Original Total Price"
+# Older workbooks carry one precomputed price column per discount; prices for any margin are
+# derived from TOTAL_COLUMN instead (discounted_prices), so these are not stored
+LEGACY_PRICE_PREFIX = "Suggested Price"
+# Optional sheet of SKU and Unit Price, the prices the bundle totals were summed from
+PRICES_SHEET = "SKU Prices"
+# Bumped whenever the table layout changes, so older stores are rebuilt from the workbook
+SCHEMA_VERSION = "3"
+
+_build_lock = threading.Lock()
+
+
+def candidates_path(excel_path):
+    """The candidate store lives next to the workbook it indexes, with a .db extension"""
+    return os.path.splitext(excel_path)[0] + ".db"
+
+
+def split_skus(skus):
+    return [s.strip() for s in str(skus).split(",")]
+
+
+def bundle_key(skus):
+    """Canonical key of a bundle: its SKUs sorted and comma-joined"""
+    return ", ".join(sorted(split_skus(skus)))
+
+
+def explode_skus(df):
+    """
+    One row per SKU of every row of a sheet, as a DataFrame of row (position in df), sku
+    and name. The split SKUs and Products columns are exploded and paired up by position
+    within their row. Product names may themselves contain commas, so a row whose lists
+    do not line up falls back to the single name or "".
+    """
+    skus = df["SKUs"].map(str).reset_index(drop=True).str.split(",").explode().str.strip()
+    sku_pos = skus.groupby(level=0).cumcount().to_numpy()
+    products = df["Products"].map(str).reset_index(drop=True).str.split(",")
+    names = products.explode().str.strip()
+    name_pos = names.groupby(level=0).cumcount().to_numpy()
+
+    rows = skus.index.to_numpy()
+    lookup = pd.Series(names.to_numpy(), index=pd.MultiIndex.from_arrays([names.index.to_numpy(), name_pos]))
+    paired = lookup.reindex(pd.MultiIndex.from_arrays([rows, sku_pos])).to_numpy(dtype=object)
+    # Surplus SKUs take the row's only name, or "" when the lists simply do not line up
+    single = (products.str.len() == 1).to_numpy()[rows]
+    first = names.groupby(level=0).first().to_numpy(dtype=object)[rows]
+    missing = pd.isna(paired)
+    paired[missing] = np.where(single[missing], first[missing], "")
+    return pd.DataFrame({"row": rows, "sku": skus.to_numpy(dtype=object), "name": paired})
+
+
+def discounted_prices(totals, margin):
+    """Bundle prices at margin percent off their original totals, rounded to cents"""
+    return np.round(np.asarray(totals, dtype=np.float64) * (1 - margin / 100), 2)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def write_candidates(conn, sheets, source_mtime_ns=None):
+    """
+    Replace the stored candidates with the given {"Bundles_N": DataFrame} sheets.
+
+    Rows keep their sheet order (ids ascend within a sheet). Every SKU of every row goes
+    into candidate_skus, indexed by SKU, together with the product name it maps to and its
+    unit price from the PRICES_SHEET sheet (NULL without one). The whole rewrite is one
+    transaction, so readers see either the old or the new table.
+    """
+    unit_prices = {}
+    if PRICES_SHEET in sheets:
+        prices = sheets[PRICES_SHEET].dropna(subset=["Unit Price"])
+        unit_prices = dict(zip(prices["SKU"].map(str).tolist(), prices["Unit Price"].astype(float).tolist()))
+    sheets = {name: df for name, df in sheets.items() if name.startswith("Bundles_")}
+    extra = []
+    for df in sheets.values():
+        extra += [
+            c for c in df.columns
+            if c not in TEXT_COLUMNS + INTEGER_COLUMNS + extra and not str(c).startswith(LEGACY_PRICE_PREFIX)
+        ]
+    columns = TEXT_COLUMNS + INTEGER_COLUMNS + extra
+    definitions = ", ".join(
+        f"{_quote(c)} {'TEXT' if c in TEXT_COLUMNS else 'INTEGER' if c in INTEGER_COLUMNS else 'REAL'}"
+        for c in columns
+    )
+
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("DROP TABLE IF EXISTS candidate_minhash")
+    conn.execute("DROP TABLE IF EXISTS candidate_skus")
+    conn.execute("DROP TABLE IF EXISTS candidates")
+    conn.execute("DROP TABLE IF EXISTS candidate_meta")
+    conn.execute(
+        f"CREATE TABLE candidates (id INTEGER PRIMARY KEY, sheet TEXT NOT NULL, bundle_key TEXT NOT NULL, {definitions})"
+    )
+    conn.execute(
+        "CREATE TABLE candidate_skus (sku TEXT NOT NULL, candidate_id INTEGER NOT NULL, name TEXT NOT NULL, price REAL)"
+    )
+    # MinHash signature of each bundle's SKU set, for LSH similarity search (see minhash.py)
+    conn.execute("CREATE TABLE candidate_minhash (candidate_id INTEGER PRIMARY KEY, signature BLOB NOT NULL)")
+    conn.execute("CREATE TABLE candidate_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    insert = (
+        f"INSERT INTO candidates (id, sheet, bundle_key, {', '.join(map(_quote, columns))}) "
+        f"VALUES ({', '.join(['?'] * (len(columns) + 3))})"
+    )
+    next_id = 1
+    for sheet, df in sheets.items():
+        df = df.reindex(columns=columns)
+        df = df.astype(object).where(df.notna(), None)
+        exploded = explode_skus(df)
+        exploded["candidate_id"] = exploded["row"] + next_id
+        # Sorted SKUs per row give both the bundle key and the MinHash input
+        ordered = exploded.sort_values(["row", "sku"], kind="stable")["sku"].tolist()
+        bounds = np.cumsum(np.bincount(exploded["row"], minlength=len(df))).tolist()
+        groups = [ordered[start:stop] for start, stop in zip([0] + bounds[:-1], bounds)]
+        keys = [", ".join(skus) for skus in groups]
+        sku_lists = [sorted(set(skus)) for skus in groups]
+        rows = [
+            (next_id + offset, sheet, key, *values)
+            for offset, (key, values) in enumerate(zip(keys, df.itertuples(index=False, name=None)))
+        ]
+        conn.executemany(insert, rows)
+        skus = exploded["sku"].tolist()
+        conn.executemany(
+            "INSERT INTO candidate_skus (sku, candidate_id, name, price) VALUES (?, ?, ?, ?)",
+            zip(skus, exploded["candidate_id"].tolist(), exploded["name"].tolist(), map(unit_prices.get, skus)),
+        )
+        conn.executemany(
+            "INSERT INTO candidate_minhash (candidate_id, signature) VALUES (?, ?)",
+            [(next_id + i, sig.tobytes()) for i, sig in enumerate(signatures(sku_lists))],
+        )
+        next_id += len(df)
+
+    conn.execute("CREATE INDEX idx_candidate_skus_sku ON candidate_skus(sku, candidate_id)")
+    conn.execute(
+        'CREATE INDEX idx_candidates_sheet_count ON candidates(sheet, "Count" DESC, "Original Total Price" DESC, id)'
+    )
+    conn.executemany(
+        "INSERT INTO candidate_meta (key, value) VALUES (?, ?)",
+        [
+            ("schema", SCHEMA_VERSION),
+            ("source_mtime_ns", str(source_mtime_ns or "")),
+            ("version", uuid.uuid4().hex),
+            ("minhash_num_perm", str(NUM_PERM)),
+            ("minhash_seed", str(SEED)),
+        ],
+    )
+    logger.info(f"Stored {next_id - 1} bundle candidates from sheets {list(sheets)}")
+
+
+def _meta(conn, key):
+    try:
+        row = conn.execute("SELECT value FROM candidate_meta WHERE key = ?", (key,)).fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+def _is_current(conn, source_mtime_ns):
+    return _meta(conn, "schema") == SCHEMA_VERSION and _meta(conn, "source_mtime_ns") == source_mtime_ns
+
+
+def store_version(conn):
+    """Token that changes every time the candidates are rewritten"""
+    return _meta(conn, "version")
+
+
+def ensure_candidates(excel_path, path=None):
+    """
+    Make sure the candidate store for excel_path exists, has the current layout and is not
+    older than the workbook, (re)importing the workbook's Bundles_N sheets when needed. Returns the
+    store path. The workbook is only needed when the store is missing or stale.
+    """
+    path = path or candidates_path(excel_path)
+    if not os.path.exists(excel_path):
+        if os.path.exists(path):
+            return path
+        raise FileNotFoundError(f"Excel file not found at {excel_path}")
+
+    mtime = str(os.stat(excel_path).st_mtime_ns)
+    with db_connection(path) as conn:
+        if _is_current(conn, mtime):
+            return path
+
+    with _build_lock:
+        with db_connection(path) as conn:
+            if _is_current(conn, mtime):
+                return path
+            logger.info(f"Importing bundle candidates from {excel_path} into {path}")
+            sheets = pd.read_excel(excel_path, sheet_name=None)
+            write_candidates(conn, sheets, source_mtime_ns=mtime)
+    return path
+
+
+def sheet_names(conn):
+    rows = conn.execute("SELECT DISTINCT sheet FROM candidates").fetchall()
+    return sorted((row[0] for row in rows), key=lambda s: int(s.split("_")[1]))
+
+
+def candidate_summary(conn, sheet):
+    """id, bundle_key, Count and Original Total Price of every row of a sheet"""
+    return pd.read_sql_query(
+        'SELECT id, bundle_key, "Count", "Original Total Price" FROM candidates WHERE sheet = ? ORDER BY id',
+        conn,
+        params=[sheet],
+    )
+
+
+def sheet_skus(conn, sheet):
+    """
+    The exploded SKU table of one sheet: candidate_id, sku, name and unit price (None when
+    unknown) for every SKU of every row, in row order
+    """
+    rows = conn.execute(
+        """SELECT s.candidate_id, s.sku, s.name, s.price FROM candidate_skus s
+           JOIN candidates c ON c.id = s.candidate_id WHERE c.sheet = ? ORDER BY s.rowid""",
+        (sheet,),
+    ).fetchall()
+    return pd.DataFrame.from_records(rows, columns=["candidate_id", "sku", "name", "price"])
+
+
+def candidate_signatures(conn, sheet):
+    """MinHash signatures of the rows of a sheet, in id order, as a (rows, num_perm) array"""
+    rows = conn.execute(
+        """SELECT m.signature FROM candidate_minhash m JOIN candidates c ON c.id = m.candidate_id
+           WHERE c.sheet = ? ORDER BY c.id""",
+        (sheet,),
+    ).fetchall()
+    num_perm = int(_meta(conn, "minhash_num_perm") or NUM_PERM)
+    return np.frombuffer(b"".join(row[0] for row in rows), dtype=np.uint32).reshape(-1, num_perm)
+
+
+def fetch_rows(conn, ids):
+    """Full rows for the given candidate ids, in the order given"""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return pd.read_sql_query("SELECT * FROM candidates WHERE 0", conn).drop(columns=["id", "sheet", "bundle_key"])
+    df = pd.read_sql_query(
+        f"SELECT * FROM candidates WHERE id IN ({', '.join(['?'] * len(ids))})", conn, params=ids
+    )
+    df = df.set_index("id").loc[ids].reset_index(drop=True)
+    return df.drop(columns=["sheet", "bundle_key"])
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .store import db_connection, save_bundle_set
+
+logger = logging.getLogger(__name__)
+
+# Generation jobs run at once per process; the rest wait in the pool's queue
+JOB_WORKERS = int(os.environ.get("BUNDLES_JOB_WORKERS", "2"))
+# Jobs queued or running per process before new ones are turned away
+MAX_PENDING_JOBS = int(os.environ.get("BUNDLES_MAX_PENDING_JOBS", "16"))
+# An unfinished job older than this (e.g. its process died) is marked failed
+STALE_JOB_S = float(os.environ.get("BUNDLES_STALE_JOB_S", "900"))
+
+IN_FLIGHT = ("queued", "running")
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when MAX_PENDING_JOBS jobs are already pending"""
+
+
+def job_key(params):
+    """Identical requests share a key, whatever the order of their parameters"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def init_jobs(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS generation_jobs
+        (id TEXT PRIMARY KEY,
+         job_key TEXT NOT NULL,
+         params TEXT NOT NULL,
+         status TEXT NOT NULL,
+         set_id INTEGER,
+         result TEXT,
+         error TEXT,
+         created_at REAL NOT NULL,
+         started_at REAL,
+         finished_at REAL)
+    """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_generation_jobs_key ON generation_jobs(job_key, status)")
+
+
+def _fail_stale(conn, now, job_id=None):
+    """Mark queued or running jobs older than STALE_JOB_S (all, or just job_id) failed"""
+    query = """UPDATE generation_jobs SET status = 'failed', error = ?, finished_at = ?
+               WHERE status IN (?, ?) AND created_at <= ?"""
+    args = [f"Job did not finish within {STALE_JOB_S:g} s", now, *IN_FLIGHT, now - STALE_JOB_S]
+    if job_id is not None:
+        query += " AND id = ?"
+        args.append(job_id)
+    stale = conn.execute(query, args).rowcount
+    if stale:
+        logger.warning(f"Marked {stale} stale generation job(s) failed")
+
+
+def _job(row):
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "params": json.loads(row["params"]),
+        "set_id": row["set_id"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+
+
+class JobQueue:
+    """
+    Bundle generation jobs, run on a bounded pool of worker threads.
+
+    Jobs are rows of generation_jobs in the bundles database, so their status and result
+    outlive the request that submitted them. A job runs generate(**params); a successful
+    result is saved as the newest bundle set (save_bundle_set) in the same transaction that
+    marks the job succeeded. Submitting parameters identical to a job still queued or
+    running returns that job instead of starting another. Jobs unfinished after
+    STALE_JOB_S, e.g. because the process running them died, are reported as failed.
+    """
+
+    def __init__(self, generate, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS, db_path=None):
+        self._generate = generate
+        self.max_pending = max_pending
+        self.db_path = db_path
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bundle-job")
+        self._pending = 0
+        self._lock = threading.Lock()
+        with db_connection(db_path) as conn:
+            init_jobs(conn)
+
+    def submit(self, params):
+        """
+        Queue a job for params; returns (job, created), where created is False when an
+        identical job was already in flight. Raises QueueFull when too many are pending.
+        """
+        key = job_key(params)
+        now = time.time()
+        with self._lock:
+            with db_connection(self.db_path) as conn:
+                # The write lock makes find-or-insert atomic across threads and processes
+                conn.execute("BEGIN IMMEDIATE")
+                _fail_stale(conn, now)
+                row = conn.execute(
+                    """SELECT * FROM generation_jobs
+                       WHERE job_key = ? AND status IN (?, ?)
+                       ORDER BY created_at DESC LIMIT 1""",
+                    (key, *IN_FLIGHT),
+                ).fetchone()
+                if row is not None:
+                    logger.info(f"Request matches in-flight job {row['id']}")
+                    return _job(row), False
+                if self._pending >= self.max_pending:
+                    raise QueueFull(f"{self._pending} generation jobs already pending")
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO generation_jobs (id, job_key, params, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, key, json.dumps(params), "queued", now),
+                )
+            self._pending += 1
+        self._pool.submit(self._run, job_id, params)
+        logger.info(f"Queued generation job {job_id}")
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        """The job as a dict (status, params, result, error, timestamps), or None"""
+        with db_connection(self.db_path) as conn:
+            _fail_stale(conn, time.time(), job_id)
+            row = conn.execute("SELECT * FROM generation_jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row is not None else None
+
+    def _run(self, job_id, params):
+        try:
+            with db_connection(self.db_path) as conn:
+                conn.execute(
+                    "UPDATE generation_jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id)
+                )
+            result = self._generate(**params)
+            if not result or not result.get("bundles"):
+                raise RuntimeError("Failed to generate bundles")
+            with db_connection(self.db_path) as conn:
+                set_id = save_bundle_set(conn, result)
+                conn.execute(
+                    """UPDATE generation_jobs SET status = 'succeeded', set_id = ?, result = ?, finished_at = ?
+                       WHERE id = ?""",
+                    (set_id, json.dumps(result), time.time(), job_id),
+                )
+            logger.info(f"Generation job {job_id} stored bundle set {set_id}")
+        except Exception as e:
+            logger.error(f"Generation job {job_id} failed: {e}")
+            with db_connection(self.db_path) as conn:
+                conn.execute(
+                    "UPDATE generation_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                    (str(e), time.time(), job_id),
+                )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,202 @@
+import math
+import random
+import time
+
+import numpy as np
+
+# Annealing temperature: starts at this share of the start bundle's score and cools
+# geometrically to FINAL_TEMPERATURE times that by the deadline
+START_TEMPERATURE = 0.05
+FINAL_TEMPERATURE = 1e-3
+# Annealing moves between clock reads
+CLOCK_EVERY = 32
+
+
+class SearchSpace:
+    """
+    One sheet's local-search space as arrays. SKUs get integer ids in sorted SKU order, so
+    a bundle is the sorted tuple of its ids and sorts like its bundle key. Holds the SKU
+    prices, the known bundle counts, and for every known bundle minus one SKU the SKUs
+    that complete it again (with the completed bundle's count), which is all a swap move
+    needs to look up.
+    """
+
+    def __init__(self, sku_to_price, bundle_count_dict):
+        self.skus = sorted(sku_to_price)
+        self.ids = {sku: i for i, sku in enumerate(self.skus)}
+        self.prices = np.array([sku_to_price[sku] or 0 for sku in self.skus], dtype=np.float64)
+        # Best price first, ties by id; only valid for ranking when no price is negative
+        self.by_price = np.lexsort((np.arange(len(self.skus)), -self.prices))
+        self.nonnegative = bool((self.prices >= 0).all())
+
+        self.counts = {}
+        for key, count in bundle_count_dict.items():
+            skus = key.split(", ")
+            if len(set(skus)) == len(skus) and all(sku in self.ids for sku in skus):
+                self.counts[tuple(sorted(self.ids[sku] for sku in skus))] = count
+        completions = {}
+        for bundle, count in self.counts.items():
+            for i in range(len(bundle)):
+                completions.setdefault(bundle[:i] + bundle[i + 1:], {})[bundle[i]] = count
+        self.completions = completions
+
+    def __len__(self):
+        return len(self.skus)
+
+    def bundle(self, skus):
+        return tuple(sorted(self.ids[sku] for sku in set(skus)))
+
+    def total(self, bundle):
+        return math.fsum(self.prices[list(bundle)].tolist())
+
+    def score(self, bundle, target_margin, alpha):
+        """
+        (1 - alpha) * margin term + alpha * frequency: the bundle's total price times
+        target_margin, and its count (1 when never seen); 0 for a bundle worth nothing
+        """
+        total = self.total(bundle)
+        if total == 0:
+            return 0
+        return total * target_margin * (1 - alpha) + self.counts.get(bundle, 1) * alpha
+
+
+def _best_swap(space, current, target_margin, alpha):
+    """
+    Best single swap out of current as (score, position in current, SKU id in), or None
+    when no SKU is left to swap in. Each move is scored from the sum of the SKUs kept plus
+    the price of the one swapped in; known bundles among the results come from
+    space.completions. Ties go to the earliest position, then the lowest id.
+    """
+    weight = target_margin * (1 - alpha)
+    # With a positive price weight the best plain swap is the priciest SKU not excluded
+    monotone = space.nonnegative and weight > 0 and alpha >= 0
+    members = set(current)
+    best = None
+    for pos in range(len(current)):
+        rest = current[:pos] + current[pos + 1:]
+        base = space.total(rest)
+        known = space.completions.get(rest, {})
+        excluded = members | known.keys()
+
+        moves = [(sku, count) for sku, count in known.items() if sku not in members]
+        if monotone:
+            for sku in space.by_price[: len(excluded) + 1].tolist():
+                if sku not in excluded:
+                    moves.append((sku, 1))
+                    break
+        else:
+            totals = base + space.prices
+            scores = np.where(totals == 0, 0.0, totals * weight + alpha)
+            scores[list(excluded)] = -np.inf
+            sku = int(np.argmax(scores))
+            if scores[sku] > -np.inf:
+                moves.append((sku, 1))
+
+        for sku, count in moves:
+            total = base + space.prices[sku]
+            score = 0 if total == 0 else total * weight + count * alpha
+            if best is None or (-score, pos, sku) < (-best[0], best[1], best[2]):
+                best = (score, pos, sku)
+    return best
+
+
+def local_search_bundle(space, initial_bundle, target_margin=0.73, alpha=0.3, max_iters=100):
+    """
+    Hill-climb from initial_bundle by swapping one SKU at a time for any SKU of the space,
+    taking the best-scoring swap while it improves the score (see SearchSpace.score).
+    Returns the sorted SKUs of the final bundle and its score.
+    """
+    current = space.bundle(initial_bundle)
+    best_score = space.score(current, target_margin, alpha)
+    for _ in range(max_iters):
+        move = _best_swap(space, current, target_margin, alpha)
+        if move is None:
+            break
+        _, pos, sku = move
+        neighbor = tuple(sorted(current[:pos] + current[pos + 1:] + (sku,)))
+        score = space.score(neighbor, target_margin, alpha)
+        if score > best_score:
+            current, best_score = neighbor, score
+        else:
+            break
+    return [space.skus[i] for i in current], best_score
+
+
+def multi_start_search(space, starts, target_margin=0.73, alpha=0.3, max_iters=100):
+    """
+    local_search_bundle from every start bundle, results in start order.
+
+    Searches run in the calling thread: one takes tens of microseconds, so the few dozen
+    starts of a request finish well before a worker pool would have started.
+    """
+    return [
+        local_search_bundle(space, sorted(set(start)), target_margin, alpha, max_iters) for start in starts
+    ]
+
+
+def anneal_bundle(space, initial_bundle, deadline, target_margin=0.73, alpha=0.3, seed=0, max_iters=None):
+    """
+    Anytime simulated annealing: hill-climb from initial_bundle, then make random single
+    swaps until time.perf_counter() passes deadline (or max_iters moves), accepting a
+    worse bundle with probability exp(delta / temperature) as the temperature cools.
+
+    Returns the best bundle seen (sorted SKUs), its score, and stats: the number of moves
+    tried and the trajectory of [milliseconds, best score] at every improvement. The
+    hill-climbed bundle is the first point, so the result is never worse than greedy.
+    """
+    started = time.perf_counter()
+    skus, best_score = local_search_bundle(space, initial_bundle, target_margin, alpha)
+    current = best = space.bundle(skus)
+    current_score = best_score
+    trajectory = [[round((time.perf_counter() - started) * 1000, 3), best_score]]
+    stats = {"iterations": 0, "trajectory": trajectory}
+    if len(space) <= len(current):
+        return skus, best_score, stats
+
+    rng = random.Random(seed)
+    weight = target_margin * (1 - alpha)
+    start_temperature = START_TEMPERATURE * max(abs(best_score), 1)
+    span = max(deadline - started, 1e-9)
+    temperature = start_temperature
+    total = space.total(current)
+    iterations = 0
+    while max_iters is None or iterations < max_iters:
+        if iterations % CLOCK_EVERY == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            temperature = start_temperature * FINAL_TEMPERATURE ** ((now - started) / span)
+        iterations += 1
+
+        pos = rng.randrange(len(current))
+        sku = rng.randrange(len(space))
+        if sku in current:
+            continue
+        rest = current[:pos] + current[pos + 1:]
+        new_total = total - space.prices[current[pos]] + space.prices[sku]
+        count = space.completions.get(rest, {}).get(sku, 1)
+        score = 0 if new_total == 0 else new_total * weight + count * alpha
+        delta = score - current_score
+        if delta >= 0 or rng.random() < math.exp(delta / temperature):
+            current = tuple(sorted(rest + (sku,)))
+            total = space.total(current)
+            current_score = space.score(current, target_margin, alpha)
+            if current_score > best_score:
+                best, best_score = current, current_score
+                trajectory.append([round((time.perf_counter() - started) * 1000, 3), best_score])
+    stats["iterations"] = iterations
+    return [space.skus[i] for i in best], best_score, stats
+
+
+def anneal_search(space, starts, deadline, target_margin=0.73, alpha=0.3, seed=0):
+    """
+    anneal_bundle from every start bundle in turn, results in start order. The time left
+    until deadline is shared evenly among the starts not yet searched, so time a search
+    does not use goes to the next ones.
+    """
+    results = []
+    for i, start in enumerate(starts):
+        now = time.perf_counter()
+        share = now + max(deadline - now, 0) / (len(starts) - i)
+        results.append(anneal_bundle(space, start, share, target_margin, alpha, seed=seed + i))
+    return results
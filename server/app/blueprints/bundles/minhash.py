@@ -0,0 +1,134 @@
+import hashlib
+import heapq
+import os
+
+import numpy as np
+
+# Signature length; fixed when the candidate store is written
+NUM_PERM = 128
+SEED = 1
+# Recall/speed knob: more bands of fewer rows each put more bundles in a query's buckets,
+# raising recall at the cost of scoring more of them. Must divide NUM_PERM.
+LSH_BANDS = int(os.environ.get("BUNDLES_LSH_BANDS", "32"))
+# Target sets at least this large are searched through LSH instead of the SKU postings;
+# 0 (the default) keeps every clearance query exact. Bundles hold 2-5 SKUs, so against a
+# large target every Jaccard is small and LSH recall drops; see benchmarks/bench_minhash.py.
+LSH_MIN_TARGET = int(os.environ.get("BUNDLES_LSH_MIN_TARGET", "0"))
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Signature rows computed per chunk, to bound the (SKUs x permutations) temporary
+_CHUNK_ENTRIES = 50000
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+    return a, b
+
+
+def sku_hashes(skus):
+    """Stable 32-bit hash of each SKU string (Python's hash() is salted per process)"""
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(str(sku).encode(), digest_size=4).digest(), "little") for sku in skus],
+        dtype=np.uint64,
+    )
+
+
+def signatures(sku_lists, num_perm=NUM_PERM, seed=SEED):
+    """
+    MinHash signature (num_perm uint32 minima) of every SKU set. Permutations are
+    (a * h + b) mod (2^61 - 1) over the 32-bit SKU hashes; an empty set gets all-max.
+    """
+    a, b = _permutations(num_perm, seed)
+    result = np.full((len(sku_lists), num_perm), _MAX_HASH, dtype=np.uint64)
+    distinct = sorted({sku for skus in sku_lists for sku in skus})
+    lookup = dict(zip(distinct, sku_hashes(distinct)))
+
+    start = 0
+    while start < len(sku_lists):
+        stop, entries = start, 0
+        while stop < len(sku_lists) and (entries < _CHUNK_ENTRIES or stop == start):
+            entries += len(sku_lists[stop])
+            stop += 1
+        chunk = sku_lists[start:stop]
+        lengths = np.array([len(skus) for skus in chunk])
+        nonempty = np.flatnonzero(lengths)
+        if len(nonempty):
+            hashes = np.array([lookup[sku] for skus in chunk for sku in skus], dtype=np.uint64)
+            permuted = (hashes[:, None] * a + b) % _PRIME & _MAX_HASH
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])[nonempty]
+            result[start + nonempty] = np.minimum.reduceat(permuted, offsets, axis=0)
+        start = stop
+    return result.astype(np.uint32)
+
+
+class LshIndex:
+    """
+    Banded LSH over MinHash signatures. Two sets with Jaccard J share at least one of
+    `bands` buckets with probability 1 - (1 - J^r)^bands, r = num_perm / bands rows per
+    band; candidates from the shared buckets are ranked by estimated Jaccard (the share
+    of equal signature entries).
+    """
+
+    def __init__(self, signatures, counts, totals, valid, bands=LSH_BANDS, seed=SEED):
+        self.signatures = np.ascontiguousarray(signatures, dtype=np.uint32)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.totals = np.asarray(totals, dtype=np.float64)
+        self.valid = np.asarray(valid, dtype=bool)
+        self.seed = seed
+        num_perm = self.signatures.shape[1]
+        if num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide the signature length ({num_perm})")
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        self.buckets = []
+        for band in range(bands):
+            keys = self._band_keys(self.signatures, band)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            groups = np.split(order, starts[1:])
+            self.buckets.append(dict(zip(sorted_keys[starts].tolist(), groups)))
+
+    def _band_keys(self, sigs, band):
+        block = sigs[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+        keys = np.full(len(sigs), np.uint64(band + 1), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for col in range(self.rows):
+                keys = (keys * np.uint64(0x100000001B3)) ^ block[:, col]
+        return keys
+
+    def candidates(self, signature):
+        sig = signature[None, :]
+        found = [
+            self.buckets[band].get(int(self._band_keys(sig, band)[0]))
+            for band in range(self.bands)
+        ]
+        found = [group for group in found if group is not None]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def nearest(self, target_skus, top_n):
+        """Positions of up to top_n valid bundles with the highest estimated Jaccard"""
+        signature = signatures([sorted(set(target_skus))], self.signatures.shape[1], self.seed)[0]
+        return self.nearest_signature(signature, top_n)
+
+    def nearest_signature(self, signature, top_n, exclude=None):
+        positions = self.candidates(signature)
+        positions = positions[self.valid[positions]]
+        if exclude is not None:
+            positions = positions[positions != exclude]
+        if not len(positions):
+            return []
+        estimate = (self.signatures[positions] == signature).mean(axis=1)
+        best = heapq.nlargest(
+            top_n,
+            zip(estimate.tolist(), self.counts[positions].tolist(), self.totals[positions].tolist(), (-positions).tolist()),
+        )
+        return [-item[3] for item in best if item[0] > 0]
+
+    def similar(self, position, top_n):
+        """Bundles like the bundle at position, excluding itself"""
+        return self.nearest_signature(self.signatures[position], top_n, exclude=position)
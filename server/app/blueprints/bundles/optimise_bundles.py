@@ -1,7 +1,18 @@
+import numpy as np
 import pandas as pd
 import os
 import logging
+import pickle
+import threading
+import time
 import uuid
+from .bundle_selection import INVENTORY_PATH, exact_bundles, load_inventory
+from .candidate_store import discounted_prices, ensure_candidates, fetch_rows, store_version
+from .local_search import anneal_search, multi_start_search
+from .minhash import LSH_MIN_TARGET
+from .result_cache import ResultCache
+from .sheet_cache import get_bundle_data
+from .store import db_connection
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -12,197 +23,314 @@ EXCEL_DIR = "excel"
 
 logger.info(f"EXCEL_DIR: {EXCEL_DIR}")
 
+# "greedy" hill-climbs each bundle to its local optimum; "anneal" keeps improving with
+# simulated annealing until the call's budget_ms runs out; "exact" picks the best top_n
+# existing bundles under stock, margin, price and SKU-reuse constraints by branch-and-bound
+OPTIMIZERS = ("greedy", "anneal", "exact")
+DEFAULT_BUDGET_MS = 200
+
+# Results of recent calls, keyed by their normalized arguments and the candidate-store
+# version; 0 disables the cache
+RESULT_CACHE_SIZE = int(os.environ.get("BUNDLES_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL_S = float(os.environ.get("BUNDLES_RESULT_CACHE_TTL_S", "900"))
+_results = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL_S)
+# Last candidate-store version seen per store path, to drop results of older versions
+_store_versions = {}
+_versions_lock = threading.Lock()
+
+
+def parse_margin(target_profit_margin_input):
+    """Margin percent from input such as "34", "34%" or "27.5"; must be in [0, 100)"""
+    # Clean up the margin input by removing '%' and any whitespace
+    margin_str = str(target_profit_margin_input).replace('%', '').strip()
+    # Any margin works: prices are derived from the original totals per call
+    margin = float(margin_str)
+    if margin.is_integer():
+        margin = int(margin)
+    if not 0 <= margin < 100:
+        raise ValueError(f"Margin must be at least 0% and below 100%, got {margin_str}%")
+    return margin
+
+
+def _result_key(store_path, product_to_clear, margin, top_n, related_skus, alpha, optimizer, budget_ms,
+                min_margin, max_price, max_sku_uses, inventory_path):
+    """
+    Cache key of an optimize_bundles call: the arguments its result depends on, normalized
+    (related SKUs only count with a product to clear, and in any order), plus the version of
+    the candidate store, and for the exact optimizer the inventory file's mtime and size
+    """
+    with db_connection(store_path) as conn:
+        version = store_version(conn)
+    path = os.path.abspath(store_path)
+    with _versions_lock:
+        if _store_versions.get(path) != version:
+            # The workbook was reimported: results for the old candidates can never hit again
+            dropped = _results.discard(lambda key: key[0] == path)
+            if dropped:
+                logger.info(f"Dropped {dropped} cached results for the previous version of {path}")
+            _store_versions[path] = version
+    target = str(product_to_clear) if product_to_clear else None
+    key = (
+        path, version, target, frozenset(map(str, related_skus or [])) if target else frozenset(),
+        margin, top_n, float(alpha), optimizer,
+    )
+    if optimizer == "anneal":
+        key += (DEFAULT_BUDGET_MS if budget_ms is None else float(budget_ms),)
+    if optimizer == "exact":
+        stat = os.stat(inventory_path)
+        key += (min_margin, max_price, max_sku_uses, os.path.abspath(inventory_path), stat.st_mtime_ns, stat.st_size)
+    return key
+
+
+def _fresh_copy(cached):
+    """
+    A cached result for a new caller: results are cached pickled, so every caller gets its
+    own copy (much faster than copy.deepcopy), here with new bundle ids
+    """
+    result = pickle.loads(cached)
+    for bundle in result['bundles']:
+        bundle['bundle_id'] = str(uuid.uuid4())
+    return result
+
+
+def result_cache_stats():
+    return _results.stats()
+
+
+def clear_result_cache():
+    _results.clear()
+    with _versions_lock:
+        _store_versions.clear()
+
+
 def optimize_bundles(
     product_to_clear=None,
     target_profit_margin_input="34",
     top_n=20,
     related_skus=None,
     excel_path=os.path.join(EXCEL_DIR, "product_bundle_suggestions.xlsx"),
-    alpha=0.3  # <-- weighting for frequency in score, adjust as needed
+    alpha=0.3,  # <-- weighting for frequency in score, adjust as needed
+    optimizer="greedy",
+    budget_ms=None,
+    min_margin=None,
+    max_price=None,
+    max_sku_uses=1,
+    inventory_path=INVENTORY_PATH,
+    use_cache=True
+):
+    """
+    Returns filtered and optimized bundles as dictionaries (for API or other Python code);
+    see _optimize_bundles. Results are memoized (LRU of RESULT_CACHE_SIZE, expiring after
+    RESULT_CACHE_TTL_S seconds) under the normalized arguments and the candidate-store
+    version, which changes whenever the workbook is reimported. A repeated call gets a copy
+    of the earlier result with new bundle ids; use_cache=False always recomputes.
+    """
+    if optimizer not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer {optimizer!r}, expected one of {OPTIMIZERS}")
+    args = (product_to_clear, target_profit_margin_input, top_n, related_skus, excel_path, alpha,
+            optimizer, budget_ms, min_margin, max_price, max_sku_uses, inventory_path)
+    if not use_cache or RESULT_CACHE_SIZE <= 0:
+        return _optimize_bundles(*args)
+
+    margin = parse_margin(target_profit_margin_input)
+    key = _result_key(ensure_candidates(excel_path), product_to_clear, margin, top_n, related_skus, alpha,
+                      optimizer, budget_ms, min_margin, max_price, max_sku_uses, inventory_path)
+    cached = _results.get(key)
+    if cached is not None:
+        logger.info(f"Serving cached optimize_bundles result ({_results.hits} hits, {_results.misses} misses)")
+        return _fresh_copy(cached)
+    result = _optimize_bundles(*args)
+    _results.put(key, pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+    return result
+
+
+def _optimize_bundles(
+    product_to_clear=None,
+    target_profit_margin_input="34",
+    top_n=20,
+    related_skus=None,
+    excel_path=os.path.join(EXCEL_DIR, "product_bundle_suggestions.xlsx"),
+    alpha=0.3,
+    optimizer="greedy",
+    budget_ms=None,
+    min_margin=None,
+    max_price=None,
+    max_sku_uses=1,
+    inventory_path=INVENTORY_PATH
 ):
     """
     Returns filtered and optimized bundles as dictionaries (for API or other Python code).
     Now local search objective is a weighted combination of margin and bundle frequency.
+    With optimizer="anneal" the whole call aims to finish within budget_ms, and the
+    result also carries the search statistics (iterations, score trajectory).
+    With optimizer="exact" the result is the best top_n bundles by score such that every
+    SKU is in stock (inventory_path) and in at most max_sku_uses of them, with margins of
+    at least min_margin percent and prices of at most max_price; the search statistics
+    include how much the branch-and-bound pruned.
     """
+    started = time.perf_counter()
+    if optimizer not in OPTIMIZERS:
+        raise ValueError(f"Unknown optimizer {optimizer!r}, expected one of {OPTIMIZERS}")
+    budget_ms = DEFAULT_BUDGET_MS if budget_ms is None else float(budget_ms)
+    deadline = started + budget_ms / 1000
     logger.info(f"Starting optimize_bundles with parameters:")
     logger.info(f"product_to_clear: {product_to_clear}")
     logger.info(f"target_profit_margin_input: {target_profit_margin_input}")
     logger.info(f"top_n: {top_n}")
     logger.info(f"related_skus: {related_skus}")
     logger.info(f"excel_path: {excel_path}")
+    logger.info(f"optimizer: {optimizer}")
     
     try:
-        # Clean up the margin input by removing '%' and any whitespace
-        margin_str = str(target_profit_margin_input).replace('%', '').strip()
-        logger.info(f"Cleaned margin string: {margin_str}")
-        margin = int(margin_str)
+        margin = parse_margin(target_profit_margin_input)
         logger.info(f"Parsed margin: {margin}")
     except Exception as e:
         logger.error(f"Error parsing margin: {e}")
         raise
 
     try:
-        logger.info(f"Attempting to read Excel file: {excel_path}")
-        if not os.path.exists(excel_path):
-            available_files = os.listdir(EXCEL_DIR)
-            logger.error(f"Excel file not found. Available files in {EXCEL_DIR}: {available_files}")
-            raise FileNotFoundError(f"Excel file not found at {excel_path}")
-            
-        bundle_sheets = pd.read_excel(excel_path, sheet_name=None)
-        logger.info(f"Successfully read Excel file. Available sheets: {list(bundle_sheets.keys())}")
+        logger.info(f"Opening bundle candidate store for: {excel_path}")
+        store_path = ensure_candidates(excel_path)
+    except FileNotFoundError:
+        available_files = os.listdir(EXCEL_DIR) if os.path.isdir(EXCEL_DIR) else []
+        logger.error(f"Excel file not found. Available files in {EXCEL_DIR}: {available_files}")
+        raise
     except Exception as e:
         logger.error(f"Error reading Excel file: {e}")
         raise
 
-    wanted_sheets = {k: v for k, v in bundle_sheets.items() if k.startswith('Bundles_')}
-    logger.info(f"Filtered bundle sheets: {list(wanted_sheets.keys())}")
-
     output = {}
     local_search_output = {}
-
-    def jaccard_similarity(set1, set2):
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        return intersection / union if union > 0 else 0
+    iterations = 0
 
     def find_nearest_bundles(
-        bundles_df,
+        conn,
+        index,
         product_to_clear=None,
-        target_profit_margin_input=None,
         top_n=50,
-        related_skus=None
+        related_skus=None,
+        lsh=None
     ):
-        filtered = bundles_df.copy()
-        margin_col = None
-        if target_profit_margin_input is not None:
-            margin_col_candidate = f'Suggested Price ({target_profit_margin_input}% off)'
-            if margin_col_candidate in filtered.columns:
-                margin_col = margin_col_candidate
-        if margin_col is None:
-            for col in filtered.columns:
-                if col.startswith("Suggested Price"):
-                    margin_col = col
-                    break
-        if margin_col is None:
-            raise ValueError("No margin column found in data!")
-        filtered = filtered[filtered[margin_col] > 0]
+        # Rank through the inverted SKU index, then read only the winning rows
         if product_to_clear:
             target_skus = {str(product_to_clear)}
             if related_skus:
                 target_skus |= set(map(str, related_skus))
-            filtered['SKU_Set'] = filtered['SKUs'].apply(lambda s: set(map(str.strip, s.split(','))))
-            filtered['JaccardSim'] = filtered['SKU_Set'].apply(lambda x: jaccard_similarity(x, target_skus))
-            filtered = filtered.sort_values(['JaccardSim', 'Count', 'Original Total Price'], ascending=[False, False, False])
-            filtered = filtered.drop(columns=['SKU_Set', 'JaccardSim'])
+            if lsh is not None and LSH_MIN_TARGET and len(target_skus) >= LSH_MIN_TARGET:
+                # Large targets: approximate nearest bundles by MinHash/LSH
+                positions = lsh().nearest(target_skus, top_n)
+                positions += index.top_by_count(top_n - len(positions), exclude=positions)
+            else:
+                positions = index.nearest(target_skus, top_n)
         else:
-            filtered = filtered.sort_values(['Count', 'Original Total Price'], ascending=[False, False])
+            positions = index.top_by_count(top_n)
+        filtered = fetch_rows(conn, index.ids[positions])
         columns_to_keep = [
-            'SKUs', 'Products', 'Count', 'Bundle Size', 'Original Total Price', margin_col
+            'SKUs', 'Products', 'Count', 'Bundle Size', 'Original Total Price'
         ]
-        filtered = filtered.head(top_n)[columns_to_keep]
-        filtered = filtered.rename(columns={margin_col: 'Suggested Bundle Price'})
+        filtered = filtered[columns_to_keep]
+        filtered['Suggested Bundle Price'] = discounted_prices(filtered['Original Total Price'].fillna(0), margin)
         return filtered
 
-    def local_search_bundle(
-        initial_bundle,
-        all_skus,
-        sku_to_price,
-        bundle_count_dict,
-        bundle_size=3,
-        target_margin=0.73,
-        max_iters=100
-    ):
-        def margin_objective(bundle):
-            prices = [sku_to_price.get(sku, 0) for sku in bundle]
-            orig_sum = sum(prices)
-            if orig_sum == 0: return 0
-            bundle_str = ', '.join(sorted(bundle))
-            freq = bundle_count_dict.get(bundle_str, 1)  # Use 1 for "never seen" (so not 0)
-            # Weighted: (1-alpha) for margin, alpha for frequency
-            margin_score = orig_sum * target_margin
-            score = margin_score * (1 - alpha) + freq * alpha
-            return score
-        current = set(initial_bundle)
-        best_score = margin_objective(current)
-        for _ in range(max_iters):
-            neighbors = []
-            for sku_out in current:
-                for sku_in in all_skus - current:
-                    neighbor = set(current)
-                    neighbor.remove(sku_out)
-                    neighbor.add(sku_in)
-                    neighbors.append(neighbor)
-            if not neighbors:
-                break
-            scored = [(n, margin_objective(n)) for n in neighbors]
-            scored.sort(key=lambda x: x[1], reverse=True)
-            if scored and scored[0][1] > best_score:
-                current, best_score = scored[0]
-            else:
-                break
-        return current, best_score
+    def exact_candidates(conn, sheet_data, target_skus=None):
+        # Every bundle of the sheet with a price, or those containing a target SKU
+        summary = sheet_data.summary(conn)
+        prices = sheet_data.prices(conn, margin)
+        positions = np.arange(len(summary))
+        if target_skus:
+            postings = sheet_data.sku_index(conn).postings
+            positions = np.array(sorted({int(p) for sku in target_skus for p in postings.get(sku, [])}), dtype=np.int64)
+        positions = positions[prices[positions] > 0]
+        summary, prices = summary.iloc[positions], prices[positions]
+        sku_lists = sheet_data.sku_lists(conn)
+        name_map = sheet_data.product_names(conn)
+        skus = [sorted(set(sku_lists.get(i, []))) for i in summary['id'].tolist()]
+        return pd.DataFrame({
+            'SKUs': skus,
+            'Products': [', '.join(name_map.get(sku, "") for sku in row) for row in skus],
+            'Original Total Price': summary['Original Total Price'].to_numpy(),
+            'price': prices,
+            # Same additive price/frequency score the local search maximizes
+            'score': prices * (1 - (margin or 27) / 100) * (1 - alpha) + summary['Count'].fillna(0).to_numpy() * alpha,
+        })
 
-    for sheet, df in wanted_sheets.items():
-        size = int(sheet.split('_')[1])
-        filtered = find_nearest_bundles(
-            df,
-            product_to_clear=product_to_clear,
-            target_profit_margin_input=margin,
-            top_n=top_n,
-            related_skus=related_skus
-        )
-        output[sheet] = filtered
+    with db_connection(store_path) as conn:
+        # Parsed sheets and lookups are cached per store version and shared across requests
+        bundle_data = get_bundle_data(conn, store_path)
+        wanted_sheets = bundle_data.sheets
+        logger.info(f"Filtered bundle sheets: {wanted_sheets}")
 
-        sku_to_price = {}
-        for idx, row in df.iterrows():
-            margin_col = f'Suggested Price ({margin}% off)' if margin else None
-            if margin_col and margin_col in row:
-                price = row[margin_col]
-            else:
-                price_cols = [col for col in df.columns if col.startswith("Suggested Price")]
-                price = row[price_cols[0]] if price_cols else 0
-            for sku in map(str.strip, str(row['SKUs']).split(',')):
-                if sku not in sku_to_price or price > sku_to_price[sku]:
-                    sku_to_price[sku] = price
+        selection_stats = None
+        if optimizer == "exact":
+            stock, costs = load_inventory(inventory_path)
+            target_skus = None
+            if product_to_clear:
+                target_skus = {str(product_to_clear)} | set(map(str, related_skus or []))
+            frames = [exact_candidates(conn, bundle_data.sheet(sheet), target_skus) for sheet in wanted_sheets]
+            # No bundle sheets means no candidates, and an empty selection like greedy's
+            candidates = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+                columns=['SKUs', 'Products', 'Original Total Price', 'price', 'score']
+            )
+            chosen, selection_stats = exact_bundles(
+                candidates, top_n, stock, costs,
+                min_margin=min_margin, max_price=max_price, max_sku_uses=max_sku_uses
+            )
+            local_search_output['exact'] = pd.DataFrame({
+                'SKUs': [', '.join(skus) for skus in chosen['SKUs']],
+                'Products': chosen['Products'].tolist(),
+                'Original Total Price': chosen['Original Total Price'].tolist(),
+                'Optimized Score': chosen['score'].tolist(),
+            })
+        else:
+            for sheet_number, sheet in enumerate(wanted_sheets):
+                sheet_data = bundle_data.sheet(sheet)
+                filtered = find_nearest_bundles(
+                    conn,
+                    sheet_data.sku_index(conn),
+                    product_to_clear=product_to_clear,
+                    top_n=top_n,
+                    related_skus=related_skus,
+                    lsh=lambda: sheet_data.lsh_index(conn),
+                )
+                output[sheet] = filtered
 
-        all_skus = set(sku_to_price.keys())
-        # ---- BUILD FREQUENCY DICTIONARY FOR BUNDLES ----
-        bundle_count_dict = {}
-        for idx, row in df.iterrows():
-            key = ', '.join(sorted([s.strip() for s in str(row['SKUs']).split(',')]))
-            bundle_count_dict[key] = int(row['Count']) if 'Count' in row else 0
+                # SKU prices and bundle frequencies as arrays, for delta-scored swap moves
+                space = sheet_data.search_space(conn, margin)
+                name_map = sheet_data.product_names(conn)
 
-        if filtered.shape[0] > 0:
-            local_solutions = []
-            for idx, row in filtered.iterrows():
-                initial_bundle = set(map(str.strip, str(row['SKUs']).split(',')))
-                opt_bundle, opt_score = local_search_bundle(
-                    initial_bundle, all_skus, sku_to_price,
-                    bundle_count_dict=bundle_count_dict,
-                    bundle_size=size,
-                    target_margin=1 - (margin or 27) / 100,
-                    max_iters=30
-                )
-                # Robust SKU-to-product name mapping
-                name_map = {}
-                for idxx, rowx in df.iterrows():
-                    sku_list = [s.strip() for s in str(rowx['SKUs']).split(',')]
-                    prod_list = [p.strip() for p in str(rowx['Products']).split(',')]
-                    for i, sku in enumerate(sku_list):
-                        if i < len(prod_list):
-                            name_map[sku] = prod_list[i]
-                        elif len(prod_list) == 1:
-                            name_map[sku] = prod_list[0]
-                        else:
-                            name_map[sku] = ""
-                names = [name_map.get(sku, "") for sku in opt_bundle]
-                local_solutions.append({
-                    'SKUs': ', '.join(opt_bundle),
-                    'Products': ', '.join(names),
-                    'Optimized Score': opt_score,
-                })
-            local_df = pd.DataFrame(local_solutions).drop_duplicates('SKUs').sort_values('Optimized Score', ascending=False).head(top_n)
-            local_search_output[sheet] = local_df
+                if filtered.shape[0] > 0:
+                    local_solutions = []
+                    # One search per nearest bundle
+                    starts = [set(map(str.strip, str(skus).split(','))) for skus in filtered['SKUs']]
+                    if optimizer == "anneal":
+                        # Sheets left share the time left
+                        now = time.perf_counter()
+                        sheet_deadline = now + max(deadline - now, 0) / (len(wanted_sheets) - sheet_number)
+                        results = anneal_search(
+                            space, starts, sheet_deadline,
+                            target_margin=1 - (margin or 27) / 100,
+                            alpha=alpha
+                        )
+                        iterations += sum(stats['iterations'] for _, _, stats in results)
+                    else:
+                        results = multi_start_search(
+                            space, starts,
+                            target_margin=1 - (margin or 27) / 100,
+                            alpha=alpha,
+                            max_iters=30
+                        )
+                        results = [(opt_bundle, opt_score, None) for opt_bundle, opt_score in results]
+                    for opt_bundle, opt_score, search_stats in results:
+                        names = [name_map.get(sku, "") for sku in opt_bundle]
+                        local_solutions.append({
+                            'SKUs': ', '.join(opt_bundle),
+                            'Products': ', '.join(names),
+                            'Original Total Price': sheet_data.original_total(conn, opt_bundle),
+                            'Optimized Score': opt_score,
+                            'Search': search_stats,
+                        })
+                    local_df = pd.DataFrame(local_solutions).drop_duplicates('SKUs').sort_values('Optimized Score', ascending=False).head(top_n)
+                    local_search_output[sheet] = local_df
 
     # Convert DataFrames to dict and return in the expected format
     bundles_list = []
@@ -212,14 +340,27 @@ def optimize_bundles(
                 'bundle_id': str(uuid.uuid4()),
                 'name': f"Bundle {len(bundles_list) + 1}",
                 'items': [{'item_name': p.strip(), 'qty': 1} for p in row['Products'].split(',')],
+                # Undiscounted: the stored total, or the SKUs' unit prices summed (0 when one
+                # has none); ai_call applies the margin when it builds the prompt
                 'price': float(row.get('Original Total Price', 0)),
                 'profitMargin': f"{margin}%",
                 'duration': "2 weeks",  # Default duration
                 'season': "All year",   # Default season
                 'rationale': f"Optimized bundle with {len(row['Products'].split(','))} items"
             }
+            if optimizer == "anneal":
+                bundle['search'] = row['Search']
             bundles_list.append(bundle)
-    
+
+    if optimizer == "exact":
+        return {'bundles': bundles_list, 'search': {'optimizer': optimizer, **selection_stats}}
+    if optimizer == "anneal":
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Annealing made {iterations} moves, call took {elapsed_ms:.1f} ms of {budget_ms} ms")
+        return {
+            'bundles': bundles_list,
+            'search': {'optimizer': optimizer, 'budget_ms': budget_ms, 'elapsed_ms': round(elapsed_ms, 3), 'iterations': iterations},
+        }
     return {'bundles': bundles_list}
     
 def save_only_optimized_bundles(
@@ -1,9 +1,17 @@
 from flask import Blueprint, jsonify, request
+from app.llm_cache import cache_stats as llm_cache_stats
 from .ai import get_results_from_ai
-from .optimise_bundles import optimize_bundles
-import json
+from .jobs import JobQueue, QueueFull
+from .optimise_bundles import OPTIMIZERS, optimize_bundles, result_cache_stats
+from .store import (
+    db_connection,
+    delete_bundle,
+    favorite_bundles,
+    init_db,
+    list_bundles,
+)
+import re
 from datetime import datetime
-import sqlite3
 import logging
 
 # Configure logging
@@ -13,59 +21,34 @@ logger = logging.getLogger(__name__)
 bundles_bp = Blueprint("Bundles", __name__)
 
 
-def get_db_connection():
-    logger.debug("Opening database connection")
-    conn = sqlite3.connect("bundles.db")
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def init_db():
-    conn = get_db_connection()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bundles
-        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-         bundle_data TEXT NOT NULL,
-         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
-    """
-    )
-
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS favorites
-        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-         bundle_id TEXT NOT NULL,
-         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-         UNIQUE(bundle_id))
-    """
-    )
-
-    conn.commit()
-    conn.close()
-
-
 # Initialize the database when the blueprint is created
 init_db()
+# POST /bundles/generate runs get_results_from_ai as a background job
+jobs = JobQueue(get_results_from_ai)
 
 
 @bundles_bp.route("/bundles", methods=["GET"])
 def get_bundles():
     logger.info("GET /bundles request received")
     try:
-        conn = get_db_connection()
-        # Get the most recent bundle set
-        result = conn.execute(
-            "SELECT bundle_data FROM bundles ORDER BY created_at DESC LIMIT 1"
-        ).fetchone()
-        conn.close()
-
-        if result:
+        # Optional keyset pagination: ?limit=N, then ?limit=N&cursor=<next_cursor>
+        limit = request.args.get("limit", type=int)
+        cursor = request.args.get("cursor")
+        if (limit is not None and limit <= 0) or (cursor and not re.fullmatch(r"\d+:-?\d+", cursor)):
+            return jsonify({"error": "Invalid limit or cursor"}), 400
+
+        with db_connection() as conn:
+            # Get the most recent bundle set
+            bundles, next_cursor = list_bundles(conn, limit=limit, cursor=cursor)
+
+        if bundles:
             logger.info("Found existing bundles in database")
-            return jsonify(json.loads(result["bundle_data"])), 200
         else:
             logger.info("No bundles found in database")
-            return jsonify({"bundles": []}), 200
+        response = {"bundles": bundles}
+        if limit is not None:
+            response["next_cursor"] = next_cursor
+        return jsonify(response), 200
     except Exception as e:
         logger.error(f"Error in get_bundles: {e}")
         return jsonify({"error": str(e)}), 500
@@ -84,36 +67,50 @@ def generate_bundles():
         target_profit_margin_input = str(request_data.get("target_profit_margin_input", "35"))
         bundle_size = request_data.get("bundle_size", 10)
         bundle_cust_segment_input = request_data.get("bundle_cust_segment_input","None")
+        # Optional: {"optimizer": "anneal", "budget_ms": 200} trades bundle quality for latency
+        optimizer = request_data.get("optimizer", "greedy")
+        budget_ms = request_data.get("budget_ms")
+        # {"use_cache": false} regenerates instead of reusing cached bundles and completions
+        use_cache = request_data.get("use_cache", True) is not False
+        if optimizer not in OPTIMIZERS or (
+            budget_ms is not None and (isinstance(budget_ms, bool) or not isinstance(budget_ms, (int, float)) or budget_ms <= 0)
+        ):
+            return jsonify({"error": "Invalid optimizer or budget_ms"}), 400
 
         logger.info(f"Parameters: product_to_clear={product_to_clear}, margin={target_profit_margin_input}, size={bundle_size}")
 
-        # Then get AI results
-        logger.info("Calling get_results_from_ai")
-        result = get_results_from_ai(
-            product_to_clear=product_to_clear,
-            target_profit_margin_input=target_profit_margin_input,
-            top_n=bundle_size,
-            bundle_cust_segment_input=bundle_cust_segment_input,
-        )
-        logger.info("Successfully got results from AI")
-
-        if result:
-            # Store the new bundles in the database
-            logger.info("Storing bundles in database")
-            conn = get_db_connection()
-            conn.execute("INSERT INTO bundles (bundle_data) VALUES (?)", [json.dumps(result)])
-            conn.commit()
-            conn.close()
-            logger.info("Successfully stored bundles in database")
-            return jsonify(result), 200
-        else:
-            logger.error("AI returned no results")
-            return jsonify({"error": "Failed to generate bundles"}), 500
+        # Optimizing and the AI call take seconds; run them on the job pool instead of here
+        job, created = jobs.submit({
+            "product_to_clear": product_to_clear,
+            "target_profit_margin_input": target_profit_margin_input,
+            "top_n": bundle_size,
+            "bundle_cust_segment_input": bundle_cust_segment_input,
+            "optimizer": optimizer,
+            "budget_ms": budget_ms,
+            "use_cache": use_cache,
+        })
+        response = jsonify({"job_id": job["job_id"], "status": job["status"], "deduplicated": not created})
+        response.headers["Location"] = f"/bundles/jobs/{job['job_id']}"
+        return response, 202
+    except QueueFull as e:
+        logger.warning(f"Rejected generate request: {e}")
+        response = jsonify({"error": "Too many generation jobs pending, try again later"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
     except Exception as e:
         logger.error(f"Error in generate_bundles: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@bundles_bp.route("/bundles/jobs/<job_id>", methods=["GET"])
+def get_generation_job(job_id):
+    # Status of a generation job; once succeeded, result holds the stored bundles
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "No such job"}), 404
+    return jsonify(job), 200
+
+
 @bundles_bp.route("/bundles/delete", methods=["POST"])
 def delete_bundles():
     try:
@@ -123,31 +120,13 @@ def delete_bundles():
         if not bundle_id:
             return jsonify({"error": "No bundle_id provided"}), 400
 
-        conn = get_db_connection()
-        # Get the most recent bundle set
-        result = conn.execute(
-            "SELECT id, bundle_data FROM bundles ORDER BY created_at DESC LIMIT 1"
-        ).fetchone()
+        with db_connection() as conn:
+            # Single-row delete from the most recent bundle set
+            deleted = delete_bundle(conn, bundle_id)
 
-        if not result:
+        if deleted is None:
             return jsonify({"error": "No bundles found"}), 404
 
-        # Parse the JSON data
-        bundles_data = json.loads(result["bundle_data"])
-
-        # Filter out the bundle to delete
-        bundles_data["bundles"] = [
-            b for b in bundles_data["bundles"] if b["bundle_id"] != bundle_id
-        ]
-
-        # Update the database with the new bundles data
-        conn.execute(
-            "UPDATE bundles SET bundle_data = ? WHERE id = ?",
-            (json.dumps(bundles_data), result["id"]),
-        )
-        conn.commit()
-        conn.close()
-
         return jsonify({"message": "Bundle deleted successfully"}), 200
     except Exception as e:
         print(f"Error in delete_bundles: {str(e)}")
@@ -184,11 +163,10 @@ def get_data_user():
 @bundles_bp.route("/bundles/favorite/<bundle_id>", methods=["GET"])
 def get_favorite_status(bundle_id):
     try:
-        conn = get_db_connection()
-        result = conn.execute(
-            "SELECT id FROM favorites WHERE bundle_id = ?", (bundle_id,)
-        ).fetchone()
-        conn.close()
+        with db_connection() as conn:
+            result = conn.execute(
+                "SELECT id FROM favorites WHERE bundle_id = ?", (bundle_id,)
+            ).fetchone()
         return jsonify({"is_favorite": bool(result)}), 200
     except Exception as e:
         print(f"Error getting favorite status: {str(e)}")
@@ -205,14 +183,11 @@ def toggle_favorite():
         if not bundle_id:
             return jsonify({"error": "No bundle_id provided"}), 400
 
-        conn = get_db_connection()
-        if is_favorite:
-            conn.execute("INSERT OR IGNORE INTO favorites (bundle_id) VALUES (?)", (bundle_id,))
-        else:
-            conn.execute("DELETE FROM favorites WHERE bundle_id = ?", (bundle_id,))
-
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            if is_favorite:
+                conn.execute("INSERT OR IGNORE INTO favorites (bundle_id) VALUES (?)", (bundle_id,))
+            else:
+                conn.execute("DELETE FROM favorites WHERE bundle_id = ?", (bundle_id,))
         return jsonify({"message": "Favorite status updated successfully"}), 200
     except Exception as e:
         print(f"Error updating favorite status: {str(e)}")
@@ -222,29 +197,17 @@ def toggle_favorite():
 @bundles_bp.route("/bundles/favorites", methods=["GET"])
 def get_favorite_bundles():
     try:
-        conn = get_db_connection()
-        # Get the most recent bundle set
-        bundles_result = conn.execute(
-            "SELECT bundle_data FROM bundles ORDER BY created_at DESC LIMIT 1"
-        ).fetchone()
-
-        if not bundles_result:
-            return jsonify({"bundles": []}), 200
-
-        # Get all favorite bundle IDs
-        favorites = conn.execute("SELECT bundle_id FROM favorites").fetchall()
-        favorite_ids = [row["bundle_id"] for row in favorites]
-
-        # Parse the bundles data and filter for favorites
-        all_bundles = json.loads(bundles_result["bundle_data"])
-        favorite_bundles = {
-            "bundles": [
-                bundle for bundle in all_bundles["bundles"] if bundle["bundle_id"] in favorite_ids
-            ]
-        }
-
-        conn.close()
-        return jsonify(favorite_bundles), 200
+        with db_connection() as conn:
+            # Favorites of the most recent bundle set, joined in SQL
+            bundles = favorite_bundles(conn)
+
+        return jsonify({"bundles": bundles}), 200
     except Exception as e:
         print(f"Error getting favorite bundles: {str(e)}")
         return jsonify({"error": str(e)}), 500
+
+
+@bundles_bp.route("/bundles/cache", methods=["GET"])
+def get_result_cache_stats():
+    # Hit/miss counters of the optimize_bundles result cache, and the LLM completion cache
+    return jsonify({**result_cache_stats(), "completions": llm_cache_stats()}), 200
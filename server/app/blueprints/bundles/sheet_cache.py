@@ -0,0 +1,199 @@
+import logging
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .candidate_store import (
+    candidate_signatures,
+    candidate_summary,
+    discounted_prices,
+    sheet_names,
+    sheet_skus,
+    store_version,
+)
+from .local_search import SearchSpace
+from .minhash import LSH_BANDS, LshIndex
+from .sku_index import build_sku_index
+
+logger = logging.getLogger(__name__)
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class SheetData:
+    """
+    Lookups derived from one Bundles_N sheet of the candidate store: bundle counts, the
+    SKU -> product name and unit price maps, the inverted SKU index and LSH indexes, and per
+    margin the bundle prices, the SKU -> price map and the local-search space. The SKU
+    lookups are vectorized over the sheet's exploded SKU table, read from the store once.
+    Each is built on first use and then shared; none may be mutated by callers.
+    """
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.size = int(sheet.split("_")[1])
+        self._values = {}
+        # Re-entrant: some lookups are built from others
+        self._lock = threading.RLock()
+
+    def _get(self, key, build):
+        value = self._values.get(key)
+        if value is None:
+            with self._lock:
+                value = self._values.get(key)
+                if value is None:
+                    value = build()
+                    self._values[key] = value
+        return value
+
+    def sku_table(self, conn):
+        """The sheet's exploded SKU table, read once; the SKU lookups below derive from it"""
+        return self._get("sku_table", lambda: sheet_skus(conn, self.sheet))
+
+    def sku_lists(self, conn):
+        """{candidate id: [SKU, ...]} for every row of the sheet"""
+        def build():
+            table = self.sku_table(conn)
+            lists = {}
+            for candidate_id, sku in zip(table["candidate_id"].tolist(), table["sku"].tolist()):
+                lists.setdefault(candidate_id, []).append(sku)
+            return lists
+
+        return self._get("sku_lists", build)
+
+    def summary(self, conn):
+        return self._get("summary", lambda: candidate_summary(conn, self.sheet))
+
+    def prices(self, conn, margin):
+        """Every row's price at margin percent off, aligned with summary"""
+        return self._get(
+            ("prices", margin),
+            lambda: discounted_prices(self.summary(conn)["Original Total Price"].fillna(0), margin),
+        )
+
+    def bundle_counts(self, conn):
+        """Count of every bundle of the sheet, keyed by bundle_key"""
+        def build():
+            summary = self.summary(conn)
+            return dict(zip(summary["bundle_key"].tolist(), summary["Count"].fillna(0).astype(int).tolist()))
+
+        return self._get("bundle_counts", build)
+
+    def bundle_totals(self, conn):
+        """Original Total Price of every bundle of the sheet, keyed by bundle_key"""
+        def build():
+            summary = self.summary(conn)
+            totals = summary["Original Total Price"].fillna(0).astype(float)
+            return dict(zip(summary["bundle_key"].tolist(), totals.tolist()))
+
+        return self._get("bundle_totals", build)
+
+    def original_total(self, conn, skus):
+        """
+        Original Total Price of a bundle: the stored one when the sheet has the bundle, else
+        the sum of its SKUs' unit prices, or 0 when one of them has none
+        """
+        skus = sorted(set(skus))
+        total = self.bundle_totals(conn).get(", ".join(skus))
+        if total is not None:
+            return total
+        unit_prices = self.unit_prices(conn)
+        if all(sku in unit_prices for sku in skus):
+            return math.fsum(unit_prices[sku] for sku in skus)
+        return 0.0
+
+    def product_names(self, conn):
+        """SKU -> product name, from the last row of the sheet that contains the SKU"""
+        def build():
+            table = self.sku_table(conn).drop_duplicates("sku", keep="last")
+            return dict(zip(table["sku"].tolist(), table["name"].tolist()))
+
+        return self._get("product_names", build)
+
+    def unit_prices(self, conn):
+        """SKU -> unit price, for the SKUs the store has one for"""
+        def build():
+            table = self.sku_table(conn).dropna(subset=["price"]).drop_duplicates("sku", keep="last")
+            return dict(zip(table["sku"].tolist(), table["price"].astype(float).tolist()))
+
+        return self._get("unit_prices", build)
+
+    def sku_totals(self, conn):
+        """SKU -> highest Original Total Price of any bundle of the sheet containing the SKU"""
+        def build():
+            table = self.sku_table(conn)
+            summary = self.summary(conn)
+            totals = pd.Series(summary["Original Total Price"].to_numpy(), index=summary["id"].to_numpy())
+            best = totals.reindex(table["candidate_id"].to_numpy()).groupby(table["sku"].to_numpy(dtype=object)).max()
+            return pd.Series(best.to_numpy(dtype=np.float64), index=best.index)
+
+        return self._get("sku_totals", build)
+
+    def sku_prices(self, conn, margin):
+        """SKU -> highest price at margin percent off of any bundle of the sheet containing the SKU"""
+        def build():
+            totals = self.sku_totals(conn)
+            prices = discounted_prices(totals.to_numpy(), margin)
+            return {sku: None if np.isnan(price) else price for sku, price in zip(totals.index.tolist(), prices.tolist())}
+
+        return self._get(("sku_prices", margin), build)
+
+    def skus(self, conn):
+        """Every SKU of the sheet, the search space of the local search"""
+        return self._get("skus", lambda: frozenset(self.sku_totals(conn).index.tolist()))
+
+    def search_space(self, conn, margin):
+        return self._get(
+            ("search_space", margin), lambda: SearchSpace(self.sku_prices(conn, margin), self.bundle_counts(conn))
+        )
+
+    def sku_index(self, conn):
+        return self._get("sku_index", lambda: build_sku_index(self.summary(conn), self.sku_table(conn)))
+
+    def lsh_index(self, conn, bands=LSH_BANDS):
+        def build():
+            index = self.sku_index(conn)
+            return LshIndex(candidate_signatures(conn, self.sheet), index.counts, index.totals, index.valid, bands=bands)
+
+        return self._get(("lsh_index", bands), build)
+
+
+class BundleData:
+    """Everything optimize_bundles derives from one version of a candidate store"""
+
+    def __init__(self, conn, path, version):
+        self.path = path
+        self.version = version
+        self.sheets = sheet_names(conn)
+        self._sheet_data = {sheet: SheetData(sheet) for sheet in self.sheets}
+
+    def sheet(self, sheet):
+        return self._sheet_data[sheet]
+
+
+def get_bundle_data(conn, path):
+    """
+    Return the BundleData for the candidate store at path, shared across requests and
+    threads. The store's version token changes on every rewrite, so a rebuilt store (new
+    workbook, new data_processing.py run) gets fresh lookups on the next call and the old
+    ones are dropped.
+    """
+    version = store_version(conn)
+    data = _cache.get(path)
+    if data is not None and data.version == version:
+        return data
+    with _lock:
+        data = _cache.get(path)
+        if data is None or data.version != version:
+            data = BundleData(conn, path, version)
+            _cache[path] = data
+            logger.info(f"Loaded bundle data for {path} (version {version})")
+    return data
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
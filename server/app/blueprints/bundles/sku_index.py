@@ -0,0 +1,97 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+
+class SkuIndex:
+    """
+    Inverted index over the bundles of one sheet: SKU -> positions of the bundles that
+    contain it, plus per-bundle set sizes, Count, Original Total Price and whether the
+    bundle can be offered (has a positive Original Total Price).
+
+    A query only touches the postings of its own SKUs, so its cost depends on how many
+    bundles share a SKU with the target, not on the size of the sheet.
+    """
+
+    def __init__(self, ids, sku_lists, counts, totals, valid):
+        positions = np.repeat(np.arange(len(sku_lists)), [len(skus) for skus in sku_lists])
+        skus = [sku for row in sku_lists for sku in row]
+        self._build(ids, positions, skus, counts, totals, valid)
+
+    @classmethod
+    def from_pairs(cls, ids, positions, skus, counts, totals, valid):
+        """Build from flat (bundle position, SKU) pairs, e.g. a sheet's exploded SKU table"""
+        index = cls.__new__(cls)
+        index._build(ids, positions, skus, counts, totals, valid)
+        return index
+
+    def _build(self, ids, positions, skus, counts, totals, valid):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.totals = np.asarray(totals, dtype=np.float64)
+        self.valid = np.asarray(valid, dtype=bool)
+
+        pairs = pd.DataFrame({"position": np.asarray(positions, dtype=np.int64), "sku": pd.Series(skus, dtype=object)})
+        pairs = pairs.drop_duplicates()
+        self.sizes = np.bincount(pairs["position"], minlength=len(self.ids)).astype(np.int64)
+        self.postings = {
+            sku: np.unique(group) for sku, group in pairs["position"].groupby(pairs["sku"].to_numpy(), sort=False)
+        }
+        # Valid bundles best first by (Count, Original Total Price), for queries with no target
+        order = np.lexsort((np.arange(len(self.ids)), -self.totals, -self.counts))
+        self.by_count = order[self.valid[order]]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def top_by_count(self, top_n, exclude=()):
+        excluded = set(exclude)
+        picked = []
+        for position in self.by_count:
+            if len(picked) >= top_n:
+                break
+            if position not in excluded:
+                picked.append(int(position))
+        return picked
+
+    def nearest(self, target_skus, top_n):
+        """
+        Positions of the top_n valid bundles by Jaccard similarity to target_skus, ties
+        broken by Count then Original Total Price. Jaccard is overlap / (size + |target| -
+        overlap), with overlaps counted from the postings of the target SKUs; when fewer
+        than top_n bundles overlap, the rest are the best sellers.
+        """
+        target_skus = set(target_skus)
+        postings = [self.postings[sku] for sku in target_skus if sku in self.postings]
+        if postings:
+            positions, overlap = np.unique(np.concatenate(postings), return_counts=True)
+            keep = self.valid[positions]
+            positions, overlap = positions[keep], overlap[keep]
+            jaccard = overlap / (self.sizes[positions] + len(target_skus) - overlap)
+            best = heapq.nlargest(
+                top_n,
+                zip(jaccard.tolist(), self.counts[positions].tolist(), self.totals[positions].tolist(), (-positions).tolist()),
+            )
+            picked = [-item[3] for item in best]
+        else:
+            picked = []
+        if len(picked) < top_n:
+            picked += self.top_by_count(top_n - len(picked), exclude=picked)
+        return picked
+
+
+def build_sku_index(summary, sku_table):
+    """
+    Build the SkuIndex of one sheet from its candidate_summary rows and its exploded SKU
+    table (sheet_skus)
+    """
+    positions = np.searchsorted(summary["id"].to_numpy(), sku_table["candidate_id"].to_numpy())
+    return SkuIndex.from_pairs(
+        summary["id"],
+        positions,
+        sku_table["sku"].to_numpy(dtype=object),
+        summary["Count"].fillna(0),
+        summary["Original Total Price"].fillna(0),
+        summary["Original Total Price"] > 0,
+    )
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("BUNDLES_DB_PATH", "bundles.db")
+
+# Idle connections kept per database file; more are opened under load and closed when returned
+POOL_SIZE = int(os.environ.get("BUNDLES_DB_POOL_SIZE", "8"))
+# Seconds a writer waits on a locked database before raising "database is locked"
+BUSY_TIMEOUT = float(os.environ.get("BUNDLES_DB_BUSY_TIMEOUT", "5"))
+# Prepared statements cached per connection
+STATEMENT_CACHE_SIZE = 128
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _connect(path):
+    logger.debug(f"Opening database connection to {path}")
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers run alongside a writer; NORMAL only fsyncs at checkpoints in WAL mode
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _get_pool(path):
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(path, queue.LifoQueue(maxsize=POOL_SIZE))
+    return pool
+
+
+@contextmanager
+def db_connection(path=None):
+    """
+    Check a connection to the bundles database out of the pool.
+
+    Connections are reused across requests, so their WAL/synchronous settings and prepared
+    statement caches stay warm. The transaction is committed when the block exits cleanly
+    and rolled back on error; the connection then goes back to the pool.
+    """
+    path = path or DB_PATH
+    pool = _get_pool(path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(path)
+
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def close_connections(path=None):
+    """Close every idle pooled connection (all databases when no path is given)"""
+    with _pools_lock:
+        paths = [path] if path else list(_pools)
+        for p in paths:
+            pool = _pools.pop(p, None)
+            while pool is not None and not pool.empty():
+                pool.get_nowait().close()
+
+
+def init_db(path=None):
+    with db_connection(path) as conn:
+        # Legacy layout: one JSON blob per generated bundle set, kept for migration
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bundles
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             bundle_data TEXT NOT NULL,
+             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+        """
+        )
+
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bundle_sets
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+        """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bundle_sets_created_at ON bundle_sets(created_at, id)"
+        )
+
+        # One row per bundle; position keeps the order the bundles were generated in
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bundle_entries
+            (bundle_id TEXT PRIMARY KEY,
+             set_id INTEGER NOT NULL REFERENCES bundle_sets(id) ON DELETE CASCADE,
+             position INTEGER NOT NULL,
+             bundle_data TEXT NOT NULL)
+        """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_bundle_entries_set_position ON bundle_entries(set_id, position)"
+        )
+
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS favorites
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             bundle_id TEXT NOT NULL,
+             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+             UNIQUE(bundle_id))
+        """
+        )
+
+        _migrate_legacy_bundles(conn)
+
+
+def _migrate_legacy_bundles(conn):
+    """Copy the newest legacy JSON bundle set into the normalized tables, once"""
+    if conn.execute("SELECT 1 FROM bundle_sets LIMIT 1").fetchone():
+        return
+    legacy = conn.execute(
+        "SELECT bundle_data, created_at FROM bundles ORDER BY created_at DESC, id DESC LIMIT 1"
+    ).fetchone()
+    if legacy:
+        logger.info("Migrating latest legacy bundle set to normalized tables")
+        bundles = json.loads(legacy["bundle_data"]).get("bundles", [])
+        _insert_bundle_set(conn, bundles, created_at=legacy["created_at"])
+
+
+def _insert_bundle_set(conn, bundles, created_at=None):
+    if created_at is None:
+        cursor = conn.execute("INSERT INTO bundle_sets DEFAULT VALUES")
+    else:
+        cursor = conn.execute("INSERT INTO bundle_sets (created_at) VALUES (?)", (created_at,))
+    set_id = cursor.lastrowid
+    # A regenerated bundle id moves to the newest set
+    conn.executemany(
+        "INSERT OR REPLACE INTO bundle_entries (bundle_id, set_id, position, bundle_data) VALUES (?, ?, ?, ?)",
+        [
+            (str(bundle.get("bundle_id") or uuid.uuid4()), set_id, position, json.dumps(bundle))
+            for position, bundle in enumerate(bundles)
+        ],
+    )
+    return set_id
+
+
+def save_bundle_set(conn, result):
+    """Store a generated result ({"bundles": [...]}) as the newest bundle set"""
+    return _insert_bundle_set(conn, result.get("bundles", []))
+
+
+def latest_set_id(conn):
+    row = conn.execute(
+        "SELECT id FROM bundle_sets ORDER BY created_at DESC, id DESC LIMIT 1"
+    ).fetchone()
+    return row["id"] if row else None
+
+
+def list_bundles(conn, limit=None, cursor=None):
+    """
+    Return (bundles, next_cursor) for the newest bundle set, in generation order.
+
+    Pages are fetched by keyset on (set_id, position): the opaque cursor names the set and
+    the last position returned, so later pages stay on the same set even if a new one is
+    generated meanwhile. Without a limit every bundle of the set is returned.
+    """
+    if cursor:
+        set_id, after = (int(part) for part in str(cursor).split(":", 1))
+    else:
+        set_id, after = latest_set_id(conn), -1
+    if set_id is None:
+        return [], None
+
+    query = "SELECT position, bundle_data FROM bundle_entries WHERE set_id = ? AND position > ? ORDER BY position"
+    params = [set_id, after]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{set_id}:{rows[-1]['position']}"
+    return [json.loads(row["bundle_data"]) for row in rows], next_cursor
+
+
+def delete_bundle(conn, bundle_id):
+    """Delete one bundle from the newest set; returns None when there is no set at all"""
+    set_id = latest_set_id(conn)
+    if set_id is None:
+        return None
+    return conn.execute(
+        "DELETE FROM bundle_entries WHERE bundle_id = ? AND set_id = ?", (bundle_id, set_id)
+    ).rowcount
+
+
+def favorite_bundles(conn):
+    """Favorited bundles of the newest set, in generation order"""
+    rows = conn.execute(
+        """
+        SELECT e.bundle_data FROM bundle_entries e
+        JOIN favorites f ON f.bundle_id = e.bundle_id
+        WHERE e.set_id = (SELECT id FROM bundle_sets ORDER BY created_at DESC, id DESC LIMIT 1)
+        ORDER BY e.position
+        """
+    ).fetchall()
+    return [json.loads(row["bundle_data"]) for row in rows]
@@ -4,6 +4,8 @@ import numpy as np
 from datetime import datetime, timedelta
 from flask import jsonify
 import logging
+from app.data_store import load_frame
+from app.orders_schema import apply_orders_schema
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,12 +20,12 @@ BUNDLES_PATH = os.path.join(EXCEL_DIR, "bundles.json")
 # Read the Excel files once when the module loads
 try:
     logger.info(f"Attempting to read orders file from: {ORDERS_PATH}")
-    orders_df = pd.read_excel(ORDERS_PATH)
+    orders_df = apply_orders_schema(load_frame(ORDERS_PATH))
     logger.info(f"Successfully read orders file. Shape: {orders_df.shape}")
     logger.debug(f"Orders columns: {orders_df.columns.tolist()}")
     
     logger.info(f"Attempting to read inventory file from: {INVENTORY_PATH}")
-    inventory_df = pd.read_excel(INVENTORY_PATH)
+    inventory_df = load_frame(INVENTORY_PATH)
     logger.info(f"Successfully read inventory file. Shape: {inventory_df.shape}")
     logger.debug(f"Inventory columns: {inventory_df.columns.tolist()}")
 except Exception as e:
@@ -55,7 +57,7 @@ def get_avg_order_value():
         logger.debug(f"Current month for calculations: {current_month}")
         
         # Group by OrderNumber to get unique orders and their total amounts
-        order_totals = orders_df.groupby('OrderNumber')['TotalOrderAmount'].sum()
+        order_totals = orders_df.groupby('OrderNumber', observed=True)['TotalOrderAmount'].sum()
         logger.debug(f"Total unique orders: {len(order_totals)}")
         logger.debug(f"Sample of order totals: {order_totals.head()}")
         
@@ -63,7 +65,7 @@ def get_avg_order_value():
         current_orders = orders_df[orders_df['CreatedDate'].dt.to_period('M') == pd.Period(current_month, freq='M')]
         logger.debug(f"Current month orders count: {len(current_orders)}")
         
-        current_order_totals = current_orders.groupby('OrderNumber')['TotalOrderAmount'].sum()
+        current_order_totals = current_orders.groupby('OrderNumber', observed=True)['TotalOrderAmount'].sum()
         current_avg = convert_to_native_types(current_order_totals.mean() if not current_order_totals.empty else 0)
         logger.debug(f"Current month orders: {len(current_orders)}, Average: {current_avg}")
         
@@ -74,7 +76,7 @@ def get_avg_order_value():
         prev_orders = orders_df[orders_df['CreatedDate'].dt.to_period('M') == pd.Period(prev_month, freq='M')]
         logger.debug(f"Previous month orders count: {len(prev_orders)}")
         
-        prev_order_totals = prev_orders.groupby('OrderNumber')['TotalOrderAmount'].sum()
+        prev_order_totals = prev_orders.groupby('OrderNumber', observed=True)['TotalOrderAmount'].sum()
         prev_avg = convert_to_native_types(prev_order_totals.mean() if not prev_order_totals.empty else current_avg)
         logger.debug(f"Previous month orders: {len(prev_orders)}, Average: {prev_avg}")
         
@@ -1,12 +1,12 @@
-import pandas as pd
 import os
+from app.data_store import load_frame
 
 EXCEL_PATH = "excel/inventory_enriched.xlsx"
 
 
 def getInventory(dropdown=False):
-    # Διαβάζει το Excel
-    df = pd.read_excel(EXCEL_PATH)
+    # Διαβάζει το Excel (από το cached snapshot)
+    df = load_frame(EXCEL_PATH)
 
     # Μετονομασία στήλης
     df = df.rename(columns={"OriginalUnitPrice": "price"})
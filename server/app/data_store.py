@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+
+    SNAPSHOT_FORMAT = "parquet"
+except ImportError:  # pragma: no cover - pyarrow is listed in requirements
+    SNAPSHOT_FORMAT = "pickle"
+
+logger = logging.getLogger(__name__)
+
+# Columnar snapshots of a workbook live in .snapshots next to it; SNAPSHOT_DIR collects them
+# in one directory instead
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR")
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_prefix(path, sheet_name):
+    directory = SNAPSHOT_DIR or os.path.join(os.path.dirname(os.path.abspath(path)), ".snapshots")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    sheet = str(sheet_name).replace(os.sep, "_")
+    return directory, f"{stem}-{sheet}-"
+
+
+def _snapshot_path(path, sheet_name, digest):
+    directory, prefix = _snapshot_prefix(path, sheet_name)
+    extension = "parquet" if SNAPSHOT_FORMAT == "parquet" else "pkl"
+    return os.path.join(directory, f"{prefix}{digest[:16]}.{extension}")
+
+
+def _remove_old_snapshots(path, sheet_name, snapshot_path):
+    """Delete the snapshots of earlier versions of a workbook sheet"""
+    directory, prefix = _snapshot_prefix(path, sheet_name)
+    pattern = re.compile(re.escape(prefix) + r"[0-9a-f]{16}\.(parquet|pkl)")
+    for name in os.listdir(directory):
+        old_path = os.path.join(directory, name)
+        if pattern.fullmatch(name) and old_path != snapshot_path:
+            try:
+                os.remove(old_path)
+                logger.info(f"Removed old snapshot {old_path}")
+            except OSError as e:
+                logger.warning(f"Could not remove old snapshot {old_path}: {e}")
+
+
+def _read_snapshot(snapshot_path):
+    if SNAPSHOT_FORMAT == "parquet":
+        return pd.read_parquet(snapshot_path, memory_map=True)
+    return pd.read_pickle(snapshot_path)
+
+
+def _write_snapshot(df, snapshot_path):
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    if SNAPSHOT_FORMAT == "parquet":
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+
+def _normalize_for_snapshot(df):
+    # Excel mixes ints and strings in id-like columns (e.g. SKU); parquet needs one type per column
+    for col in df.columns:
+        if df[col].dtype == object:
+            kinds = df[col].dropna().map(type).unique()
+            if len(kinds) > 1:
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _build_frame(path, sheet_name, digest):
+    snapshot_path = _snapshot_path(path, sheet_name, digest)
+    if os.path.exists(snapshot_path):
+        logger.info(f"Loading snapshot {snapshot_path}")
+        return _read_snapshot(snapshot_path)
+
+    logger.info(f"No snapshot for {path} [{sheet_name}], parsing workbook")
+    df = _normalize_for_snapshot(pd.read_excel(path, sheet_name=sheet_name))
+    try:
+        _write_snapshot(df, snapshot_path)
+        logger.info(f"Wrote snapshot {snapshot_path}")
+        _remove_old_snapshots(path, sheet_name, snapshot_path)
+    except Exception as e:
+        logger.warning(f"Could not write snapshot for {path}: {e}")
+        return df
+    # Serve the snapshot itself so cold and warm loads see identical dtypes
+    return _read_snapshot(snapshot_path)
+
+
+def load_frame(path, sheet_name=0):
+    """
+    Return the DataFrame for one sheet of an Excel workbook.
+
+    The workbook is parsed at most once per content hash: the parsed frame is written to a
+    columnar snapshot in .snapshots next to the workbook (or SNAPSHOT_DIR), replacing the
+    snapshot of its previous contents, and kept in memory, keyed by path and sheet. Later
+    calls only stat the file and return the cached frame unless its mtime or size changed.
+    The returned frame is shared between callers and must be treated as read-only.
+    """
+    key = (os.path.abspath(path), sheet_name)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _cache.get(key)
+    if entry is not None and entry["version"] == version:
+        return entry["frame"]
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["frame"]
+
+        digest = file_hash(path)
+        if entry is not None and entry["digest"] == digest:
+            # File was touched but its contents did not change
+            entry["version"] = version
+            return entry["frame"]
+
+        frame = _build_frame(path, sheet_name, digest)
+        _cache[key] = {"version": version, "digest": digest, "frame": frame}
+        return frame
+
+
+def data_version(path, sheet_name=0):
+    """Return the content hash of the snapshot currently served for a workbook sheet"""
+    load_frame(path, sheet_name)
+    return _cache[(os.path.abspath(path), sheet_name)]["digest"]
+
+
+def clear_cache():
+    """Drop all in-memory frames; snapshots on disk are kept"""
+    with _lock:
+        _cache.clear()
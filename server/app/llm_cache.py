@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Completions are cached on disk next to the workbooks they were generated from
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", os.path.join("excel", "llm_cache.db"))
+# Cached completions kept, in bytes of response text; least recently used go first
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 << 20)))
+# Seconds a completion stays valid; unset keeps completions until they are evicted
+LLM_CACHE_TTL_S = float(os.environ["LLM_CACHE_TTL_S"]) if os.environ.get("LLM_CACHE_TTL_S") else None
+# Set to 1 to always ask the model (the cache is neither read nor written)
+LLM_CACHE_BYPASS = os.environ.get("LLM_CACHE_BYPASS", "0") == "1"
+
+_initialized = set()
+_lock = threading.Lock()
+
+
+def cache_key(model, prompt, params):
+    """sha256 of the model, prompt and request parameters; parameter order does not matter"""
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _connect(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized:
+        with _lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions
+                (key TEXT PRIMARY KEY,
+                 model TEXT NOT NULL,
+                 response TEXT NOT NULL,
+                 size INTEGER NOT NULL,
+                 created_at REAL NOT NULL,
+                 last_used REAL NOT NULL,
+                 hits INTEGER NOT NULL DEFAULT 0)
+            """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions(last_used)")
+            conn.commit()
+            _initialized.add(path)
+    return conn
+
+
+def _evict(conn, max_bytes, ttl, now):
+    if ttl is not None:
+        conn.execute("DELETE FROM completions WHERE created_at < ?", (now - ttl,))
+    # Keep the most recently used completions that fit in max_bytes together
+    conn.execute(
+        """DELETE FROM completions WHERE key IN (
+               SELECT key FROM (
+                   SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS kept FROM completions)
+               WHERE kept > ?)""",
+        (max_bytes,),
+    )
+
+
+def cached_completion(model, prompt, params, complete, bypass=False, path=None, max_bytes=None, ttl=None):
+    """
+    complete() for model, prompt and params, answered from the on-disk cache when an
+    identical request was completed before.
+
+    Entries are keyed by cache_key, so any change to the prompt or parameters is a miss.
+    Only text returned by complete() is stored; exceptions propagate and nothing is
+    cached. bypass, or LLM_CACHE_BYPASS for every call, skips the cache entirely.
+    """
+    if bypass or LLM_CACHE_BYPASS:
+        return complete()
+    path = path or LLM_CACHE_PATH
+    max_bytes = LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    ttl = LLM_CACHE_TTL_S if ttl is None else ttl
+    key = cache_key(model, prompt, params)
+    now = time.time()
+
+    try:
+        conn = _connect(path)
+    except sqlite3.Error as e:
+        logger.warning(f"LLM cache at {path} unavailable, calling {model} directly: {e}")
+        return complete()
+    try:
+        row = conn.execute("SELECT response, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is not None and (ttl is None or now - row["created_at"] <= ttl):
+            with conn:
+                conn.execute("UPDATE completions SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            logger.info(f"LLM cache hit for {model} ({key[:12]})")
+            return row["response"]
+
+        logger.info(f"LLM cache miss for {model} ({key[:12]})")
+        response = complete()
+        if not isinstance(response, str):
+            return response
+        size = len(response.encode())
+        if size <= max_bytes:
+            now = time.time()
+            with conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO completions (key, model, response, size, created_at, last_used)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (key, model, response, size, now, now),
+                )
+                _evict(conn, max_bytes, ttl, now)
+        return response
+    finally:
+        conn.close()
+
+
+def cache_stats(path=None):
+    """Number of cached completions, their size in bytes and the hits they served"""
+    conn = _connect(path or LLM_CACHE_PATH)
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes, COALESCE(SUM(hits), 0) AS hits FROM completions"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {
+        **dict(row),
+        "max_bytes": LLM_CACHE_MAX_BYTES,
+        "ttl": LLM_CACHE_TTL_S,
+        "bypass": LLM_CACHE_BYPASS,
+    }
+
+
+def clear_cache(path=None):
+    conn = _connect(path or LLM_CACHE_PATH)
+    try:
+        with conn:
+            conn.execute("DELETE FROM completions")
+    finally:
+        conn.close()
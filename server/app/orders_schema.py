@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+# Shared column types for the orders frame. Every loader (dashboard, data_processing.py,
+# bundle_recommendations.py, bundles-cluster.py) goes through apply_orders_schema so that
+# identifiers and repeated text are stored as integer-coded categoricals instead of Python
+# string objects, and groupbys on SKU/OrderNumber run on the integer codes.
+
+# Identifier columns whose values are normalised to strings before coding
+ID_COLUMNS = ["SKU", "OrderNumber", "UserID"]
+# Repeated text columns, coded as they are ("ItemTitle" is the database spelling)
+TEXT_COLUMNS = ["Category", "Brand", "Item title", "ItemTitle"]
+# Unit prices fit float32 exactly enough for cents; order-level totals stay float64 so that
+# revenue sums over many orders do not lose precision
+PRICE_COLUMNS = ["OriginalUnitPrice", "FinalUnitPrice"]
+
+
+def _text(value):
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _text_category(series):
+    """
+    Code an id column as a categorical of strings. Excel yields ints for numeric SKUs and
+    order numbers; 1053846, 1053846.0 and "1053846" all become the category "1053846".
+    Only the distinct values are converted, so this stays cheap on long frames.
+    """
+    coded = series.astype("category")
+    texts = [_text(v) for v in coded.cat.categories]
+    categories = pd.Index(texts).unique()
+    remap = categories.get_indexer(texts).astype(np.int32)
+    codes = coded.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, remap[codes], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories), index=series.index, name=series.name
+    )
+
+
+def apply_orders_schema(df, copy=True):
+    """Return the orders frame with categorical id/text columns and float32 unit prices"""
+    if copy:
+        df = df.copy()
+    for col in ID_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = _text_category(df[col])
+    for col in TEXT_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    return df
+
+
+def read_orders(path, sheet_name=0):
+    """Read an orders sheet from Excel and apply the shared schema"""
+    return apply_orders_schema(pd.read_excel(path, sheet_name=sheet_name), copy=False)
+
+
+def fill_category(series, value):
+    """fillna for categorical columns, adding the fill value to the categories if needed"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def sku_dictionary(df, column="SKU"):
+    """
+    Return (codes, skus) for a categorical SKU column: an int32 code per row (-1 for missing)
+    and the SKU string each code stands for. Codes index directly into arrays sized
+    len(skus), which is what the co-occurrence and counting engines work on.
+    """
+    series = df[column]
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = _text_category(series)
+    codes = series.cat.codes.to_numpy().astype(np.int32, copy=False)
+    skus = np.asarray(series.cat.categories.astype(str), dtype=object)
+    return codes, skus
@@ -8,6 +8,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import create_app
 
+
 @pytest.fixture
 def app():
     app = create_app()
@@ -16,10 +17,12 @@ def app():
     })
     yield app
 
+
 @pytest.fixture
 def client(app):
     return app.test_client()
 
+
 def test_get_bundles_empty(client):
     response = client.get("/bundles")
     assert response.status_code == 200
@@ -27,6 +30,7 @@ def test_get_bundles_empty(client):
     assert "bundles" in data
     assert isinstance(data["bundles"], list)
 
+
 def test_favorite_bundle(client):
     # Test favoriting a bundle
     bundle_id = "test-bundle-1"
@@ -49,4 +53,576 @@ def test_favorite_bundle(client):
     response = client.get(f"/bundles/favorite/{bundle_id}")
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert data["is_favorite"] is False 
\ No newline at end of file
+    assert data["is_favorite"] is False 
+
+
+def test_store_connection_settings(app):
+    from app.blueprints.bundles.store import db_connection
+
+    with db_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    # The connection goes back to the pool and is handed out again
+    with db_connection() as again:
+        assert again is conn
+
+
+def test_concurrent_favorite_toggles(app):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def toggle(i):
+        client = app.test_client()
+        bundle_id = f"concurrent-bundle-{i % 4}"
+        response = client.post("/bundles/favorite", json={"bundle_id": bundle_id, "is_favorite": i % 2 == 0})
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(toggle, range(64)))
+    assert statuses == [200] * 64
+
+
+@pytest.fixture
+def store_db(tmp_path, monkeypatch):
+    from app.blueprints.bundles import store
+
+    monkeypatch.setattr(store, "DB_PATH", str(tmp_path / "bundles.db"))
+    store.init_db()
+    yield store
+    store.close_connections(store.DB_PATH)
+
+
+def _save_bundles(store, ids):
+    with store.db_connection() as conn:
+        store.save_bundle_set(conn, {"bundles": [{"bundle_id": i, "name": i} for i in ids]})
+
+
+def test_get_bundles_keyset_pagination(client, store_db):
+    _save_bundles(store_db, ["old-1"])
+    _save_bundles(store_db, ["b1", "b2", "b3", "b4", "b5"])
+
+    response = client.get("/bundles")
+    assert [b["bundle_id"] for b in json.loads(response.data)["bundles"]] == ["b1", "b2", "b3", "b4", "b5"]
+
+    seen, cursor = [], None
+    while True:
+        url = "/bundles?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        data = json.loads(client.get(url).data)
+        seen += [b["bundle_id"] for b in data["bundles"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["b1", "b2", "b3", "b4", "b5"]
+
+    assert client.get("/bundles?cursor=oops").status_code == 400
+
+
+def test_delete_and_favorites_use_latest_set(client, store_db):
+    assert client.post("/bundles/delete", json={"bundle_id": "b1"}).status_code == 404
+
+    _save_bundles(store_db, ["b1", "b2", "b3"])
+    client.post("/bundles/favorite", json={"bundle_id": "b3", "is_favorite": True})
+    client.post("/bundles/favorite", json={"bundle_id": "b2", "is_favorite": True})
+
+    assert client.post("/bundles/delete", json={"bundle_id": "b2"}).status_code == 200
+    data = json.loads(client.get("/bundles").data)
+    assert [b["bundle_id"] for b in data["bundles"]] == ["b1", "b3"]
+
+    data = json.loads(client.get("/bundles/favorites").data)
+    assert [b["bundle_id"] for b in data["bundles"]] == ["b3"]
+
+
+def test_legacy_bundle_blob_is_migrated(tmp_path):
+    import sqlite3
+    from app.blueprints.bundles import store
+
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE bundles (id INTEGER PRIMARY KEY AUTOINCREMENT, bundle_data TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO bundles (bundle_data) VALUES (?)", [json.dumps({"bundles": [{"bundle_id": "x"}, {"bundle_id": "y"}]})])
+    conn.commit()
+    conn.close()
+
+    store.init_db(path)
+    with store.db_connection(path) as conn:
+        bundles, _ = store.list_bundles(conn)
+    store.close_connections(path)
+    assert [b["bundle_id"] for b in bundles] == ["x", "y"]
+
+
+def _candidate_sheets():
+    import pandas as pd
+
+    rows = [
+        ("A, B", "Apple, Banana", 9, 10.0),
+        ("B, C", "Banana, Cherry", 7, 12.0),
+        ("C, D", "Cherry, Date", 5, 8.0),
+        ("D, E", "Date, Elderberry", 3, 6.0),
+    ]
+    df = pd.DataFrame(rows, columns=["SKUs", "Products", "Count", "Original Total Price"])
+    df["Bundle Size"] = 2
+    # Older workbooks also carry precomputed discount columns; the store ignores them
+    df["Suggested Price (30% off)"] = (df["Original Total Price"] * 0.7).round(2)
+    prices = pd.DataFrame({"SKU": ["A", "B", "C", "D", "E"], "Unit Price": [4.0, 6.0, 6.0, 2.0, 4.0]})
+    return {"Bundles_2": df, "SKU Prices": prices}
+
+
+def test_candidate_store_fetches_only_matching_rows(tmp_path):
+    from app.blueprints.bundles import candidate_store, sheet_cache
+    from app.blueprints.bundles.store import close_connections, db_connection
+
+    path = str(tmp_path / "candidates.db")
+    with db_connection(path) as conn:
+        candidate_store.write_candidates(conn, _candidate_sheets())
+
+        # Only the rows asked for, in the order asked for
+        sheet_data = sheet_cache.get_bundle_data(conn, path).sheet("Bundles_2")
+        ids = sheet_data.summary(conn)["id"].tolist()
+        df = candidate_store.fetch_rows(conn, [ids[3], ids[0]])
+        assert df["SKUs"].tolist() == ["D, E", "A, B"]
+        assert "Suggested Price (30% off)" not in df.columns
+
+        # Priced at any margin from the highest Original Total Price containing the SKU
+        assert sheet_data.sku_prices(conn, 30)["C"] == 8.4
+        assert sheet_data.sku_prices(conn, 37.5)["C"] == 7.5
+        assert sheet_data.bundle_counts(conn)["B, C"] == 7
+        assert sheet_data.bundle_totals(conn)["B, C"] == 12.0
+        assert sheet_data.product_names(conn)["E"] == "Elderberry"
+    close_connections(path)
+
+
+def test_explode_skus_pairs_names_by_position():
+    import pandas as pd
+    from app.blueprints.bundles.candidate_store import explode_skus
+
+    df = pd.DataFrame({"SKUs": ["A, B", "C, D", "E, F, G"], "Products": ["Apple, Banana", "Cherries", "Eel, Fig"]})
+    assert list(explode_skus(df).itertuples(index=False, name=None)) == [
+        (0, "A", "Apple"), (0, "B", "Banana"),
+        (1, "C", "Cherries"), (1, "D", "Cherries"),
+        (2, "E", "Eel"), (2, "F", "Fig"), (2, "G", ""),
+    ]
+
+
+def test_candidate_store_reimports_changed_workbook(tmp_path):
+    import pandas as pd
+    from app.blueprints.bundles import candidate_store, sheet_cache
+    from app.blueprints.bundles.store import close_connections, db_connection
+
+    excel_path = str(tmp_path / "suggestions.xlsx")
+    sheets = _candidate_sheets()
+    with pd.ExcelWriter(excel_path) as writer:
+        sheets["Bundles_2"].to_excel(writer, sheet_name="Bundles_2", index=False)
+
+    path = candidate_store.ensure_candidates(excel_path)
+    assert path == str(tmp_path / "suggestions.db")
+    with db_connection(path) as conn:
+        assert sheet_cache.get_bundle_data(conn, path).sheet("Bundles_2").bundle_counts(conn)["A, B"] == 9
+
+    sheets["Bundles_2"].loc[0, "Count"] = 11
+    with pd.ExcelWriter(excel_path) as writer:
+        sheets["Bundles_2"].to_excel(writer, sheet_name="Bundles_2", index=False)
+    os.utime(excel_path, ns=(0, os.stat(excel_path).st_mtime_ns + 10**9))
+
+    candidate_store.ensure_candidates(excel_path)
+    with db_connection(path) as conn:
+        assert sheet_cache.get_bundle_data(conn, path).sheet("Bundles_2").bundle_counts(conn)["A, B"] == 11
+    close_connections(path)
+
+
+def test_result_cache_is_lru_with_ttl():
+    from app.blueprints.bundles.result_cache import ResultCache
+
+    now = [0.0]
+    cache = ResultCache(2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() | {"ttl": None} == {
+        "size": 1, "maxsize": 2, "ttl": None, "hits": 2, "misses": 2, "hit_rate": 0.5, "evictions": 1, "expirations": 1,
+    }
+
+
+def test_optimize_bundles_results_are_cached_per_workbook_version(tmp_path):
+    import pandas as pd
+    from app.blueprints.bundles import optimise_bundles
+    from app.blueprints.bundles.store import close_connections
+
+    excel_path = str(tmp_path / "suggestions.xlsx")
+    sheets = _candidate_sheets()
+    with pd.ExcelWriter(excel_path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+    optimise_bundles.clear_result_cache()
+    first = optimise_bundles.optimize_bundles("C", "30%", top_n=2, related_skus=["D"], excel_path=excel_path)
+    # Same request with the arguments spelled differently
+    again = optimise_bundles.optimize_bundles("C", "30", top_n=2, related_skus=("D",), excel_path=excel_path)
+    stats = optimise_bundles.result_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    strip = lambda result: [{k: v for k, v in b.items() if k != "bundle_id"} for b in result["bundles"]]
+    assert strip(again) == strip(first)
+    # Each caller gets its own bundles with their own ids
+    assert {b["bundle_id"] for b in again["bundles"]}.isdisjoint(b["bundle_id"] for b in first["bundles"])
+
+    os.utime(excel_path, ns=(0, os.stat(excel_path).st_mtime_ns + 10**9))
+    optimise_bundles.optimize_bundles("C", "30", top_n=2, related_skus=["D"], excel_path=excel_path)
+    stats = optimise_bundles.result_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 1)
+    optimise_bundles.clear_result_cache()
+    close_connections(str(tmp_path / "suggestions.db"))
+
+
+def test_sku_index_ranks_by_jaccard_then_count():
+    from app.blueprints.bundles.sku_index import SkuIndex
+
+    sku_lists = [["A", "B"], ["A", "B", "C"], ["C", "D"], ["E", "F"], ["A", "X"]]
+    counts = [5, 9, 7, 20, 1]
+    valid = [True, True, True, True, False]
+    index = SkuIndex([10, 11, 12, 13, 14], sku_lists, counts, [1.0] * 5, valid)
+
+    # {A, B} matches row 0 exactly, row 1 at 2/3; row 4 overlaps but has no positive price
+    assert index.nearest({"A", "B"}, 2) == [0, 1]
+    # Not enough overlapping bundles: the rest are the best sellers
+    assert index.nearest({"D"}, 3) == [2, 3, 1]
+    assert index.top_by_count(2) == [3, 1]
+
+
+def test_lsh_finds_similar_bundles():
+    from app.blueprints.bundles.minhash import LshIndex, signatures
+
+    sku_lists = [["A", "B", "C", "D"], ["A", "B", "C", "E"], ["X", "Y"], ["A", "B", "C", "D"]]
+    sigs = signatures(sku_lists)
+    # Stored signatures must not depend on the process (Python's str hash is salted)
+    assert (sigs == signatures(sku_lists)).all() and (sigs[0] == sigs[3]).all()
+
+    lsh = LshIndex(sigs, counts=[1, 2, 3, 4], totals=[1.0] * 4, valid=[True] * 4, bands=64)
+    assert lsh.similar(0, 2) == [3, 1]
+    assert lsh.nearest({"X", "Y"}, 1) == [2]
+
+
+def test_local_search_takes_best_swap_including_known_bundles():
+    from app.blueprints.bundles.local_search import SearchSpace, local_search_bundle
+
+    prices = {"A": 1.0, "B": 2.0, "C": 3.0, "D": 9.0, "E": 4.0}
+    space = SearchSpace(prices, {"A, E": 40, "D, E": 1})
+    # Margin alone would climb to D, E; the frequent A, E bundle wins with alpha=0.5
+    assert local_search_bundle(space, {"A", "B"}, target_margin=1.0, alpha=0.0) == (["D", "E"], 13.0)
+    assert local_search_bundle(space, {"A", "B"}, target_margin=1.0, alpha=0.5) == (["A", "E"], 22.5)
+
+
+def test_annealing_escapes_local_optimum():
+    import time
+    from app.blueprints.bundles.local_search import SearchSpace, anneal_bundle, local_search_bundle
+
+    # Every single swap from A, B ties, so hill climbing stops; C, D is two swaps away
+    space = SearchSpace({"A": 1.0, "B": 1.0, "C": 1.0, "D": 1.0, "E": 1.0}, {"C, D": 100})
+    assert local_search_bundle(space, {"A", "B"}, target_margin=1.0, alpha=0.5) == (["A", "B"], 1.5)
+
+    skus, score, stats = anneal_bundle(
+        space, {"A", "B"}, time.perf_counter() + 10, target_margin=1.0, alpha=0.5, max_iters=500
+    )
+    assert (skus, score) == (["C", "D"], 51.0)
+    assert stats["iterations"] == 500
+    assert [point[1] for point in stats["trajectory"]] == [1.5, 51.0]
+
+
+def test_exact_selection_beats_greedy_within_stock_and_margin():
+    import pandas as pd
+    from app.blueprints.bundles.bundle_selection import exact_bundles
+
+    candidates = pd.DataFrame({
+        "SKUs": [["A", "B"], ["A", "C"], ["B", "D"], ["C", "D"], ["E", "F"]],
+        "price": [100.0, 80.0, 80.0, 60.0, 500.0],
+        "score": [10.0, 8.0, 8.0, 1.0, 50.0],
+    })
+    stock = {"A": 1, "B": 1, "C": 1, "D": 1, "E": 5}
+    costs = {sku: 10.0 for sku in stock}
+
+    # Greedy takes A, B and is left with C, D; the exact pair A, C + B, D scores 16
+    chosen, stats = exact_bundles(candidates, 2, stock, costs)
+    assert chosen["SKUs"].tolist() == [["A", "C"], ["B", "D"]]
+    assert (stats["greedy_score"], stats["score"], stats["optimal"]) == (11.0, 16.0, True)
+    assert stats["filtered_by_stock"] == 1
+
+    # A 80% margin needs price >= 100 for two 10.0 units, leaving only A, B
+    chosen, stats = exact_bundles(candidates, 2, stock, costs, min_margin=80)
+    assert chosen["SKUs"].tolist() == [["A", "B"]]
+    assert stats["filtered_by_margin"] == 3
+
+
+def test_multi_start_search_searches_every_start_in_order():
+    from app.blueprints.bundles import local_search
+
+    prices = {f"S{i:02d}": float(i % 7 + 1) for i in range(30)}
+    counts = {f"S{i:02d}, S{i + 1:02d}": 10 * i for i in range(29)}
+    space = local_search.SearchSpace(prices, counts)
+    starts = [{f"S{i:02d}", f"S{(i * 7) % 30:02d}"} for i in range(1, 30) if i != (i * 7) % 30]
+    assert local_search.multi_start_search(space, starts, alpha=0.5) == [
+        local_search.local_search_bundle(space, start, alpha=0.5) for start in starts
+    ]
+
+
+def test_bundle_data_is_shared_until_store_is_rewritten(tmp_path):
+    from app.blueprints.bundles import candidate_store, sheet_cache
+    from app.blueprints.bundles.store import close_connections, db_connection
+
+    path = str(tmp_path / "candidates.db")
+    with db_connection(path) as conn:
+        candidate_store.write_candidates(conn, _candidate_sheets())
+    with db_connection(path) as conn:
+        data = sheet_cache.get_bundle_data(conn, path)
+        prices = data.sheet("Bundles_2").sku_prices(conn, 30)
+        assert data.sheet("Bundles_2").skus(conn) == {"A", "B", "C", "D", "E"}
+        assert prices == {"A": 7.0, "B": 8.4, "C": 8.4, "D": 5.6, "E": 4.2}
+        assert data.sheet("Bundles_2").product_names(conn) == {
+            "A": "Apple", "B": "Banana", "C": "Cherry", "D": "Date", "E": "Elderberry"
+        }
+        # Stored bundles keep their total; new ones add up the unit prices
+        assert data.sheet("Bundles_2").original_total(conn, ["B", "A"]) == 10.0
+        assert data.sheet("Bundles_2").original_total(conn, ["A", "C", "E"]) == 14.0
+        # Same objects on the next request
+        again = sheet_cache.get_bundle_data(conn, path)
+        assert again is data and again.sheet("Bundles_2").sku_prices(conn, 30) is prices
+
+        candidate_store.write_candidates(conn, _candidate_sheets())
+    with db_connection(path) as conn:
+        assert sheet_cache.get_bundle_data(conn, path) is not data
+    close_connections(path)
+
+
+def test_generate_rejects_unknown_optimizer(client):
+    response = client.post("/bundles/generate", json={"optimizer": "genetic"})
+    assert response.status_code == 400
+    response = client.post("/bundles/generate", json={"optimizer": "anneal", "budget_ms": -5})
+    assert response.status_code == 400
+
+
+def test_generate_runs_as_deduplicated_background_job(client, monkeypatch, tmp_path):
+    import threading
+    from app.blueprints.bundles import routes
+    from app.blueprints.bundles.jobs import JobQueue
+    from app.blueprints.bundles.store import close_connections, db_connection, init_db, list_bundles
+
+    path = str(tmp_path / "bundles.db")
+    init_db(path)
+    release, calls = threading.Event(), []
+
+    def generate(**params):
+        # Local stand-in for the optimizer and the Azure call
+        calls.append(params)
+        release.wait(5)
+        return {"bundles": [{"bundle_id": "b1", "name": "Stub bundle", "items": []}]}
+
+    queue = JobQueue(generate, workers=1, db_path=path)
+    monkeypatch.setattr(routes, "jobs", queue)
+
+    first = client.post("/bundles/generate", json={"product_to_clear": "SKU1"})
+    assert first.status_code == 202
+    job_id = first.get_json()["job_id"]
+    assert first.headers["Location"] == f"/bundles/jobs/{job_id}"
+    again = client.post("/bundles/generate", json={"product_to_clear": "SKU1"}).get_json()
+    assert again["job_id"] == job_id and again["deduplicated"]
+
+    release.set()
+    queue.shutdown()
+    job = client.get(f"/bundles/jobs/{job_id}").get_json()
+    assert job["status"] == "succeeded" and job["result"]["bundles"][0]["name"] == "Stub bundle"
+    assert len(calls) == 1
+    with db_connection(path) as conn:
+        assert [b["bundle_id"] for b in list_bundles(conn)[0]] == ["b1"]
+    assert client.get("/bundles/jobs/nope").status_code == 404
+    close_connections(path)
+
+
+def test_job_queue_reports_failures_and_rejects_when_full(tmp_path):
+    import threading
+    from app.blueprints.bundles.jobs import JobQueue, QueueFull
+    from app.blueprints.bundles.store import close_connections, init_db
+
+    path = str(tmp_path / "bundles.db")
+    init_db(path)
+    release = threading.Event()
+
+    def generate(**params):
+        release.wait(5)
+        raise RuntimeError("API Error: unauthorized")
+
+    queue = JobQueue(generate, workers=1, max_pending=1, db_path=path)
+    job, created = queue.submit({"top_n": 1})
+    with pytest.raises(QueueFull):
+        queue.submit({"top_n": 2})
+    release.set()
+    queue.shutdown()
+    job = queue.get(job["job_id"])
+    assert (job["status"], job["error"]) == ("failed", "API Error: unauthorized")
+    close_connections(path)
+
+
+def test_stub_completion_round_trips_optimised_bundles():
+    from app.blueprints.bundles.ai import ai_bundles_to_json, stub_completion
+
+    prompt = """
+        - **Target Profit Margin**: 30%
+        **Here are the already-optimised bundles:**
+        - Products: Apple, Banana | Bundle Size: 2 | Original Price: €10.00 | Suggested Bundle Price: €7.00
+- Products: Cherry, Date, Fig | Bundle Size: 3 | Original Price: €20.00 | Suggested Bundle Price: €14.00
+    """
+    bundles = ai_bundles_to_json(stub_completion(prompt))["bundles"]
+    assert [[item["item_name"] for item in b["items"]] for b in bundles] == [["Apple", "Banana"], ["Cherry", "Date", "Fig"]]
+    assert [(b["price"], b["profitMargin"]) for b in bundles] == [(7.0, "30%"), (14.0, "30%")]
+
+
+def test_llm_cache_reuses_completions_with_lru_size_limit_and_ttl(tmp_path):
+    from app.llm_cache import cache_key, cache_stats, cached_completion
+
+    path = str(tmp_path / "llm_cache.db")
+    calls = []
+
+    def complete(answer):
+        def call():
+            calls.append(answer)
+            return answer
+        return call
+
+    assert cached_completion("gpt", "p1", {"temperature": 0}, complete("a" * 10), path=path) == "a" * 10
+    assert cached_completion("gpt", "p1", {"temperature": 0}, complete("other"), path=path) == "a" * 10
+    assert cache_key("gpt", "p1", {"a": 1, "b": 2}) == cache_key("gpt", "p1", {"b": 2, "a": 1})
+    # Any change to the model, prompt or parameters is a different entry
+    cached_completion("gpt", "p1", {"temperature": 1}, complete("b" * 10), path=path)
+    cached_completion("gpt-mini", "p1", {"temperature": 0}, complete("c" * 10), path=path)
+    cached_completion("gpt", "p1", {"temperature": 0}, complete("bypassed"), path=path, bypass=True)
+    assert calls == ["a" * 10, "b" * 10, "c" * 10, "bypassed"]
+    stats = cache_stats(path)
+    assert (stats["entries"], stats["bytes"], stats["hits"]) == (3, 30, 1)
+
+    # A 25-byte cap keeps the two most recently used completions: "p1" was read again, "b" drops
+    cached_completion("gpt", "p1", {"temperature": 0}, complete("unused"), path=path)
+    cached_completion("gpt", "p2", {}, complete("d" * 5), path=path, max_bytes=25)
+    calls.clear()
+    for answer, prompt, params in [("x", "p1", {"temperature": 0}), ("y", "p1", {"temperature": 1}), ("z", "p2", {})]:
+        cached_completion("gpt", prompt, params, complete(answer), path=path, max_bytes=100)
+    assert calls == ["y"]
+
+    # Errors are not cached, and expired answers are asked for again
+    with pytest.raises(RuntimeError):
+        cached_completion("gpt", "p3", {}, lambda: (_ for _ in ()).throw(RuntimeError("timeout")), path=path)
+    assert cached_completion("gpt", "p3", {}, complete("e"), path=path) == "e"
+    assert cached_completion("gpt", "p3", {}, complete("f"), path=path, ttl=-1) == "f"
+
+
+def test_azure_completion_is_served_from_the_llm_cache(monkeypatch, tmp_path):
+    import importlib
+    from types import SimpleNamespace
+    from app import llm_cache
+    from app.blueprints.bundles import ai
+
+    requests = []
+
+    class FakeClient:
+        def __init__(self, **kwargs):
+            self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+        def create(self, **kwargs):
+            requests.append(kwargs)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="**Bundle Name**: A"))])
+
+    monkeypatch.setattr(ai, "AzureOpenAI", FakeClient)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PATH", str(tmp_path / "llm_cache.db"))
+    assert ai.azure_completion("prompt") == ai.azure_completion("prompt") == "**Bundle Name**: A"
+    assert len(requests) == 1
+    ai.azure_completion("prompt", use_cache=False)
+    assert len(requests) == 2
+
+    # LLM_CACHE_BYPASS=1 turns the cache off for every call, whatever use_cache says
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm_cache.db"))
+    monkeypatch.setenv("LLM_CACHE_BYPASS", "1")
+    importlib.reload(llm_cache)
+    try:
+        ai.azure_completion("prompt")
+        ai.azure_completion("prompt", use_cache=True)
+        assert len(requests) == 4
+        stats = llm_cache.cache_stats()
+        assert stats["bypass"] and (stats["entries"], stats["hits"]) == (1, 1)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(llm_cache)
+
+
+def test_jobs_left_unfinished_by_a_dead_process_are_failed(tmp_path):
+    import time
+    from app.blueprints.bundles.jobs import STALE_JOB_S, JobQueue, job_key
+    from app.blueprints.bundles.store import close_connections, db_connection, init_db
+
+    path = str(tmp_path / "bundles.db")
+    init_db(path)
+    queue = JobQueue(lambda **params: {"bundles": [{"bundle_id": "b1", "items": []}]}, workers=1, db_path=path)
+    params = {"top_n": 3}
+    with db_connection(path) as conn:
+        # Left "running" by a process that died long ago
+        conn.execute(
+            "INSERT INTO generation_jobs (id, job_key, params, status, created_at) VALUES ('dead', ?, '{}', 'running', ?)",
+            (job_key(params), time.time() - STALE_JOB_S - 1),
+        )
+    dead = queue.get("dead")
+    assert dead["status"] == "failed" and "did not finish" in dead["error"]
+    job, created = queue.submit(params)
+    assert created and job["job_id"] != "dead"
+    queue.shutdown()
+    assert queue.get(job["job_id"])["status"] == "succeeded"
+    close_connections(path)
+
+
+def test_exact_optimizer_without_bundle_sheets_returns_no_bundles(tmp_path, monkeypatch):
+    import pandas as pd
+    from app import data_store
+    from app.blueprints.bundles import optimise_bundles
+    from app.blueprints.bundles.store import close_connections
+
+    # Keep the inventory snapshot out of the working tree
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+
+    excel_path = str(tmp_path / "suggestions.xlsx")
+    with pd.ExcelWriter(excel_path) as writer:
+        _candidate_sheets()["SKU Prices"].to_excel(writer, sheet_name="SKU Prices", index=False)
+    inventory_path = str(tmp_path / "inventory.xlsx")
+    pd.DataFrame({"SKU": ["A"], "Quantity": [3], "OriginalUnitPrice": [4.0]}).to_excel(inventory_path, index=False)
+
+    result = optimise_bundles.optimize_bundles(
+        "A", "30", top_n=2, excel_path=excel_path, optimizer="exact", inventory_path=inventory_path, use_cache=False
+    )
+    assert result["bundles"] == [] and result["search"]["candidates"] == 0
+    greedy = optimise_bundles.optimize_bundles("A", "30", top_n=2, excel_path=excel_path, use_cache=False)
+    assert greedy == {"bundles": []}
+    assert os.listdir(tmp_path / "snapshots")
+    close_connections(str(tmp_path / "suggestions.db"))
+
+
+def test_optimized_bundles_are_priced_at_their_original_total(tmp_path):
+    import pandas as pd
+    from app.blueprints.bundles import optimise_bundles
+    from app.blueprints.bundles.candidate_store import ensure_candidates
+    from app.blueprints.bundles.sheet_cache import get_bundle_data
+    from app.blueprints.bundles.store import close_connections, db_connection
+
+    excel_path = str(tmp_path / "suggestions.xlsx")
+    with pd.ExcelWriter(excel_path) as writer:
+        for name, df in _candidate_sheets().items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+    # 'price' is the bundle's Original Total Price, not the discounted price (or 0)
+    result = optimise_bundles.optimize_bundles("C", "30", top_n=2, excel_path=excel_path, use_cache=False)
+    assert [([item["item_name"] for item in b["items"]], b["price"]) for b in result["bundles"]] == [
+        (["Banana", "Cherry"], 12.0)
+    ]
+    # A combination the sheet does not have sums its SKUs' unit prices; 0 when one is missing
+    store_path = ensure_candidates(excel_path)
+    with db_connection(store_path) as conn:
+        sheet_data = get_bundle_data(conn, store_path).sheet("Bundles_2")
+        assert sheet_data.original_total(conn, ["C", "B"]) == 12.0
+        assert sheet_data.original_total(conn, ["A", "C"]) == 10.0
+        assert sheet_data.original_total(conn, ["A", "Z"]) == 0.0
+    close_connections(store_path)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# cooccurrence.py lives at the repository root, next to the data scripts
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+cooccurrence = pytest.importorskip("cooccurrence")
+
+
+def test_incidence_matrix_counts_each_sku_once_per_order():
+    X = cooccurrence.incidence_matrix([0, 0, 0, 1, -1], [2, 1, 2, 2, 0])
+    assert X.toarray().tolist() == [[0, 1, 1], [0, 0, 1]]
+    assert cooccurrence.item_order_counts(X).tolist() == [0, 1, 2]
+
+
+def test_incidence_matrix_of_an_empty_batch_is_empty():
+    X = cooccurrence.incidence_matrix([], [])
+    assert X.shape == (0, 0)
+    i, j, counts = cooccurrence.pair_counts(X)
+    assert len(i) == len(j) == len(counts) == 0
+    assert cooccurrence.incidence_matrix([], [], n_skus=3).shape == (0, 3)
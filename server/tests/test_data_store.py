@@ -0,0 +1,56 @@
+import os
+import sys
+import pytest
+import pandas as pd
+
+# Add the server directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import data_store
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    data_store.clear_cache()
+    path = tmp_path / "Data.xlsx"
+    pd.DataFrame({"OrderNumber": [1, 1, 2], "SKU": [10, "A-1", 10], "TotalOrderAmount": [5.0, 5.0, 7.5]}).to_excel(path, index=False)
+    yield str(path)
+    data_store.clear_cache()
+
+def test_load_frame_writes_snapshot(workbook, tmp_path):
+    df = data_store.load_frame(workbook)
+    assert list(df.columns) == ["OrderNumber", "SKU", "TotalOrderAmount"]
+    assert len(os.listdir(tmp_path / "snapshots")) == 1
+
+def test_warm_load_skips_excel(workbook, monkeypatch):
+    first = data_store.load_frame(workbook)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("read_excel should not be called on a warm load")
+
+    monkeypatch.setattr(pd, "read_excel", fail)
+    assert data_store.load_frame(workbook) is first
+
+    # A cold process reuses the snapshot on disk instead of parsing the workbook
+    data_store.clear_cache()
+    assert data_store.load_frame(workbook).equals(first)
+
+def test_changed_file_is_reloaded(workbook):
+    first_version = data_store.data_version(workbook)
+    pd.DataFrame({"OrderNumber": [3], "SKU": [11], "TotalOrderAmount": [1.0]}).to_excel(workbook, index=False)
+    os.utime(workbook, ns=(0, 0))
+    df = data_store.load_frame(workbook)
+    assert df["OrderNumber"].tolist() == [3]
+    assert data_store.data_version(workbook) != first_version
+    # The previous version's snapshot is replaced, not left behind
+    assert len(os.listdir(os.path.join(os.path.dirname(workbook), "snapshots"))) == 1
+
+def test_snapshots_default_to_the_workbook_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_store, "SNAPSHOT_DIR", None)
+    data_store.clear_cache()
+    path = tmp_path / "excel" / "inventory.xlsx"
+    path.parent.mkdir()
+    pd.DataFrame({"SKU": ["A"], "Quantity": [3]}).to_excel(path, index=False)
+    data_store.load_frame(str(path))
+    assert [name.split("-")[:2] for name in os.listdir(tmp_path / "excel" / ".snapshots")] == [["inventory", "0"]]
+    data_store.clear_cache()
@@ -0,0 +1,213 @@
+import csv
+import io
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+from openpyxl import Workbook
+
+# db.py lives at the repository root, next to the data scripts
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+class FakeCursor:
+    """Records what db.py sends instead of talking to PostgreSQL"""
+    def __init__(self, rows=()):
+        self.copies = []
+        self.executed = []
+        self.rows = list(rows)
+        self.rowcount = 0
+
+    def copy_expert(self, statement, buffer):
+        self.copies.append((statement, buffer.read()))
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # Importing db.py configures a log file in the working directory. The server test image
+    # has neither db.py nor psycopg2/SQLAlchemy, so these tests only run from a full checkout.
+    monkeypatch.chdir(tmp_path)
+    return pytest.importorskip("db")
+
+
+def test_copy_rows_escapes_csv_and_flushes_in_batches(db):
+    cursor = FakeCursor()
+    rows = [("1", 'Soap, "lavender"', None), ("2", "two\nlines", 3)]
+    assert db.copy_rows(cursor, "Orders", ["OrderNumber", "ItemTitle", "Quantity"], iter(rows), batch_rows=1) == 2
+
+    assert [statement for statement, _ in cursor.copies] == [
+        "COPY Orders (OrderNumber, ItemTitle, Quantity) FROM STDIN WITH (FORMAT csv)"
+    ] * 2
+    copied = [row for _, data in cursor.copies for row in csv.reader(io.StringIO(data))]
+    # None goes out as an unquoted empty field, which COPY reads as NULL
+    assert copied == [["1", 'Soap, "lavender"', ""], ["2", "two\nlines", "3"]]
+    assert cursor.copies[0][1].startswith('1,"Soap, ""lavender""",\r\n')
+
+
+def test_normalize_sku(db):
+    assert db.normalize_sku(1053846.0) == "1053846"
+    assert db.normalize_sku(" 9-4896000585 ") == "9-4896000585"
+    assert db.normalize_sku(12.5) == "12.5"
+    assert db.normalize_sku(None) is None
+
+
+def test_iter_sheet_rows_reads_csv_and_excel(db, tmp_path):
+    with open(tmp_path / "orders.csv", "w", newline="") as f:
+        f.write("OrderNumber,SKU,Quantity\n1,A,\n2,B,3\n")
+    assert list(db.iter_sheet_rows(tmp_path / "orders.csv")) == [
+        {"OrderNumber": "1", "SKU": "A", "Quantity": None},
+        {"OrderNumber": "2", "SKU": "B", "Quantity": "3"},
+    ]
+
+    workbook = Workbook()
+    workbook.active.title = "orders"
+    inventory = workbook.create_sheet("inventory")
+    for row in [("SKU", "Quantity"), (1053846, 4), ("B", None)]:
+        inventory.append(row)
+    workbook.save(tmp_path / "Data.xlsx")
+    assert list(db.iter_sheet_rows(tmp_path / "Data.xlsx", "inventory")) == [
+        {"SKU": 1053846, "Quantity": 4},
+        {"SKU": "B", "Quantity": None},
+    ]
+
+
+def test_inventory_rows_sum_duplicate_skus(db, tmp_path):
+    with open(tmp_path / "inventory.csv", "w", newline="") as f:
+        f.write("SKU,Quantity\n1053846,4\nB,2\n1053846,3\n,9\nC,\nB,\n")
+    details = {"1053846": ("Soap", "Beauty", "Acme")}
+    rows = db.inventory_rows(tmp_path / "inventory.csv", details)
+    # Inventory.SKU is the primary key: one row per SKU, whatever the sheet repeats
+    assert rows == [
+        ("1053846", 7, "Soap", "Beauty", "Acme"),
+        ("B", 2, None, None, None),
+        ("C", None, None, None, None),
+    ]
+
+
+def _orders_csv(path):
+    with open(path, "w", newline="") as f:
+        f.write("OrderNumber,CreatedDate,SKU,Item title,Quantity\n")
+        f.write("1,2024-01-01T10:00:00,1053846,Soap,1\n")
+        f.write("2,,B,Brush,2\n")
+        f.write("3,2024-01-02T09:00:00,B,Brush,1\n")
+    return path
+
+
+def test_full_load_keeps_order_lines_without_a_date(db, tmp_path):
+    progress = {"watermark": None}
+    details = {}
+    rows = list(db.stream_order_rows(_orders_csv(tmp_path / "orders.csv"), details, progress))
+    assert [row[0] for row in rows] == ["1", "2", "3"]
+    assert rows[0][2] == "1053846"
+    assert progress == {"watermark": (db.datetime(2024, 1, 2, 9), "3"), "skipped": 0, "undated": 1}
+    assert details == {"1053846": ("Soap", None, None), "B": ("Brush", None, None)}
+
+
+def test_incremental_load_skips_lines_up_to_the_watermark(db, tmp_path):
+    progress = {"watermark": None}
+    after = (db.datetime(2024, 1, 1, 10), "1")
+    rows = list(db.stream_order_rows(_orders_csv(tmp_path / "orders.csv"), {}, progress, after))
+    assert [row[0] for row in rows] == ["3"]
+    assert progress == {"watermark": (db.datetime(2024, 1, 2, 9), "3"), "skipped": 2, "undated": 1}
+
+
+def test_watermark_upserts_on_conflict(db):
+    cursor = FakeCursor(rows=[(db.datetime(2024, 1, 2, 9), "3")])
+    db.set_watermark(cursor, (db.datetime(2024, 1, 2, 9), "3"))
+    statement, params = cursor.executed[0]
+    assert "ON CONFLICT (Source) DO UPDATE" in statement
+    assert params == ("orders", db.datetime(2024, 1, 2, 9), "3")
+
+    assert db.get_watermark(cursor) == (db.datetime(2024, 1, 2, 9), "3")
+    assert cursor.executed[1][1] == ("orders",)
+    assert db.get_watermark(cursor) is None
+
+
+class FakeConnection:
+    def __init__(self, cursor=None):
+        self.events = []
+        self.fake_cursor = cursor or FakeCursor()
+
+    def cursor(self):
+        return self.fake_cursor
+
+    def commit(self):
+        self.events.append("commit")
+
+    def rollback(self):
+        self.events.append("rollback")
+
+    def close(self):
+        self.events.append("close")
+
+
+def test_get_engine_shares_one_pool_until_fork(db, monkeypatch):
+    monkeypatch.setattr(db, "_engine", None)
+    engine = db.get_engine()
+    assert db.get_engine() is engine
+    assert engine.pool.size() == db.DB_POOL_MIN
+    assert engine.pool._max_overflow == db.DB_POOL_MAX - db.DB_POOL_MIN
+
+    # A forked child drops the parent's pool without closing its sockets and builds its own
+    db._reset_pool_after_fork()
+    assert db.get_engine() is not engine
+
+
+def test_db_connection_commits_or_rolls_back_and_always_returns(db, monkeypatch):
+    connections = []
+    monkeypatch.setattr(db, "get_db_connection", lambda: connections.append(FakeConnection()) or connections[-1])
+    with db.db_connection():
+        pass
+    with pytest.raises(ValueError):
+        with db.db_connection():
+            raise ValueError("boom")
+    assert [c.events for c in connections] == [["commit", "close"], ["rollback", "close"]]
+
+
+def _fake_connections(db, monkeypatch, conn):
+    @contextmanager
+    def db_connection():
+        yield conn
+    monkeypatch.setattr(db, "db_connection", db_connection)
+
+
+def _copied(cursor, table):
+    return [row for statement, data in cursor.copies if f"COPY {table} " in statement
+            for row in csv.reader(io.StringIO(data))]
+
+
+def test_full_load_copies_one_inventory_row_per_sku(db, tmp_path, monkeypatch):
+    with open(tmp_path / "inventory.csv", "w", newline="") as f:
+        f.write("SKU,Quantity\n1053846,4\nB,2\n1053846,3\n")
+    conn = FakeConnection()
+    _fake_connections(db, monkeypatch, conn)
+    stats = db.load_data_from_excel(tmp_path / "inventory.csv", _orders_csv(tmp_path / "orders.csv"))
+    assert (stats["orders"], stats["inventory"]) == (3, 2)
+    assert _copied(conn.fake_cursor, "Inventory") == [
+        ["1053846", "7", "Soap", "", ""],
+        ["B", "2", "Brush", "", ""],
+    ]
+
+
+def test_incremental_load_upserts_one_row_per_sku(db, tmp_path, monkeypatch):
+    with open(tmp_path / "inventory.csv", "w", newline="") as f:
+        f.write("SKU,Quantity\n1053846,4\nB,2\n1053846,3\nB,1\n")
+    conn = FakeConnection(FakeCursor(rows=[(db.datetime(2024, 1, 1, 10), "1")]))
+    _fake_connections(db, monkeypatch, conn)
+    stats = db.load_incremental_from_excel(tmp_path / "inventory.csv", _orders_csv(tmp_path / "orders.csv"))
+    assert stats["orders"] == 1
+
+    cursor = conn.fake_cursor
+    staged = _copied(cursor, "inventory_stage")
+    assert sorted(row[0] for row in staged) == ["1053846", "B"]
+    upsert = next(statement for statement, _ in cursor.executed if "INSERT INTO Inventory" in statement)
+    # Duplicates left in the stage would make ON CONFLICT DO UPDATE hit a row twice
+    assert "GROUP BY SKU" in upsert and "SUM(Quantity)" in upsert
+    assert cursor.executed[-1][1] == ("orders", db.datetime(2024, 1, 2, 9), "3")
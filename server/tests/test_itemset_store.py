@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# itemset_store.py lives at the repository root, next to the data scripts
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+itemset_store = pytest.importorskip("itemset_store")
+
+
+def _daily_orders(days):
+    rows = []
+    for day in range(days):
+        date = pd.Timestamp("2024-01-01") + pd.Timedelta(days=day)
+        # The same bundle once a day, plus an order that changes from day to day
+        for sku in ["A", "B", "C"]:
+            rows.append((f"D{day:02d}-1", sku, date, 1.0))
+        for sku in ["A", f"S{day % 3}", f"S{day % 4 + 3}", "C"]:
+            rows.append((f"D{day:02d}-2", sku, date + pd.Timedelta(hours=1), 2.0))
+    return pd.DataFrame(rows, columns=["OrderNumber", "SKU", "CreatedDate", "FinalUnitPrice"])
+
+
+def test_folding_daily_batches_matches_a_full_rebuild(tmp_path):
+    orders = _daily_orders(10)
+    path = str(tmp_path / "store.npz")
+    for day in range(10):
+        store = itemset_store.ItemsetStore.load(path)
+        assert store.fold_in(orders[orders["OrderNumber"].str.startswith(f"D{day:02d}")]) == 2
+        store.save(path)
+
+    full = itemset_store.ItemsetStore()
+    assert full.fold_in(orders) == 20
+    incremental = itemset_store.ItemsetStore.load(path)
+    assert incremental.bundle_counters(1, range(1, 6)) == full.bundle_counters(1, range(1, 6))
+    assert incremental.bundle_counters(5, [3])[3] == {("A", "B", "C"): 10}
+    assert incremental.watermark == full.watermark
@@ -0,0 +1,37 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add the server directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.orders_schema import apply_orders_schema, fill_category, sku_dictionary
+
+def _orders():
+    return pd.DataFrame({
+        "OrderNumber": [1, 1, 2, 3],
+        "SKU": [1053846, "1053846", "9-4896000585", 1053846.0],
+        "Category": ["Beauty", "Beauty", None, "Home"],
+        "FinalUnitPrice": [16.89, 16.89, 3.5, 7.25],
+        "TotalOrderAmount": [33.78, 33.78, 3.5, 7.25],
+    })
+
+def test_apply_orders_schema_types():
+    df = apply_orders_schema(_orders())
+    assert isinstance(df["SKU"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["OrderNumber"].dtype, pd.CategoricalDtype)
+    assert df["FinalUnitPrice"].dtype == np.float32
+    assert df["TotalOrderAmount"].dtype == np.float64
+    # Ints, floats and strings of the same SKU collapse to one category
+    assert list(df["SKU"].cat.categories) == ["1053846", "9-4896000585"]
+
+def test_groupby_on_codes_and_sku_dictionary():
+    df = apply_orders_schema(_orders())
+    counts = df.groupby("SKU", observed=True)["OrderNumber"].nunique()
+    assert counts.to_dict() == {"1053846": 2, "9-4896000585": 1}
+
+    codes, skus = sku_dictionary(df)
+    assert codes.dtype == np.int32
+    assert [skus[c] for c in codes] == ["1053846", "1053846", "9-4896000585", "1053846"]
+    assert fill_category(df["Category"], "Unknown").tolist() == ["Beauty", "Beauty", "Unknown", "Home"]
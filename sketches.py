@@ -0,0 +1,229 @@
+import itertools
+import math
+
+import numpy as np
+
+# Split of each size's memory budget: Count-Min table, Space-Saving entries, and the buffer
+# of enumerated itemsets waiting to be hashed and folded in
+COUNT_MIN_SHARE = 0.4
+BUFFER_SHARE = 0.2
+COUNT_MIN_DEPTH = 4
+# Bytes per buffered itemset on top of its codes: key, unique() temporaries and counts
+BUFFER_OVERHEAD = 32
+# Baskets with more n-itemsets than this are not enumerated for size n (C(24, 5) = 42504
+# still is); they are counted as skipped and widen the error bounds instead
+MAX_ITEMSETS_PER_BASKET = 50000
+# Position arrays are cached for baskets up to this many SKUs
+MAX_CACHED_WIDTH = 32
+
+
+def _mix(h):
+    """splitmix64 finalizer, vectorized over uint64 arrays"""
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def itemset_keys(rows):
+    """Hash sorted code rows of shape (k, n) to one uint64 key per itemset"""
+    rows = np.asarray(rows, dtype=np.uint64)
+    h = np.full(len(rows), np.uint64(0x9E3779B97F4A7C15), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for col in range(rows.shape[1]):
+            h = _mix(h ^ (rows[:, col] + np.uint64(1)))
+    return h
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch over uint64 keys.
+
+    Estimates never undercount. With width w and depth d, an estimate exceeds the true
+    count by more than (e / w) * total with probability at most exp(-d), where total is
+    the sum of all added counts.
+    """
+
+    def __init__(self, width, depth=COUNT_MIN_DEPTH):
+        self.width = int(width)
+        self.depth = int(depth)
+        self.table = np.zeros((self.depth, self.width), dtype=np.uint32)
+        self.total = 0
+
+    @classmethod
+    def for_bytes(cls, nbytes, depth=COUNT_MIN_DEPTH):
+        return cls(max(16, nbytes // (4 * depth)), depth)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    @property
+    def error_bound(self):
+        """Additive overestimate that holds with probability 1 - exp(-depth)"""
+        return math.e / self.width * self.total
+
+    def _columns(self, keys, row):
+        with np.errstate(over="ignore"):
+            return (_mix(keys + np.uint64(row) * np.uint64(0x9E3779B97F4A7C15)) % np.uint64(self.width)).astype(np.intp)
+
+    def add(self, keys, counts):
+        for row in range(self.depth):
+            np.add.at(self.table[row], self._columns(keys, row), counts.astype(np.uint32))
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        return np.min([self.table[row][self._columns(keys, row)] for row in range(self.depth)], axis=0)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters holding at most capacity itemsets.
+
+    counts[i] overestimates the true count of items[i] by at most errors[i], so
+    counts - errors is a guaranteed lower bound. Any itemset that is not monitored
+    occurred at most `floor` times, so every itemset with a higher count is monitored.
+
+    Updates are applied a batch at a time: the batch is pre-aggregated, added to the
+    monitored entries, newcomers start at the current floor (the most an unmonitored
+    itemset could already have), and the largest `capacity` entries are kept.
+    """
+
+    def __init__(self, capacity, size):
+        self.capacity = int(capacity)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.items = np.empty((0, size), dtype=np.int32)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.errors = np.empty(0, dtype=np.int64)
+        self.floor = 0
+        self.total = 0
+
+    @staticmethod
+    def bytes_per_entry(size):
+        # key, count, error and the itemset codes
+        return 8 + 8 + 8 + 4 * size
+
+    def add(self, keys, items, counts):
+        self.total += int(counts.sum())
+        order = np.argsort(self.keys)
+        sorted_keys = self.keys[order]
+        slots = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+        known = (sorted_keys[slots] == keys) if len(sorted_keys) else np.zeros(len(keys), dtype=bool)
+        hits = np.where(known, order[slots] if len(order) else -1, -1)
+
+        counts_now = self.counts.copy()
+        np.add.at(counts_now, hits[known], counts[known])
+        new = ~known
+        floor = self.floor if len(self.keys) >= self.capacity else 0
+
+        all_keys = np.concatenate([self.keys, keys[new]])
+        all_items = np.concatenate([self.items, items[new]])
+        all_counts = np.concatenate([counts_now, counts[new] + floor])
+        all_errors = np.concatenate([self.errors, np.full(int(new.sum()), floor, dtype=np.int64)])
+
+        if len(all_keys) > self.capacity:
+            keep = np.argpartition(-all_counts, self.capacity - 1)[: self.capacity]
+            dropped = np.ones(len(all_keys), dtype=bool)
+            dropped[keep] = False
+            self.floor = max(self.floor, int(all_counts[dropped].max()))
+            all_keys, all_items = all_keys[keep], all_items[keep]
+            all_counts, all_errors = all_counts[keep], all_errors[keep]
+        self.keys, self.items, self.counts, self.errors = all_keys, all_items, all_counts, all_errors
+
+
+class ApproximateItemsetCounter:
+    """
+    Bounded-memory counts for itemsets of several sizes: a Count-Min sketch and a
+    Space-Saving summary per size, sized together to fit memory_mb.
+
+    A basket with more than MAX_ITEMSETS_PER_BASKET itemsets of size n is skipped for that
+    size; skipped[n] counts those baskets, and each may hold any itemset once more than
+    the sketches saw.
+    """
+
+    def __init__(self, sizes, memory_mb):
+        self.sizes = sorted(sizes)
+        per_size = memory_mb * 1024 * 1024 / len(self.sizes)
+        self.count_min = {}
+        self.heavy = {}
+        self.batch_rows = {}
+        for n in self.sizes:
+            self.count_min[n] = CountMinSketch.for_bytes(int(per_size * COUNT_MIN_SHARE))
+            heavy_share = 1 - COUNT_MIN_SHARE - BUFFER_SHARE
+            capacity = int(per_size * heavy_share) // SpaceSaving.bytes_per_entry(n)
+            self.heavy[n] = SpaceSaving(max(1, capacity), n)
+            self.batch_rows[n] = max(1024, int(per_size * BUFFER_SHARE) // (4 * n + BUFFER_OVERHEAD))
+        self.skipped = {n: 0 for n in self.sizes}
+        self._combinations = {}
+
+    @property
+    def nbytes(self):
+        return sum(
+            cms.nbytes
+            + self.heavy[n].capacity * SpaceSaving.bytes_per_entry(n)
+            + self.batch_rows[n] * (4 * n + BUFFER_OVERHEAD)
+            for n, cms in self.count_min.items()
+        )
+
+    def _flush(self, n, chunks):
+        if not chunks:
+            return
+        rows = np.concatenate(chunks)
+        keys = itemset_keys(rows)
+        keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.count_min[n].add(keys, counts)
+        self.heavy[n].add(keys, rows[first], counts.astype(np.int64))
+
+    def _positions(self, k, n):
+        """Index array of every n-combination of k positions, cached per (k, n) for narrow baskets"""
+        positions = self._combinations.get((k, n))
+        if positions is None:
+            positions = np.array(list(itertools.combinations(range(k), n)), dtype=np.uint8 if k <= 256 else np.intp)
+            if k <= MAX_CACHED_WIDTH:
+                self._combinations[(k, n)] = positions
+        return positions
+
+    def update(self, baskets):
+        """Count every itemset of every basket (sorted SKU code arrays), skipping oversized ones"""
+        pending = {n: [] for n in self.sizes}
+        pending_rows = {n: 0 for n in self.sizes}
+        for basket in baskets:
+            basket = np.asarray(basket, dtype=np.int32)
+            for n in self.sizes:
+                if len(basket) < n:
+                    continue
+                if math.comb(len(basket), n) > MAX_ITEMSETS_PER_BASKET:
+                    self.skipped[n] += 1
+                    continue
+                rows = basket[self._positions(len(basket), n)]
+                pending[n].append(rows)
+                pending_rows[n] += len(rows)
+                if pending_rows[n] >= self.batch_rows[n]:
+                    self._flush(n, pending[n])
+                    pending[n], pending_rows[n] = [], 0
+        for n in self.sizes:
+            self._flush(n, pending[n])
+        return self
+
+    def frequent(self, n, min_count):
+        """
+        Itemsets of size n whose count may reach min_count, best first, as (codes, count,
+        lower) tuples. count is the tighter of the Space-Saving count and the Count-Min
+        estimate, plus the skipped baskets, and never undercounts; lower never overcounts.
+        No itemset with a true count of at least min_count is missing when complete() holds.
+        """
+        heavy = self.heavy[n]
+        if not len(heavy.keys):
+            return []
+        upper = np.minimum(heavy.counts, self.count_min[n].estimate(heavy.keys).astype(np.int64)) + self.skipped[n]
+        lower = np.maximum(heavy.counts - heavy.errors, 0)
+        keep = np.flatnonzero(upper >= min_count)
+        keep = keep[np.argsort(-upper[keep], kind="stable")]
+        return [(tuple(heavy.items[i].tolist()), int(upper[i]), int(lower[i])) for i in keep]
+
+    def missed_bound(self, n):
+        """Most orders an itemset of size n missing from frequent() can have been bought in"""
+        return self.heavy[n].floor + self.skipped[n]
+
+    def complete(self, n, min_count):
+        """True when no itemset of size n with count >= min_count can have been missed"""
+        return self.missed_bound(n) < min_count